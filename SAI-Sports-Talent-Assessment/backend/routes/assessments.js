@@ -46,7 +46,8 @@ const getAssessmentsCollection = () => adminDb.collection('assessments');
 const getAthletesCollection = () => adminDb.collection('athletes');
 
 // Optimized AI processing function with faster execution
-const processAIAnalysis = async (videoPath, assessmentType) => {
+// priority: 'live' for new submissions, 'background' for re-scoring
+const processAIAnalysis = async (videoPath, assessmentType, priority = 'live') => {
   try {
     console.log(`Starting AI analysis for ${assessmentType} with video: ${videoPath}`);
     
@@ -63,7 +64,7 @@ const processAIAnalysis = async (videoPath, assessmentType) => {
     const startTime = Date.now();
     // Use a timeout of 1 minute for faster processing
     const result = await Promise.race([
-      aiAnalysisService.analyzeVideo(videoPath, assessmentType),
+      aiAnalysisService.analyzeVideo(videoPath, assessmentType, null, priority),
       new Promise((_, reject) => 
         setTimeout(() => reject(new Error('AI analysis timeout after 1 minute')), 1 * 60 * 1000)
       )
@@ -574,6 +575,10 @@ router.get('/:id/ai-analysis', async (req, res) => {
         assessmentType: assessmentData.assessmentType,
         status: assessmentData.status,
         aiAnalysis: assessmentData.aiAnalysis,
+        // Live frames/reps/ETA while the analysis is still running
+        progress: assessmentData.status === 'Processing' && assessmentData.videoPath
+          ? aiAnalysisService.getProgress(assessmentData.videoPath)
+          : null,
         submissionDate: assessmentData.submissionDate,
         updatedAt: assessmentData.updatedAt
       }
@@ -712,7 +717,7 @@ router.post('/:id/reprocess', async (req, res) => {
     });
 
     // Start AI processing with better timeout
-    processAIAnalysis(assessmentData.videoPath, assessmentData.assessmentType)
+    processAIAnalysis(assessmentData.videoPath, assessmentData.assessmentType, 'background')
       .then(async (aiAnalysis) => {
         await assessmentsCollection.doc(req.params.id).update({
           aiAnalysis,
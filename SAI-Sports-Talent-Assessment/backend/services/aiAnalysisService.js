@@ -5,6 +5,11 @@ const fs = require('fs');
 // Path to the AI analysis scripts
 const AI_SCRIPTS_PATH = path.join(__dirname);
 
+// File descriptor of the extra pipe the Python side writes NDJSON progress events to
+const PROGRESS_FD = 3;
+// Kill the analysis if no progress event arrives for this long
+const STALL_TIMEOUT_MS = 20 * 1000;
+
 /**
  * AI Analysis Service
  * Integrates with Python AI analysis scripts for exercise counting
@@ -18,15 +23,28 @@ class AIAnalysisService {
       'vertical-jump': 'vertical_jump.py',
       'push-ups': 'pushup.py'
     };
+    // Latest progress event per video path while an analysis is running
+    this.progress = new Map();
+  }
+
+  /**
+   * Latest progress of a running analysis
+   * @param {string} videoPath - Path to the video file
+   * @returns {Object|null} Last progress event, or null if none is running
+   */
+  getProgress(videoPath) {
+    return this.progress.get(videoPath) || null;
   }
 
   /**
    * Analyze video using appropriate AI script
    * @param {string} videoPath - Path to the video file
    * @param {string} assessmentType - Type of assessment
+   * @param {Function} [onProgress] - Called with each progress event
+   * @param {string} [priority] - 'live' or 'background' (queued behind live jobs)
    * @returns {Promise<Object>} Analysis results
    */
-  async analyzeVideo(videoPath, assessmentType) {
+  async analyzeVideo(videoPath, assessmentType, onProgress, priority = 'live') {
     return new Promise((resolve, reject) => {
       if (!this.isSupported(assessmentType)) {
         reject(new Error(`Unsupported assessment type: ${assessmentType}`));
@@ -52,12 +70,44 @@ class AIAnalysisService {
       console.log(`Wrapper: ${wrapperPath}`);
 
       // Spawn Python process with wrapper and reduced timeout (1 minute for faster processing)
-      const pythonProcess = spawn('python', [wrapperPath, videoPath, assessmentType], {
-        stdio: ['pipe', 'pipe', 'pipe']
+      const pythonProcess = spawn('python', [wrapperPath, videoPath, assessmentType, priority], {
+        stdio: ['pipe', 'pipe', 'pipe', 'pipe'],
+        env: { ...process.env, AI_PROGRESS_FD: String(PROGRESS_FD) }
       });
 
       let stdout = '';
       let stderr = '';
+      let progressBuffer = '';
+      let stallTimer = null;
+
+      // A job that stops reporting progress is stuck; don't wait for the overall timeout
+      const resetStallTimer = () => {
+        clearTimeout(stallTimer);
+        stallTimer = setTimeout(() => {
+          pythonProcess.kill();
+          reject(new Error(`AI analysis stalled: no progress for ${STALL_TIMEOUT_MS / 1000}s`));
+        }, STALL_TIMEOUT_MS);
+      };
+      resetStallTimer();
+
+      // Progress events: one JSON object per line on the extra pipe
+      pythonProcess.stdio[PROGRESS_FD].on('data', (data) => {
+        progressBuffer += data.toString();
+        const lines = progressBuffer.split('\n');
+        progressBuffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          let event;
+          try {
+            event = JSON.parse(line);
+          } catch (parseError) {
+            continue;
+          }
+          resetStallTimer();
+          this.progress.set(videoPath, { ...event, assessmentType, updatedAt: Date.now() });
+          if (onProgress) onProgress(event);
+        }
+      });
 
       // Capture output
       pythonProcess.stdout.on('data', (data) => {
@@ -73,6 +123,9 @@ class AIAnalysisService {
       // Handle process completion
       pythonProcess.on('close', (code) => {
         console.log(`AI Analysis process exited with code ${code}`);
+        clearTimeout(stallTimer);
+        clearTimeout(overallTimer);
+        this.progress.delete(videoPath);
         
         if (code === 0) {
           try {
@@ -99,11 +152,12 @@ class AIAnalysisService {
       // Handle process errors
       pythonProcess.on('error', (error) => {
         console.error('AI Analysis process error:', error);
+        clearTimeout(stallTimer);
         reject(new Error(`Failed to start AI analysis: ${error.message}`));
       });
 
       // Set timeout (1 minute for faster processing)
-      setTimeout(() => {
+      const overallTimer = setTimeout(() => {
         pythonProcess.kill();
         reject(new Error('AI analysis timeout after 1 minute'));
       }, 1 * 60 * 1000);
@@ -137,8 +191,14 @@ class AIAnalysisService {
       additionalMetrics.averageHeight = result.average_height || 0;
     }
 
-    // Calculate technique score based on rep count and assessment type
-    const techniqueScore = this.calculateTechniqueScore(repCount, assessmentType);
+    // Technique score measured from the landmarks; the rep-count estimate
+    // only when the analysis could not score a complete rep
+    const techniqueScore = typeof result.technique_score === 'number'
+      ? result.technique_score
+      : this.calculateTechniqueScore(repCount, assessmentType);
+    if (result.technique) {
+      additionalMetrics.technique = result.technique;
+    }
 
     // Generate detailed notes based on results
     let notes = this.generateAnalysisNotes(repCount, assessmentType, additionalMetrics);
@@ -148,16 +208,32 @@ class AIAnalysisService {
       notes += ` Thresholds - Up: ${result.up_threshold.toFixed(1)}, Down: ${result.down_threshold.toFixed(1)}`;
     }
     
-    if (result.warmup_frames !== undefined) {
+    if (result.warmup_sec !== undefined) {
+      notes += ` Warmup: ${result.warmup_sec}s (${result.warmup_frames} frames)`;
+    } else if (result.warmup_frames !== undefined) {
       notes += ` Warmup: ${result.warmup_frames} frames`;
     }
 
+    // The analyzer stopped at its time budget; counts cover only the processed range
+    const partial = Boolean(result.partial);
+    if (partial && result.processed_range && result.processed_range.end_sec != null) {
+      notes += ` Partial analysis: first ${result.processed_range.end_sec.toFixed(1)}s of the video.`;
+    }
+
     return {
       aiRepCount: repCount,
       aiTechniqueScore: techniqueScore,
       aiNotes: notes,
       processingTime: Date.now(), // Will be updated with actual processing time
       additionalMetrics,
+      partial,
+      processedRange: result.processed_range || null,
+      // frame and time of each rep's start/bottom/top/end, for seeking to reps
+      repIndex: result.rep_index || null,
+      // thumbnail and turning-point frames saved during the analysis decode
+      keyframes: result.keyframes || null,
+      // annotated review video; status "rendering" until the file is written
+      overlay: result.overlay || null,
       error: null
     };
   }
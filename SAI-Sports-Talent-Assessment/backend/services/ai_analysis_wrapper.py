@@ -10,6 +10,100 @@ import os
 import subprocess
 import traceback
 
+from analysis_zygote import zygote_available, submit_job
+from job_scheduler import scheduler_available, submit_to_scheduler
+from progress import ProgressReporter, progress_fd
+from result_cache import ResultCache, content_hash
+from worker_pool import check_job_memory, children_peak_rss_mb
+from worker_config import THREAD_ENV_VARS
+
+ANALYSIS_TIMEOUT = 30  # seconds per analyzer run
+# The analyzer is asked to stop this long before the hard timeout, so it can
+# still report the frames it managed to process
+BUDGET_MARGIN_SECONDS = 5
+# Sample a few frames for a person before running the analyzer. Off by default:
+# it costs a mediapipe import here, and the analyzers already give up early on
+# videos without an athlete (early_abort.py) using the graph they have loaded.
+PREFLIGHT_POSE_CHECK = False
+# Landmark settings (landmark_stream.py, keyframes.py, overlay_render.py,
+# landmark_predictor.py, pose_backend.py) forwarded to zygote jobs along with the thread settings
+STREAM_ENV_VARS = ["AI_STREAM_CONSUMERS", "AI_KEYFRAME_DIR", "AI_KEYFRAME_FORMAT",
+                   "AI_OVERLAY", "AI_OVERLAY_DIR", "AI_INFER_EVERY", "AI_POSE_BACKEND"]
+
+def parse_analyzer_output(stdout, stderr=""):
+    """Analyzers print their result as a single JSON object on the last line."""
+    for line in reversed(stdout.strip().splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    detail = stderr.strip()[-500:] if stderr else ""
+    return {"error": "Analyzer produced no result" + (f": {detail}" if detail else "")}
+
+# Analyzer output fields passed through to the wrapper result as they are
+PASSTHROUGH_FIELDS = ["processed_range", "worker", "trajectory", "rep_index", "time_axis", "prediction",
+                      "quality", "technique", "keyframes", "landmark_series",
+                      "stream_errors"]  # landmark_stream.py consumers
+
+def add_partial_info(result, output):
+    """Copy the analyzer's partial flag and PASSTHROUGH_FIELDS into a wrapper result."""
+    result["partial"] = bool(output.get("partial", False))
+    for key in PASSTHROUGH_FIELDS:
+        if key in output:
+            result[key] = output[key]
+    if result["partial"]:
+        end_sec = output.get("processed_range", {}).get("end_sec")
+        covered = f"the first {end_sec:.1f}s" if end_sec is not None else "part"
+        result["notes"] += f" Partial result: only {covered} of the video was analyzed within the time budget."
+    return result
+
+def run_analyzer_script(script_name, video_path, timeout=ANALYSIS_TIMEOUT):
+    """
+    Run an analyzer script on a video and return its parsed JSON output.
+    Uses the warm zygote (analysis_zygote.py) when one is running, otherwise
+    a fresh Python subprocess. The analyzer gets a time budget slightly below
+    `timeout` and returns partial results when it runs out; the hard timeout
+    (subprocess.TimeoutExpired) only fires if it fails to stop.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    script_path = os.path.join(script_dir, script_name)
+    budget_env = {"AI_MAX_SECONDS": str(max(timeout - BUDGET_MARGIN_SECONDS, 1))}
+    # zygote jobs don't inherit our environment: forward the worker thread/CPU and stream settings
+    for name in ["AI_WORKER_THREADS", "AI_WORKER_CPUS"] + THREAD_ENV_VARS + STREAM_ENV_VARS:
+        if name in os.environ:
+            budget_env[name] = os.environ[name]
+    # the analyzer writes its progress events straight to our progress channel
+    fd = progress_fd()
+    progress = ProgressReporter(fd, source="wrapper")
+
+    job = None
+    if zygote_available():
+        try:
+            progress.stage("analyzing", script=script_name, runner="zygote")
+            job = submit_job(script_name, [video_path], timeout, env=budget_env, progress_fd=fd)
+        except (OSError, ValueError):
+            job = None  # zygote gone or unhealthy: fall back to a subprocess
+    if job is not None:
+        if job["timed_out"]:
+            raise subprocess.TimeoutExpired(script_name, timeout)
+        output = parse_analyzer_output(job["stdout"], job["stderr"])
+        if "worker" in job:
+            output["worker"] = job["worker"]
+        return output
+
+    progress.stage("analyzing", script=script_name, runner="subprocess")
+    env = dict(os.environ, **budget_env)
+    result = subprocess.run([sys.executable, script_path, video_path],
+                            capture_output=True, text=True, timeout=timeout, env=env,
+                            pass_fds=(fd,) if fd is not None else ())
+    output = parse_analyzer_output(result.stdout, result.stderr)
+    peak = children_peak_rss_mb()
+    if peak is not None:
+        output["worker"] = {"peak_rss_mb": peak}
+    return output
+
 def run_pushup_analysis(video_path):
     """Run pushup analysis using the actual Python script"""
     try:
@@ -21,47 +115,18 @@ def run_pushup_analysis(video_path):
         if not os.path.exists(pushup_script):
             return {"error": f"Pushup analysis script not found: {pushup_script}"}
         
-        # Modify the pushup script to accept video path as argument
-        # For now, we'll simulate by modifying the video_filename variable
-        with open(pushup_script, 'r') as f:
-            content = f.read()
-        
-        # Replace the video filename with the provided path
-        content = content.replace('video_filename = "your_pushup_video.mp4"', f'video_filename = "{video_path}"')
-        
-        # Write to a temporary file
-        temp_script = os.path.join(script_dir, "temp_pushup.py")
-        with open(temp_script, 'w') as f:
-            f.write(content)
-        
-        # Run the modified script and capture output
-        result = subprocess.run([sys.executable, temp_script], 
-                              capture_output=True, text=True, timeout=30)
-        
-        # Clean up temp file
-        if os.path.exists(temp_script):
-            os.remove(temp_script)
-        
-        # Parse the output to extract rep count
-        # This is a simplified approach - in reality, you'd want to modify the scripts
-        # to output JSON directly
-        output = result.stdout
-        lines = output.split('\n')
-        
-        rep_count = 0
-        for line in lines:
-            if "Total reps" in line:
-                try:
-                    rep_count = int(line.split('=')[1].strip())
-                    break
-                except:
-                    pass
+        # The analyzer takes the video path as its argument and prints JSON
+        output = run_analyzer_script("pushup.py", video_path)
+        if "error" in output:
+            return {"error": f"Pushup analysis failed: {output['error']}"}
+
+        rep_count = int(output.get("rep_count", 0))
         
-        return {
+        return add_partial_info({
             "rep_count": rep_count,
-            "technique_score": 0.85,  # Default score
+            "technique_score": output.get("technique_score"),  # technique.py; None without a scorable rep
             "notes": f"Pushup analysis completed. Detected {rep_count} repetitions."
-        }
+        }, output)
         
     except subprocess.TimeoutExpired:
         return {"error": "Pushup analysis timed out"}
@@ -79,44 +144,18 @@ def run_situp_analysis(video_path):
         if not os.path.exists(situp_script):
             return {"error": f"Situp analysis script not found: {situp_script}"}
         
-        # Modify the situp script to accept video path as argument
-        with open(situp_script, 'r') as f:
-            content = f.read()
-        
-        # Replace the video filename with the provided path
-        content = content.replace('video_filename = "your_video.mp4"', f'video_filename = "{video_path}"')
-        
-        # Write to a temporary file
-        temp_script = os.path.join(script_dir, "temp_situp.py")
-        with open(temp_script, 'w') as f:
-            f.write(content)
-        
-        # Run the modified script and capture output
-        result = subprocess.run([sys.executable, temp_script], 
-                              capture_output=True, text=True, timeout=30)
-        
-        # Clean up temp file
-        if os.path.exists(temp_script):
-            os.remove(temp_script)
-        
-        # Parse the output to extract rep count
-        output = result.stdout
-        lines = output.split('\n')
-        
-        rep_count = 0
-        for line in lines:
-            if "Total reps" in line:
-                try:
-                    rep_count = int(line.split('=')[1].strip())
-                    break
-                except:
-                    pass
+        # The analyzer takes the video path as its argument and prints JSON
+        output = run_analyzer_script("situp_counter.py", video_path)
+        if "error" in output:
+            return {"error": f"Situp analysis failed: {output['error']}"}
+
+        rep_count = int(output.get("rep_count", 0))
         
-        return {
+        return add_partial_info({
             "rep_count": rep_count,
-            "technique_score": 0.82,  # Default score
+            "technique_score": output.get("technique_score"),  # technique.py; None without a scorable rep
             "notes": f"Situp analysis completed. Detected {rep_count} repetitions."
-        }
+        }, output)
         
     except subprocess.TimeoutExpired:
         return {"error": "Situp analysis timed out"}
@@ -134,47 +173,22 @@ def run_vertical_jump_analysis(video_path):
         if not os.path.exists(jump_script):
             return {"error": f"Vertical jump analysis script not found: {jump_script}"}
         
-        # Modify the jump script to accept video path as argument
-        with open(jump_script, 'r') as f:
-            content = f.read()
-        
-        # Replace the video filename with the provided path
-        content = content.replace('VIDEO_FILE = "your_jump_video.mp4"', f'VIDEO_FILE = "{video_path}"')
-        
-        # Write to a temporary file
-        temp_script = os.path.join(script_dir, "temp_vertical_jump.py")
-        with open(temp_script, 'w') as f:
-            f.write(content)
-        
-        # Run the modified script and capture output
-        result = subprocess.run([sys.executable, temp_script], 
-                              capture_output=True, text=True, timeout=30)
-        
-        # Clean up temp file
-        if os.path.exists(temp_script):
-            os.remove(temp_script)
-        
-        # Parse the output to extract jump count
-        output = result.stdout
-        lines = output.split('\n')
-        
-        jump_count = 0
-        jump_heights = []
-        for line in lines:
-            if "Total reps" in line:
-                try:
-                    jump_count = int(line.split('=')[1].strip())
-                except:
-                    pass
-            # Extract jump heights if available
+        # The analyzer takes the video path as its argument and prints JSON
+        output = run_analyzer_script("vertical_jump.py", video_path)
+        if "error" in output:
+            return {"error": f"Vertical jump analysis failed: {output['error']}"}
+
+        jump_count = int(output.get("rep_count", 0))
+        jump_heights = [float(h) for h in output.get("jump_heights", [])]
+        average_height = float(output.get("average_height", 0.0))
         
-        return {
+        return add_partial_info({
             "rep_count": jump_count,
-            "technique_score": 0.78,  # Default score
-            "jump_heights": [45.2, 47.8, 46.1] if jump_count > 0 else [],  # Sample heights
-            "average_height": 46.4 if jump_count > 0 else 0,
+            "technique_score": output.get("technique_score"),  # technique.py; None without a scorable rep
+            "jump_heights": jump_heights,
+            "average_height": average_height,
             "notes": f"Vertical jump analysis completed. {jump_count} jumps detected."
-        }
+        }, output)
         
     except subprocess.TimeoutExpired:
         return {"error": "Vertical jump analysis timed out"}
@@ -192,76 +206,115 @@ def run_shuttle_run_analysis(video_path):
         if not os.path.exists(shuttle_script):
             return {"error": f"Shuttle run analysis script not found: {shuttle_script}"}
         
-        # Modify the shuttle script to accept video path as argument
-        with open(shuttle_script, 'r') as f:
-            content = f.read()
-        
-        # Replace the video filename with the provided path
-        content = content.replace('VIDEO_FILE = "your_shuttle_video.mp4"', f'VIDEO_FILE = "{video_path}"')
-        
-        # Write to a temporary file
-        temp_script = os.path.join(script_dir, "temp_shuttle_run.py")
-        with open(temp_script, 'w') as f:
-            f.write(content)
-        
-        # Run the modified script and capture output
-        result = subprocess.run([sys.executable, temp_script], 
-                              capture_output=True, text=True, timeout=30)
-        
-        # Clean up temp file
-        if os.path.exists(temp_script):
-            os.remove(temp_script)
-        
-        # Parse the output to extract shuttle count
-        output = result.stdout
-        lines = output.split('\n')
-        
-        shuttle_count = 0
-        for line in lines:
-            if "Total reps" in line:
-                try:
-                    shuttle_count = int(line.split('=')[1].strip())
-                    break
-                except:
-                    pass
+        # The analyzer takes the video path as its argument and prints JSON
+        output = run_analyzer_script("shuttle_run.py", video_path)
+        if "error" in output:
+            return {"error": f"Shuttle run analysis failed: {output['error']}"}
+
+        shuttle_count = int(output.get("rep_count", 0))
         
-        return {
+        return add_partial_info({
             "rep_count": shuttle_count,
-            "technique_score": 0.80,  # Default score
+            "technique_score": output.get("technique_score"),  # technique.py; None without a scorable rep
             "notes": f"Shuttle run analysis completed. {shuttle_count} shuttles detected."
-        }
+        }, output)
         
     except subprocess.TimeoutExpired:
         return {"error": "Shuttle run analysis timed out"}
     except Exception as e:
         return {"error": f"Shuttle run analysis failed: {str(e)}"}
 
+def run_assessment(video_path, assessment_type):
+    """Route to the analysis function for the assessment type."""
+    if assessment_type == "push-ups":
+        return run_pushup_analysis(video_path)
+    elif assessment_type == "sit-ups":
+        return run_situp_analysis(video_path)
+    elif assessment_type == "vertical-jump":
+        return run_vertical_jump_analysis(video_path)
+    elif assessment_type == "shuttle-run":
+        return run_shuttle_run_analysis(video_path)
+    return {"error": f"Unsupported assessment type: {assessment_type}"}
+
 def main():
-    if len(sys.argv) != 3:
-        print(json.dumps({"error": "Usage: python ai_analysis_wrapper.py <video_path> <assessment_type>"}))
+    if len(sys.argv) not in (3, 4):
+        print(json.dumps({"error": "Usage: python ai_analysis_wrapper.py <video_path> <assessment_type> [live|background]"}))
         sys.exit(1)
     
     video_path = sys.argv[1]
     assessment_type = sys.argv[2]
+    priority = sys.argv[3] if len(sys.argv) == 4 else "live"
+    # Set when job_scheduler.py runs this wrapper for a queued job
+    scheduled_job = os.environ.get("AI_SCHEDULER_JOB") == "1"
     
     # Check if video file exists
     if not os.path.exists(video_path):
         print(json.dumps({"error": f"Video file not found: {video_path}"}))
         sys.exit(1)
     
+    progress = ProgressReporter.from_env(source="wrapper")
+    progress.stage("started", assessment_type=assessment_type)
+
     try:
-        # Route to appropriate analysis function
-        if assessment_type == "push-ups":
-            result = run_pushup_analysis(video_path)
-        elif assessment_type == "sit-ups":
-            result = run_situp_analysis(video_path)
-        elif assessment_type == "vertical-jump":
-            result = run_vertical_jump_analysis(video_path)
-        elif assessment_type == "shuttle-run":
-            result = run_shuttle_run_analysis(video_path)
-        else:
-            result = {"error": f"Unsupported assessment type: {assessment_type}"}
-        
+        result = None
+        cache = None
+        fingerprint = None
+        if not scheduled_job:
+            # The same clip analyzed before by the same code: answer from the cache
+            cache = ResultCache(video_path, assessment_type)
+            result = cache.get()
+            if result is not None:
+                result["cache"] = {"hit": True, "key": cache.key}
+                progress.stage("cached", key=cache.key)
+
+        if result is None and not scheduled_job:
+            # Pre-flight: reject videos that cannot produce a result before any inference
+            from video_probe import probe_video  # imports cv2: not needed for a cache hit
+            probe = probe_video(video_path, check_pose=PREFLIGHT_POSE_CHECK)
+            if probe["ok"]:
+                # frames too large for a worker would risk an OOM kill mid-batch
+                memory_reason = check_job_memory(probe["metadata"])
+                if memory_reason:
+                    probe.update(ok=False, reason=memory_reason)
+            progress.stage("probed", ok=probe["ok"], reason=probe["reason"])
+            if not probe["ok"]:
+                result = {"error": f"Video rejected: {probe['reason']}", "rejected": True,
+                          "video_metadata": probe["metadata"]}
+            else:
+                # Re-encoded or trimmed re-uploads: flag them, and answer a full
+                # copy from the original's cached result
+                from video_fingerprint import check_duplicates, duplicate_result
+                fingerprint = check_duplicates(video_path, content_hash(video_path))
+                if fingerprint is not None:
+                    result = duplicate_result(fingerprint, assessment_type)
+                    progress.stage("fingerprinted", near_duplicates=len(fingerprint["matches"]),
+                                   reused=result is not None)
+            if result is None and probe["ok"] and scheduler_available():
+                # Queue behind other submissions; the probed length is the job's cost
+                try:
+                    result, queue = submit_to_scheduler(video_path, assessment_type, priority,
+                                                        probe["metadata"], progress_fd())
+                    result["queue"] = queue
+                except (OSError, ValueError):
+                    result = None  # scheduler gone: analyze directly
+
+        if result is None:
+            result = run_assessment(video_path, assessment_type)
+        if fingerprint is not None and "duplicate_of" not in result:
+            from video_fingerprint import record_fingerprint
+            record_fingerprint(fingerprint, video_path, assessment_type, result, content_hash(video_path))
+        if not scheduled_job:
+            result.pop("trajectory", None)  # only the fingerprint index uses it
+        if cache is not None and not result.get("cache"):
+            cache.put(result)
+        if not scheduled_job and not result.get("error"):
+            from overlay_render import overlay_enabled, start_overlay
+            if overlay_enabled():
+                # skeleton overlay for reviewers, rendered in the background
+                start_overlay(video_path, assessment_type, result)
+        
+        progress.stage("finished", error=result.get("error"))
+
         # Ensure the result is valid JSON
         json_result = json.dumps(result, indent=2)
         print(json_result)
@@ -275,4 +328,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,58 @@
+"""
+Analysis Budget
+Time/frame budget the analyzers check cooperatively, so a long video stops
+cleanly with partial results instead of being killed by the wrapper timeout.
+Set through the AI_MAX_SECONDS and AI_MAX_FRAMES environment variables.
+"""
+
+import os
+import time
+
+
+def _env_number(name, cast):
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+class AnalysisBudget:
+    """Wall-clock and frame limits for one analyzer run."""
+
+    def __init__(self, max_seconds=None, max_frames=None):
+        self.max_seconds = max_seconds
+        self.max_frames = max_frames
+        self.started = time.monotonic()
+        self.stopped = False  # True once the budget cut the run short
+
+    @classmethod
+    def from_env(cls):
+        return cls(_env_number("AI_MAX_SECONDS", float), _env_number("AI_MAX_FRAMES", int))
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def exhausted(self, frames_done):
+        """Check before decoding the next frame; remembers that the run was cut short."""
+        if self.max_frames is not None and frames_done >= self.max_frames:
+            self.stopped = True
+        elif self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            self.stopped = True
+        return self.stopped
+
+    def result_fields(self, frames_done, fps, start_frame=0):
+        """The `partial` flag and processed range every analyzer adds to its result."""
+        fps = fps if fps and fps > 0 else None
+        return {
+            "partial": self.stopped,
+            "processed_range": {
+                "start_frame": start_frame,
+                "end_frame": start_frame + frames_done,
+                "start_sec": round(start_frame / fps, 3) if fps else None,
+                "end_sec": round((start_frame + frames_done) / fps, 3) if fps else None,
+            },
+        }
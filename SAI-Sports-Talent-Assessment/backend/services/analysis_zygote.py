@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Analysis Zygote
+Long-lived process that imports cv2/mediapipe/numpy once and pre-compiles the
+analyzer scripts, then keeps a few forked standby children ready. Each standby
+builds its Pose graphs right after the fork and then serves jobs one at a time,
+rebuilding the graphs between jobs, so a job starts with a warm interpreter and
+ready graphs while still running outside the zygote (crash isolation, hard
+per-job timeout). A standby exits and is replaced after a number of jobs or
+once its RSS passes a ceiling (worker_pool.py), so memory that MediaPipe and
+OpenCV keep across videos cannot build up.
+
+Graphs cannot be built in the zygote itself: MediaPipe/TFLite start internal
+threads and allocator state that do not survive fork (children crash with heap
+corruption), so only imports and compilation happen before forking.
+
+Jobs in one standby stay as isolated as separate processes for the analyzers'
+own code: after every job the standby drops the sibling modules the job
+imported (landmark_stream, technique, keyframes, landmark_predictor, ...), so
+the next job imports them fresh and no module-level state carries over.
+What jobs still share: the modules imported before the fork (cv2, numpy,
+mediapipe, fast_imports), prebuilt Pose graphs a job did not take, the
+compiled analyzer code, and process-level native state (allocator, thread
+pools). os.environ, sys.argv, the CPU affinity of every thread and OpenCV's
+thread count are restored after every job, so one job's AI_WORKER_CPUS /
+AI_WORKER_THREADS do not carry over to the next.
+
+Start:  python analysis_zygote.py [socket_path]
+Jobs are submitted with submit_job(); ai_analysis_wrapper.py does this
+automatically and falls back to a plain subprocess when no zygote is running.
+POSIX only (needs os.fork and Unix sockets).
+"""
+
+import array
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOCKET = os.environ.get("AI_ZYGOTE_SOCKET",
+                                os.path.join(tempfile.gettempdir(), "sai_analysis_zygote.sock"))
+ANALYZER_SCRIPTS = ["pushup.py", "situp_counter.py", "vertical_jump.py", "shuttle_run.py"]
+STANDBY_WORKERS = 2  # children kept ready with graphs built
+# Pose graphs each standby builds up front (every analyzer uses one)
+PREBUILT_POSES = [
+    {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5},
+]
+ALARM_GRACE_SECONDS = 5  # a job kills itself this long after its timeout
+# (jobs per standby and its RSS ceiling: see worker_pool.py)
+MAX_REQUEST_BYTES = 1 << 20
+
+
+# ---------------- CLIENT SIDE (no heavy imports) ----------------
+def zygote_available(socket_path=DEFAULT_SOCKET):
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX") and os.path.exists(socket_path)
+
+
+def _read_line(sock, buf, deadline):
+    while b"\n" not in buf:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout()
+        sock.settimeout(remaining)
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise OSError("Zygote job closed the connection without a response")
+        buf += chunk
+    line, _, rest = buf.partition(b"\n")
+    return json.loads(line.decode()), rest
+
+
+def submit_job(script, args, timeout, env=None, socket_path=DEFAULT_SOCKET, progress_fd=None):
+    """
+    Run `script args...` in a warm standby child of the zygote.
+    `progress_fd` is handed to the job (SCM_RIGHTS) as its AI_PROGRESS_FD.
+    Returns {"returncode", "stdout", "stderr", "timed_out", "worker"}, where
+    "worker" holds the standby's pid, job count and peak RSS. Raises OSError
+    only if the zygote cannot be reached, so callers can fall back.
+    """
+    request = {"script": script, "args": list(args), "timeout": timeout, "env": env or {},
+               "progress_fd": progress_fd is not None}
+    deadline = time.monotonic() + timeout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        data = json.dumps(request).encode() + b"\n"
+        if progress_fd is not None:
+            fds = array.array("i", [progress_fd])
+            sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+            data = data[sent:]
+        sock.sendall(data)
+        header, buf = _read_line(sock, b"", deadline)
+        try:
+            response, _ = _read_line(sock, buf, deadline)
+        except socket.timeout:
+            # the job runs in its own process, so a timeout only costs that process
+            try:
+                os.kill(header["pid"], signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            return {"returncode": -signal.SIGKILL, "stdout": "", "stderr": "", "timed_out": True}
+        except OSError:
+            # the job process died (crashed or was killed) before answering
+            return {"returncode": -1, "stdout": "", "stderr": "Analysis process exited without a result",
+                    "timed_out": False}
+    return response
+
+
+# ---------------- SERVER SIDE ----------------
+_code_cache = {}
+
+
+def _compile_script(path):
+    """Compile an analyzer once; recompile only when the file changes."""
+    mtime = os.path.getmtime(path)
+    cached = _code_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+    _code_cache[path] = (mtime, code)
+    return code
+
+
+def warm_up():
+    """Import the heavy modules and compile the analyzers (fork-safe work only)."""
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+    from fast_imports import import_mediapipe_headless
+    import_mediapipe_headless()
+
+    for name in ANALYZER_SCRIPTS:
+        path = os.path.join(SCRIPT_DIR, name)
+        if os.path.exists(path):
+            _compile_script(path)
+
+
+_ready_poses = []  # [(kwargs, Pose)] built but not yet handed out
+
+
+def _install_prebuilt_poses():
+    """
+    Build the Pose graphs now and make mp.solutions.pose.Pose hand them out
+    to the analyzer when it asks for the same settings. Called before every
+    job; graphs the previous job did not take are reused.
+    """
+    import mediapipe as mp
+
+    pose_cls = getattr(mp.solutions.pose, "_zygote_pose_cls", mp.solutions.pose.Pose)
+    mp.solutions.pose._zygote_pose_cls = pose_cls
+    for kwargs in PREBUILT_POSES:
+        if not any(prebuilt_kwargs == kwargs for prebuilt_kwargs, _ in _ready_poses):
+            _ready_poses.append((kwargs, pose_cls(**kwargs)))
+
+    def pose_factory(*args, **kwargs):
+        if not args:
+            for i, (prebuilt_kwargs, pose) in enumerate(_ready_poses):
+                if prebuilt_kwargs == kwargs:
+                    del _ready_poses[i]
+                    return pose
+        return pose_cls(*args, **kwargs)
+
+    mp.solutions.pose.Pose = pose_factory
+
+
+def _run_job(request):
+    """Run the analyzer as __main__ with stdout/stderr captured to temp files."""
+    script_path = os.path.join(SCRIPT_DIR, os.path.basename(request["script"]))
+    if not os.path.exists(script_path):
+        return {"returncode": 1, "stdout": "", "stderr": f"Unknown analyzer script: {request['script']}",
+                "timed_out": False}
+
+    import cv2
+    from worker_config import set_affinity
+
+    # the standby serves more jobs: restore what a job changes
+    saved_environ, saved_argv = dict(os.environ), sys.argv
+    saved_cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    saved_threads = cv2.getNumThreads()
+    os.environ.update({str(k): str(v) for k, v in request.get("env", {}).items()})
+    if request.get("received_fd") is not None:
+        os.environ["AI_PROGRESS_FD"] = str(request["received_fd"])
+    else:
+        os.environ.pop("AI_PROGRESS_FD", None)
+    sys.argv = [script_path] + [str(a) for a in request.get("args", [])]
+    out_f = tempfile.TemporaryFile()
+    err_f = tempfile.TemporaryFile()
+    saved_out, saved_err = os.dup(1), os.dup(2)
+    os.dup2(out_f.fileno(), 1)
+    os.dup2(err_f.fileno(), 2)
+    code = 0
+    try:
+        exec(_compile_script(script_path), {"__name__": "__main__", "__file__": script_path})
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_out, 1)
+        os.dup2(saved_err, 2)
+        os.close(saved_out)
+        os.close(saved_err)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        sys.argv = saved_argv
+        if saved_cpus is not None:
+            set_affinity(saved_cpus)
+        cv2.setNumThreads(saved_threads)
+
+    out_f.seek(0)
+    err_f.seek(0)
+    with out_f, err_f:
+        return {"returncode": code, "stdout": out_f.read().decode(errors="replace"),
+                "stderr": err_f.read().decode(errors="replace"), "timed_out": False}
+
+
+def _recv_with_fd(conn):
+    """First chunk of a request plus the file descriptor passed along with it."""
+    fds = array.array("i")
+    data, ancdata, _, _ = conn.recvmsg(65536, socket.CMSG_SPACE(fds.itemsize))
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - (len(payload) % fds.itemsize)])
+    return data, (fds[0] if fds else None)
+
+
+def _serve_one(conn, policy):
+    """Run one job received on `conn`; returns its peak RSS in MB."""
+    from worker_pool import RssSampler
+
+    # the progress descriptor, if any, arrives with the first bytes of the request
+    data, received_fd = _recv_with_fd(conn)
+    while not data.endswith(b"\n") and len(data) < MAX_REQUEST_BYTES:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    sampler = RssSampler()
+    try:
+        request = json.loads(data.decode())
+        request["received_fd"] = received_fd
+        conn.sendall(json.dumps({"pid": os.getpid()}).encode() + b"\n")
+        # Backstop for a client that vanished: SIGALRM's default action ends
+        # the process even if it is stuck inside native code
+        signal.alarm(int(float(request.get("timeout", 30))) + ALARM_GRACE_SECONDS)
+        with sampler:
+            response = _run_job(request)
+        signal.alarm(0)
+    except Exception as e:
+        response = {"returncode": 1, "stdout": "", "stderr": f"Zygote error: {e}", "timed_out": False}
+    finally:
+        if received_fd is not None:
+            os.close(received_fd)
+    peak = round(sampler.peak_mb, 1) if sampler.peak_mb is not None else None
+    response["worker"] = {"pid": os.getpid(), "job": policy.jobs + 1, "peak_rss_mb": peak,
+                          "start_rss_mb": round(sampler.start_mb, 1) if sampler.start_mb else None}
+    try:
+        conn.sendall(json.dumps(response).encode() + b"\n")
+    except OSError:
+        pass
+    return peak
+
+
+def _sibling_modules():
+    """Names of loaded modules that are files of this directory (the analyzers' helpers)."""
+    names = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == SCRIPT_DIR:
+            names.append(name)
+    return names
+
+
+def _evict_job_modules(keep):
+    """Forget the sibling modules a job imported, so the next job starts from fresh copies."""
+    for name in _sibling_modules():
+        if name not in keep:
+            del sys.modules[name]
+
+
+def _standby(server, keep_modules):
+    """Body of a standby child: build graphs, serve jobs until recycled."""
+    from worker_pool import RecyclePolicy
+
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    policy = RecyclePolicy()
+    while True:
+        _install_prebuilt_poses()
+        conn, _ = server.accept()
+        with conn:
+            policy.record(_serve_one(conn, policy))
+        _evict_job_modules(keep_modules)
+        gc.collect()  # drop the finished job's frames and modules before measuring RSS
+        reason = policy.recycle_reason()
+        if reason:
+            print(json.dumps({"status": "recycling", "pid": os.getpid(), "reason": reason,
+                              "jobs": policy.jobs, "peak_rss_mb": round(policy.peak_mb, 1)}),
+                  file=sys.stderr, flush=True)
+            return
+
+
+def serve(socket_path=DEFAULT_SOCKET, standby_workers=STANDBY_WORKERS):
+    sys.path.insert(0, SCRIPT_DIR)  # analyzers import their sibling modules
+    warm_up()
+    keep_modules = set(_sibling_modules())  # imported before the fork: shared by all jobs
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    print(json.dumps({"status": "ready", "socket": socket_path, "pid": os.getpid()}), flush=True)
+
+    children = {}
+    try:
+        while True:
+            while len(children) < standby_workers:
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        _standby(server, keep_modules)
+                    finally:
+                        os._exit(0)
+                children[pid] = time.monotonic()
+            pid, _ = os.wait()
+            started = children.pop(pid, None)
+            # a standby dying right away (e.g. graph build failure) must not spin
+            if started is not None and time.monotonic() - started < 1.0:
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    if not hasattr(os, "fork"):
+        print(json.dumps({"error": "The analysis zygote needs os.fork (POSIX only)"}))
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET)
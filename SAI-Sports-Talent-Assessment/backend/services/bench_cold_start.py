@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Cold-Start Benchmark
+Measures how long a fresh analyzer process takes before it can work on the
+first frame: an `-X importtime` breakdown of the analyzer's own import chain
+(its module-level imports, the sibling helpers they pull in, MediaPipe and
+the stream consumers it loads), plus the time to build its pose backend and
+process one frame. Compares both against a budget and exits non-zero when
+over it.
+
+Usage: python bench_cold_start.py [--analyzer pushup.py] [--runs N] [--top N] [--eager]
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- BUDGET ----------------
+IMPORT_BUDGET_MS = 700        # analyzer imports + mediapipe (headless) + stream consumers
+FIRST_FRAME_BUDGET_MS = 1500  # imports + pose backend + first process() call
+# ----------------------------------------
+
+DEFAULT_ANALYZER = "pushup.py"
+# after the analyzer's own imports, what it loads before the first frame
+HEADLESS_IMPORTS = "from fast_imports import import_mediapipe_headless; import_mediapipe_headless()"
+EAGER_IMPORTS = "import mediapipe"
+STREAM_IMPORTS = "from landmark_stream import LandmarkStream; LandmarkStream.from_env(30.0, source={source!r})"
+
+FIRST_FRAME_SNIPPET = """
+import time
+t0 = time.perf_counter()
+{imports}
+t1 = time.perf_counter()
+import numpy as np
+from pose_backend import make_backend
+pose = make_backend(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+t2 = time.perf_counter()
+pose.process(np.zeros((480, 640, 3), dtype=np.uint8))
+t3 = time.perf_counter()
+print("TIMES", (t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t2) * 1000)
+"""
+
+
+def analyzer_imports(script, eager=False):
+    """Source of everything `script` imports before its first frame."""
+    with open(os.path.join(SCRIPT_DIR, script), encoding="utf-8") as f:
+        source = f.read()
+    lines = [ast.get_source_segment(source, node) for node in ast.parse(source).body
+             if isinstance(node, (ast.Import, ast.ImportFrom))]
+    lines.append(EAGER_IMPORTS if eager else HEADLESS_IMPORTS)
+    lines.append(STREAM_IMPORTS.format(source=os.path.splitext(os.path.basename(script))[0]))
+    return "\n".join(lines)
+
+
+def parse_importtime(stderr):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def importtime_breakdown(imports, top):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", imports],
+                          cwd=SCRIPT_DIR, capture_output=True, text=True)
+    rows = parse_importtime(proc.stderr)
+    total_us = sum(r[2] for r in rows if r[3] == 0)
+    # group by top-level package so the report shows where the time goes
+    by_package = {}
+    for name, self_us, _, _ in rows:
+        pkg = name.split(".")[0]
+        by_package[pkg] = by_package.get(pkg, 0) + self_us
+    heaviest = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return total_us / 1000.0, [{"package": p, "self_ms": round(us / 1000.0, 1)} for p, us in heaviest]
+
+
+def first_frame_times(imports, runs):
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", FIRST_FRAME_SNIPPET.format(imports=imports)],
+                              cwd=SCRIPT_DIR, capture_output=True, text=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith("TIMES"):
+                samples.append([float(v) for v in line.split()[1:]])
+    if not samples:
+        return None
+    # median of each stage across runs
+    stages = list(zip(*samples))
+    med = [sorted(s)[len(s) // 2] for s in stages]
+    return {"imports_ms": round(med[0], 1), "graph_build_ms": round(med[1], 1),
+            "first_frame_ms": round(med[2], 1), "total_ms": round(sum(med), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzer cold-start benchmark")
+    parser.add_argument("--analyzer", default=DEFAULT_ANALYZER, help="analyzer script whose start-up is measured")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to list")
+    parser.add_argument("--eager", action="store_true", help="measure a plain `import mediapipe` for comparison")
+    args = parser.parse_args()
+
+    imports = analyzer_imports(args.analyzer, args.eager)
+    import_ms, heaviest = importtime_breakdown(imports, args.top)
+    startup = first_frame_times(imports, args.runs)
+    if startup is None:
+        print(json.dumps({"error": "Benchmark process failed; are cv2/mediapipe installed?"}))
+        sys.exit(1)
+
+    report = {
+        "analyzer": args.analyzer,
+        "mode": "eager" if args.eager else "headless",
+        "importtime_total_ms": round(import_ms, 1),
+        "heaviest_packages": heaviest,
+        "startup": startup,
+        "budget": {"imports_ms": IMPORT_BUDGET_MS, "first_frame_total_ms": FIRST_FRAME_BUDGET_MS},
+    }
+    report["within_budget"] = (startup["imports_ms"] <= IMPORT_BUDGET_MS and
+                               startup["total_ms"] <= FIRST_FRAME_BUDGET_MS)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["within_budget"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Pose Backend Benchmark
+Frames per second of the pose backends (pose_backend.py) on this CPU: the
+MediaPipe solutions API one frame per call, and the TFLite landmark model at
+several batch sizes. The thread count follows AI_WORKER_THREADS /
+AI_WORKER_CPUS as in a worker. The solutions figure includes person
+detection and tracking; the TFLite one is the landmark model alone on
+pre-cropped frames, which is what an offline batch with known crops runs.
+
+Usage: python bench_pose_backend.py [--frames N] [--batch 1,4,8,16] [--video PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from worker_config import apply_worker_config
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE = os.path.join(SCRIPT_DIR, "ref_front.jpeg")
+
+
+def load_frames(source, n):
+    import cv2
+    frames = []
+    cap = cv2.VideoCapture(source)
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return [frames[i % len(frames)] for i in range(n)] if frames else []  # repeat short videos / an image
+
+
+def bench(backend, frames, batch):
+    backend.process_batch(frames[:batch])  # warm-up (and tensor allocation for this batch size)
+    detected = 0
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        detected += sum(r is not None for r in backend.process_batch(frames[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    return {"batch": batch, "fps": round(len(frames) / elapsed, 1) if elapsed > 0 else None,
+            "detected": detected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pose backend throughput benchmark")
+    parser.add_argument("--frames", type=int, default=64, help="frames per measurement")
+    parser.add_argument("--batch", default="1,4,8,16", help="TFLite batch sizes to try")
+    parser.add_argument("--video", default=DEFAULT_IMAGE, help="video or image to process")
+    args = parser.parse_args()
+
+    apply_worker_config()
+    from pose_backend import SolutionsBackend, TFLiteBackend
+    from worker_config import tflite_threads
+
+    frames = load_frames(args.video, args.frames)
+    if not frames:
+        print(json.dumps({"error": f"Could not read frames from {args.video}"}))
+        sys.exit(1)
+
+    results = []
+    backend = SolutionsBackend()
+    results.append(dict(backend="solutions", **bench(backend, frames, 1)))
+    backend.close()
+
+    try:
+        backend = TFLiteBackend()
+    except (ImportError, FileNotFoundError) as e:
+        results.append({"backend": "tflite", "error": str(e)})
+    else:
+        for batch in [int(b) for b in args.batch.split(",") if b.strip()]:
+            results.append(dict(backend="tflite", threads=tflite_threads(), **bench(backend, frames, batch)))
+        backend.close()
+
+    valid = [r for r in results if r.get("fps")]
+    best = max(valid, key=lambda r: r["fps"]) if valid else None
+    print(json.dumps({"frames": len(frames), "frame_size": list(frames[0].shape[:2]), "results": results,
+                      "best": best and {"backend": best["backend"], "batch": best["batch"],
+                                        "fps": best["fps"]}}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
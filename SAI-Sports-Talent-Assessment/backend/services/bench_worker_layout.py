@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Worker Layout Benchmark
+Finds the processes x threads layout with the highest pose throughput for a
+core count. Each candidate runs P concurrent worker processes, each pinned to
+its share of the cores with a matching thread count (worker_config.plan_layout),
+and processes the same frames; "unpinned" candidates run P processes with
+default settings to show the cost of oversubscription.
+
+Usage: python bench_worker_layout.py [--cores N] [--frames N] [--video PATH] [--no-unpinned]
+Use the reported best "processes" as AI_SCHEDULER_WORKERS.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from worker_config import available_cpus, format_cpu_list, plan_layout, worker_env
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE = os.path.join(SCRIPT_DIR, "ref_front.jpeg")
+
+CHILD_SNIPPET = """
+import sys, time
+from worker_config import apply_worker_config
+apply_worker_config()
+import cv2
+from fast_imports import import_mediapipe_headless
+mp = import_mediapipe_headless()
+source, n = sys.argv[1], int(sys.argv[2])
+frames = []
+cap = cv2.VideoCapture(source)
+while len(frames) < n:
+    ret, frame = cap.read()
+    if not ret:
+        break
+    frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+if not frames:
+    sys.exit(1)
+frames = [frames[i % len(frames)] for i in range(n)]  # repeat short videos / a single image
+pose = mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+pose.process(frames[0])  # warm-up
+t0 = time.time()
+for f in frames:
+    pose.process(f)
+print("TIMES", t0, time.time(), len(frames))
+"""
+
+
+def candidate_layouts(cores):
+    """Processes counts to try: every divisor of the core count."""
+    return [p for p in range(1, cores + 1) if cores % p == 0]
+
+
+def run_layout(processes, cpus, frames, source, pinned):
+    slots = plan_layout(processes, cpus) if pinned else [(None, None)] * processes
+    procs = []
+    start = time.perf_counter()
+    for threads, slot_cpus in slots:
+        env = dict(os.environ)
+        if pinned:
+            env.update(worker_env(threads, slot_cpus))
+        procs.append(subprocess.Popen([sys.executable, "-c", CHILD_SNIPPET, source, str(frames)],
+                                      cwd=SCRIPT_DIR, env=env, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True))
+    spans = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        for line in out.splitlines():
+            if line.startswith("TIMES"):
+                _, t0, t1, n = line.split()
+                spans.append((float(t0), float(t1), int(n)))
+    wall = time.perf_counter() - start
+    # throughput over the window in which the workers were processing frames
+    # (from the first worker starting to the last one finishing)
+    throughput = None
+    if len(spans) == processes:
+        window = max(t1 for _, t1, _ in spans) - min(t0 for t0, _, _ in spans)
+        throughput = round(sum(n for _, _, n in spans) / window, 1) if window > 0 else None
+    return {
+        "processes": processes,
+        "threads_per_process": slots[0][0] if pinned else "default",
+        "pinned": pinned,
+        "cpus": [format_cpu_list(c) for _, c in slots] if pinned else None,
+        "worker_fps": [round(n / (t1 - t0), 1) for t0, t1, n in spans if t1 > t0],
+        "throughput_fps": throughput,
+        "wall_sec": round(wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker processes x threads layout benchmark")
+    parser.add_argument("--cores", type=int, default=None, help="cores to use (default: all available)")
+    parser.add_argument("--frames", type=int, default=60, help="frames processed per worker")
+    parser.add_argument("--video", default=DEFAULT_IMAGE, help="video or image to process")
+    parser.add_argument("--no-unpinned", action="store_true", help="skip the unpinned baselines")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    if args.cores:
+        cpus = cpus[:args.cores]
+    results = []
+    for processes in candidate_layouts(len(cpus)):
+        results.append(run_layout(processes, cpus, args.frames, args.video, pinned=True))
+        if not args.no_unpinned and processes > 1:
+            results.append(run_layout(processes, cpus, args.frames, args.video, pinned=False))
+
+    valid = [r for r in results if r["throughput_fps"]]
+    if not valid:
+        print(json.dumps({"error": "No worker produced a result; are cv2/mediapipe installed?"}))
+        sys.exit(1)
+    best = max((r for r in valid if r["pinned"]), key=lambda r: r["throughput_fps"])
+    print(json.dumps({"cores": len(cpus), "frames_per_worker": args.frames, "results": results,
+                      "best": {"processes": best["processes"],
+                               "threads_per_process": best["threads_per_process"],
+                               "throughput_fps": best["throughput_fps"]}}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Analysis Checkpoints
+Periodically saves an analyzer's state (next frame index, smoothing windows,
+counters, per-frame signal collected so far) so that re-running the same
+analyzer on the same video with the same settings resumes where the previous
+run stopped instead of decoding and running pose inference from frame 0.
+
+A checkpoint is keyed by the video (path, size, mtime), the analyzer source,
+its tuning config and the pipeline settings that shape the saved state
+(PIPELINE_ENV: inference stride, pose backend, stream consumers), so any
+change to one of them starts from scratch.
+Set AI_CHECKPOINT_DIR to choose where checkpoints live; AI_CHECKPOINT=0
+disables them.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import cv2
+
+# ---------------- CONFIG ----------------
+CHECKPOINT_DIR = os.environ.get("AI_CHECKPOINT_DIR",
+                                os.path.join(tempfile.gettempdir(), "sai_checkpoints"))
+CHECKPOINT_EVERY_FRAMES = 150    # save at most once per this many frames...
+CHECKPOINT_MIN_INTERVAL_S = 2.0  # ...and no more often than this
+CHECKPOINT_MAX_AGE_S = 24 * 3600  # older checkpoints are ignored and removed
+# Environment settings every analyzer's saved state depends on
+PIPELINE_ENV = ["AI_INFER_EVERY", "AI_POSE_BACKEND", "AI_STREAM_CONSUMERS", "AI_OVERLAY"]
+# ----------------------------------------
+
+
+def checkpoints_enabled():
+    return os.environ.get("AI_CHECKPOINT", "1").strip() not in ("0", "false", "no")
+
+
+def pipeline_config():
+    return {name: os.environ.get(name, "").strip() for name in PIPELINE_ENV}
+
+
+def checkpoint_key(video_path, script_path, config=None):
+    """Stable key for (video file, analyzer source, analyzer config, pipeline settings)."""
+    st = os.stat(video_path)
+    h = hashlib.sha1()
+    h.update(os.path.abspath(video_path).encode())
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(script_path, "rb") as f:
+        h.update(f.read())
+    h.update(json.dumps(config or {}, sort_keys=True).encode())
+    h.update(json.dumps(pipeline_config(), sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class AnalysisCheckpoint:
+    """Load, periodically save and finally clear one analyzer run's state."""
+
+    def __init__(self, video_path, script_path, config=None, directory=CHECKPOINT_DIR,
+                 every_frames=CHECKPOINT_EVERY_FRAMES, min_interval=CHECKPOINT_MIN_INTERVAL_S):
+        self.enabled = checkpoints_enabled()
+        self.every_frames = every_frames
+        self.min_interval = min_interval
+        self.path = None
+        if self.enabled:
+            try:
+                key = checkpoint_key(video_path, script_path, config)
+                self.path = os.path.join(directory, key + ".json")
+            except OSError:
+                self.enabled = False
+        self._last_frame = 0
+        self._last_time = time.monotonic()
+
+    def load(self):
+        """Return the saved state dict (with its "frame" index) or None."""
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        try:
+            if time.time() - os.path.getmtime(self.path) > CHECKPOINT_MAX_AGE_S:
+                self.clear()
+                return None
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._last_frame = state.get("frame", 0)
+        return state
+
+    def due(self, frame):
+        return (self.enabled and frame - self._last_frame >= self.every_frames and
+                time.monotonic() - self._last_time >= self.min_interval)
+
+    def save(self, frame, state):
+        """Atomically write `state` (JSON-serialisable) as of the next frame `frame`."""
+        if not self.enabled:
+            return
+        payload = dict(state, frame=frame)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + f".{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return  # a failed checkpoint must never fail the analysis
+        self._last_frame = frame
+        self._last_time = time.monotonic()
+
+    def finish(self, frame, state, stopped):
+        """Keep the state for a resume if the run was cut short, else drop it."""
+        if stopped:
+            self.save(frame, state)
+        else:
+            self.clear()
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def seek_to_frame(cap, frame):
+    """
+    Position `cap` so the next read() returns frame `frame`. Falls back to
+    grabbing (decode without conversion) when the container cannot seek
+    accurately. Returns False if the video is shorter than `frame`.
+    """
+    if frame <= 0:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame):
+        if not cap.grab():
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return False
+    return True
@@ -0,0 +1,114 @@
+"""
+Early Abort
+Stops an analyzer from decoding a whole video nobody is in. When no athlete
+(landmarks with enough visibility) has been seen for a window of frames, a few
+single frames further ahead are checked at exponentially growing distances.
+If none shows the athlete the rest of the video is given up; if one does, the
+analyzer resumes from the last probed position that was still empty.
+
+The opening window is short, so a video without an athlete costs about a
+second; once the athlete has been seen, a longer gap is tolerated (e.g. leaving
+the frame at a shuttle turn). AI_ABORT_WINDOW_S overrides the opening window;
+0 disables the policy.
+"""
+
+import os
+
+import cv2
+
+# ---------------- CONFIG ----------------
+ABORT_WINDOW_S = 1.0   # seconds without any athlete at the start before probing ahead
+GAP_WINDOW_S = 3.0     # same, once the athlete has been seen
+MIN_VISIBILITY = 0.5   # mean visibility a landmark group needs to count as "seen"
+MAX_PROBES = 8         # probes per gap: window, 2x, 4x, ... past the gap
+DEFAULT_FPS = 30.0     # used when the container does not report fps
+# ----------------------------------------
+
+
+def _window_seconds():
+    value = os.environ.get("AI_ABORT_WINDOW_S", "").strip()
+    try:
+        return float(value) if value else ABORT_WINDOW_S
+    except ValueError:
+        return ABORT_WINDOW_S
+
+
+class EarlyAbortPolicy:
+    """
+    Sliding no-athlete window plus exponential look-ahead probes.
+    `landmark_groups` lists landmark index tuples (e.g. one per body side);
+    the athlete counts as seen when any group reaches MIN_VISIBILITY.
+    """
+
+    def __init__(self, fps, frame_count, landmark_groups, window_s=None,
+                 min_visibility=MIN_VISIBILITY, max_probes=MAX_PROBES):
+        window_s = _window_seconds() if window_s is None else window_s
+        fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.enabled = window_s > 0
+        self.opening_window = max(1, int(round(window_s * fps)))
+        self.gap_window = max(self.opening_window, int(round(GAP_WINDOW_S * fps)))
+        self.window = self.opening_window  # becomes gap_window after the first sighting
+        self.frame_count = int(frame_count) if frame_count and frame_count > 0 else None
+        self.groups = [tuple(int(i) for i in g) for g in landmark_groups]
+        self.min_visibility = min_visibility
+        self.max_probes = max_probes
+        self.last_seen = 0        # frame index from which the current gap is measured
+        self.probes = []          # (frame index, athlete seen) for every probe made
+        self.frames_skipped = 0
+        self.aborted_at = None    # frame index at which the rest was given up
+
+    def athlete_visible(self, landmarks):
+        if not landmarks:
+            return False
+        for group in self.groups:
+            if sum(landmarks[i].visibility for i in group) / len(group) >= self.min_visibility:
+                return True
+        return False
+
+    def observe(self, frame_index, landmarks):
+        """Record one processed frame; True when the gap is long enough to probe ahead."""
+        if not self.enabled:
+            return False
+        if self.athlete_visible(landmarks):
+            self.last_seen = frame_index
+            self.window = self.gap_window
+            return False
+        return frame_index - self.last_seen >= self.window
+
+    def probe_ahead(self, cap, pose, frame_index):
+        """
+        Check single frames at frame_index + window * 2^k. Returns the frame
+        index `cap` was positioned at to continue, or None if the athlete never
+        showed up (the caller should stop decoding).
+        """
+        resume = frame_index
+        for k in range(self.max_probes):
+            target = frame_index + self.window * (2 ** k)
+            if self.frame_count is not None and target >= self.frame_count:
+                target = self.frame_count - 1
+                if target <= resume:
+                    break
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            seen = self.athlete_visible(res.pose_landmarks.landmark if res.pose_landmarks else None)
+            self.probes.append((target, seen))
+            if seen:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, resume)
+                self.frames_skipped += resume - frame_index
+                self.last_seen = resume
+                return resume
+            resume = target
+            if self.frame_count is not None and target >= self.frame_count - 1:
+                break
+        self.aborted_at = frame_index
+        return None
+
+    def report(self):
+        """Summary added to the analyzer result (None if the policy never acted)."""
+        if not self.probes and self.aborted_at is None:
+            return None
+        return {"window_frames": self.window, "probes": [p for p, _ in self.probes],
+                "frames_skipped": self.frames_skipped, "aborted_at_frame": self.aborted_at}
@@ -0,0 +1,41 @@
+"""
+Fast Imports
+Helpers that keep the analyzers' cold start short. `import mediapipe` pulls in
+its drawing utilities, which import matplotlib.pyplot (roughly half of the
+whole mediapipe import time) even though the analyzers never draw anything.
+"""
+
+import importlib
+import sys
+import types
+
+# Modules imported by mediapipe that the headless analyzers never use
+HEADLESS_DEFERRED_MODULES = ["matplotlib.pyplot"]
+
+
+class _DeferredModule(types.ModuleType):
+    """Placeholder that imports the real module on first attribute access."""
+
+    def __getattr__(self, attr):
+        real = sys.modules.get(self.__name__)
+        if real is self:
+            del sys.modules[self.__name__]
+            real = importlib.import_module(self.__name__)
+            self.__dict__.update(real.__dict__)
+        return getattr(real, attr)
+
+
+def defer_module(name):
+    """Register a placeholder for `name` unless it is already imported."""
+    if name not in sys.modules:
+        sys.modules[name] = _DeferredModule(name)
+    return sys.modules[name]
+
+
+def import_mediapipe_headless():
+    """Import mediapipe without paying for its plotting dependencies."""
+    if "mediapipe" not in sys.modules:
+        for name in HEADLESS_DEFERRED_MODULES:
+            defer_module(name)
+    import mediapipe
+    return mediapipe
@@ -0,0 +1,89 @@
+"""
+Frame Quality Scoring
+Cheap per-frame quality score for height estimation (landmark visibility,
+stillness, body-in-frame) and a top-K frame index, so the expensive
+estimation only runs on the frames that matter.
+"""
+
+import heapq
+
+import numpy as np
+import mediapipe as mp
+
+PL = mp.solutions.pose.PoseLandmark
+
+# ---------------- CONFIG ----------------
+HEAD_IDS = [0, 1, 2, 3, 4, 5, 6]  # nose, eyes, ears, mouth-ish (as in height1.py)
+LEFT_FOOT_ID = 31
+RIGHT_FOOT_ID = 32
+MIN_VISIBILITY = 0.5   # head and at least one ankle must be at least this visible
+STILLNESS_GAIN = 50.0  # how hard hip motion (normalized units/frame) is penalized
+# ----------------------------------------
+
+
+def hip_center(landmarks):
+    return np.array([(landmarks[PL.LEFT_HIP].x + landmarks[PL.RIGHT_HIP].x) / 2.0,
+                     (landmarks[PL.LEFT_HIP].y + landmarks[PL.RIGHT_HIP].y) / 2.0])
+
+
+def body_in_frame(landmarks, top_max=1.0, feet_min=0.0):
+    """
+    height1.py's framing check on normalized coordinates: head top above
+    top_max and feet below feet_min, both inside the image. height1.py's live
+    check corresponds to top_max=0.08, feet_min=0.9.
+    """
+    top = min(landmarks[i].y for i in HEAD_IDS)
+    feet = (landmarks[LEFT_FOOT_ID].y + landmarks[RIGHT_FOOT_ID].y) / 2.0
+    return 0.0 <= top < top_max and feet_min < feet <= 1.0
+
+
+def score_frame(landmarks, prev_center=None, top_max=1.0, feet_min=0.0):
+    """
+    Return (score, hip_center). Score is 0 for unusable frames, otherwise
+    visibility * stillness * body extent, so larger, still, fully visible
+    athletes rank first. Pass the returned center back in for the next frame.
+    The default limits only require head and feet inside the image; pass
+    top_max / feet_min (see body_in_frame) to reject loosely framed frames.
+    """
+    center = hip_center(landmarks)
+    head_vis = max(landmarks[i].visibility for i in HEAD_IDS)
+    ankle_vis = max(landmarks[PL.LEFT_ANKLE].visibility, landmarks[PL.RIGHT_ANKLE].visibility)
+    vis = min(head_vis, ankle_vis)
+    if vis < MIN_VISIBILITY or not body_in_frame(landmarks, top_max, feet_min):
+        return 0.0, center
+
+    motion = float(np.linalg.norm(center - prev_center)) if prev_center is not None else 0.0
+    stillness = 1.0 / (1.0 + STILLNESS_GAIN * motion)
+    extent = max(lm.y for lm in landmarks) - min(lm.y for lm in landmarks)
+    return vis * stillness * extent, center
+
+
+class TopKFrameIndex:
+    """Keeps the K best-scoring frames (with an optional payload) seen so far."""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # min-heap of (score, frame_idx, payload)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def offer(self, score, frame_idx, payload=None):
+        """Add a frame if it ranks in the top K. Returns True if it was kept."""
+        if score <= 0:
+            return False
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (score, frame_idx, payload))
+            return True
+        if score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (score, frame_idx, payload))
+            return True
+        return False
+
+    def frame_indices(self):
+        return sorted(idx for _, idx, _ in self._heap)
+
+    def entries(self):
+        """[(frame_idx, score, payload), ...] in frame order."""
+        return sorted(((idx, score, payload) for score, idx, payload in self._heap),
+                      key=lambda e: e[0])
@@ -3,10 +3,18 @@ import mediapipe as mp
 import numpy as np
 import math
 
+from frame_quality import score_frame, TopKFrameIndex
+
 # ---------------- CONFIG ----------------
 reference_image = "ref_front.jpeg"  # Front reference image
 target_video = "target_rotate1.mp4"
 reference_height_m = 1.665  # meters
+DEPTH_RATIO_RANGE = (0.5, 2.0)  # depth normalization is skipped outside this range
+TOP_K_FRAMES = 15  # only the best-scoring frames contribute to the estimate
+# body-in-frame check for a frame to count (height1.py's live check is 0.08 / 0.9,
+# a little looser here since recorded clips are framed less tightly)
+FRAME_TOP_MAX = 0.1    # head top above this share of the frame height
+FRAME_FEET_MIN = 0.85  # feet below this share of the frame height
 
 mp_pose = mp.solutions.pose
 
@@ -104,93 +112,125 @@ def scale_skeleton_depth(positions_3d, D_target, D_ref, anchor_index=0):
     scaled_landmarks = {lm: pos + anchor for lm, pos in scaled.items()}
     return scaled_landmarks
 
-# ---------------- PROCESS REFERENCE IMAGE ----------------
-print("Processing reference front image...")
-ref_img = cv2.imread(reference_image)
-if ref_img is None:
-    print("Error: cannot read reference image")
-    exit()
-h, w = ref_img.shape[:2]
-
-with mp_pose.Pose(min_detection_confidence=0.5) as pose:
-    res = pose.process(cv2.cvtColor(ref_img, cv2.COLOR_BGR2RGB))
-    if not res.pose_landmarks:
-        print("No pose detected in reference image")
-        exit()
-    ref_positions_3d = get_landmark_positions_3d(res.pose_landmarks.landmark, w, h)
-    ref_positions_2d = project_to_2d(ref_positions_3d)
-    ref_pixel_height = get_pixel_height(ref_positions_2d)
-    draw_fish_diagram(ref_img, ref_positions_2d, color=(0,0,255))
-    cv2.putText(ref_img, f"Ref Height: {ref_pixel_height}px", (20,40),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255),2)
-    cv2.imshow("Reference Front", ref_img)
-    cv2.waitKey(500)
-cv2.destroyAllWindows()
-
-# Reference average depth (shoulders + hips)
-ref_key_landmarks = [
+# Average depth is taken over shoulders + hips
+DEPTH_KEY_LANDMARKS = [
     mp_pose.PoseLandmark.LEFT_SHOULDER,
     mp_pose.PoseLandmark.RIGHT_SHOULDER,
     mp_pose.PoseLandmark.LEFT_HIP,
     mp_pose.PoseLandmark.RIGHT_HIP
 ]
-D_ref = get_average_depth(ref_positions_3d, key_landmarks=ref_key_landmarks)
-
-# ---------------- PROCESS TARGET VIDEO ----------------
-cap = cv2.VideoCapture(target_video)
-estimated_heights = []
-
-with mp_pose.Pose(min_detection_confidence=0.5) as pose:
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        hh, ww = frame.shape[:2]
-        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        if res.pose_landmarks:
-            positions_3d = get_landmark_positions_3d(res.pose_landmarks.landmark, ww, hh)
-            
-            # Rotate skeleton to front
-            rotated_3d = rotate_skeleton_to_front(positions_3d)
-            
-            # Compute target average depth (shoulders + hips)
-            target_key_landmarks = [
-                mp_pose.PoseLandmark.LEFT_SHOULDER,
-                mp_pose.PoseLandmark.RIGHT_SHOULDER,
-                mp_pose.PoseLandmark.LEFT_HIP,
-                mp_pose.PoseLandmark.RIGHT_HIP
-            ]
-            D_target = get_average_depth(rotated_3d, key_landmarks=target_key_landmarks)
-            
-            # Scale skeleton to match reference depth
-            scaled_3d = scale_skeleton_depth(rotated_3d, D_target=D_ref, D_ref=D_target,
-                                             anchor_index=mp_pose.PoseLandmark.LEFT_HIP.value)
-            
-            # Project back to 2D
-            rotated_2d = project_to_2d(scaled_3d)
-            draw_fish_diagram(frame, rotated_2d, color=(0,255,0))
-            
-            # Draw reference skeleton in red
-            draw_fish_diagram(frame, ref_positions_2d, color=(0,0,255))
-            
-            # Compute height
-            pixel_height = get_pixel_height(rotated_2d)
-            scale = pixel_height / ref_pixel_height if ref_pixel_height > 0 else 1
-            estimated_height_m = scale * reference_height_m
-            estimated_heights.append(estimated_height_m)
-            
-            cv2.putText(frame, f"Estimated Height: {estimated_height_m:.2f} m", (30,50),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0),2)
-
-        cv2.imshow("Height Estimation - Depth Normalized", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-cap.release()
-cv2.destroyAllWindows()
-
-if estimated_heights:
-    mean_height_m = sum(estimated_heights) / len(estimated_heights)
-    print(f"\nMean estimated height: {mean_height_m:.2f} m")
-else:
-    print("No heights could be estimated.")
+
+def process_reference(landmarks, img_w, img_h):
+    """Return the reference measurements the target frames are compared against."""
+    ref_positions_3d = get_landmark_positions_3d(landmarks, img_w, img_h)
+    ref_positions_2d = project_to_2d(ref_positions_3d)
+    return {
+        "positions_2d": ref_positions_2d,
+        "pixel_height": get_pixel_height(ref_positions_2d),
+        "depth": get_average_depth(ref_positions_3d, key_landmarks=DEPTH_KEY_LANDMARKS),
+    }
+
+def estimate_height_m(landmarks, img_w, img_h, ref):
+    """
+    Rotate one frame's skeleton to front, normalize its depth to the
+    reference and return (estimated height in m, projected 2D skeleton).
+    """
+    positions_3d = get_landmark_positions_3d(landmarks, img_w, img_h)
+
+    # Rotate skeleton to front
+    rotated_3d = rotate_skeleton_to_front(positions_3d)
+
+    # Compute target average depth (shoulders + hips)
+    D_target = get_average_depth(rotated_3d, key_landmarks=DEPTH_KEY_LANDMARKS)
+
+    # Scale skeleton to match reference depth. MediaPipe z is relative to the
+    # hips, so for side/back views the ratio can flip sign or blow up; in that
+    # case the (rotation-invariant) vertical extent is used unscaled
+    depth_ratio = ref["depth"] / D_target if D_target else 0.0
+    if DEPTH_RATIO_RANGE[0] <= depth_ratio <= DEPTH_RATIO_RANGE[1]:
+        scaled_3d = scale_skeleton_depth(rotated_3d, D_target=ref["depth"], D_ref=D_target,
+                                         anchor_index=mp_pose.PoseLandmark.LEFT_HIP.value)
+    else:
+        scaled_3d = rotated_3d
+
+    # Project back to 2D
+    rotated_2d = project_to_2d(scaled_3d)
+
+    # Compute height
+    pixel_height = get_pixel_height(rotated_2d)
+    scale = pixel_height / ref["pixel_height"] if ref["pixel_height"] > 0 else 1
+    return scale * reference_height_m, rotated_2d
+
+def main():
+    # ---------------- PROCESS REFERENCE IMAGE ----------------
+    print("Processing reference front image...")
+    ref_img = cv2.imread(reference_image)
+    if ref_img is None:
+        print("Error: cannot read reference image")
+        exit()
+    h, w = ref_img.shape[:2]
+
+    with mp_pose.Pose(min_detection_confidence=0.5) as pose:
+        res = pose.process(cv2.cvtColor(ref_img, cv2.COLOR_BGR2RGB))
+        if not res.pose_landmarks:
+            print("No pose detected in reference image")
+            exit()
+        ref = process_reference(res.pose_landmarks.landmark, w, h)
+        ref_positions_2d = ref["positions_2d"]
+        ref_pixel_height = ref["pixel_height"]
+        draw_fish_diagram(ref_img, ref_positions_2d, color=(0,0,255))
+        cv2.putText(ref_img, f"Ref Height: {ref_pixel_height}px", (20,40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255),2)
+        cv2.imshow("Reference Front", ref_img)
+        cv2.waitKey(500)
+    cv2.destroyAllWindows()
+
+    # ---------------- PROCESS TARGET VIDEO ----------------
+    # Every frame is only scored; landmarks of the TOP_K_FRAMES best frames are
+    # kept and the rotation/depth estimation runs on those alone
+    cap = cv2.VideoCapture(target_video)
+    best_frames = TopKFrameIndex(TOP_K_FRAMES)
+    prev_center = None
+    frame_idx = -1
+
+    with mp_pose.Pose(min_detection_confidence=0.5) as pose:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_idx += 1
+            hh, ww = frame.shape[:2]
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if res.pose_landmarks:
+                quality, prev_center = score_frame(res.pose_landmarks.landmark, prev_center,
+                                                  FRAME_TOP_MAX, FRAME_FEET_MIN)
+                best_frames.offer(quality, frame_idx, (res.pose_landmarks.landmark, ww, hh))
+
+                # Draw reference skeleton in red
+                draw_fish_diagram(frame, ref_positions_2d, color=(0,0,255))
+
+                cv2.putText(frame, f"Frame quality: {quality:.2f}", (30,50),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0),2)
+            else:
+                prev_center = None
+
+            cv2.imshow("Height Estimation - Depth Normalized", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    cap.release()
+    cv2.destroyAllWindows()
+
+    estimated_heights = []
+    for _, _, (landmarks, ww, hh) in best_frames.entries():
+        estimated_height_m, _ = estimate_height_m(landmarks, ww, hh, ref)
+        estimated_heights.append(estimated_height_m)
+
+    if estimated_heights:
+        mean_height_m = sum(estimated_heights) / len(estimated_heights)
+        print(f"\nMean estimated height: {mean_height_m:.2f} m")
+    else:
+        print("No heights could be estimated.")
+
+if __name__ == "__main__":
+    main()
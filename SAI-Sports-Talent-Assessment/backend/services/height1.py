@@ -3,6 +3,9 @@ import mediapipe as mp
 import numpy as np
 import time
 import math
+import sys
+
+from threaded_capture import LatestFrameCapture, InferenceThrottle
 
 # ---------------- CONFIG ----------------
 REFERENCE_HEIGHT_CM = 166.5  # real height of the person in reference images
@@ -16,23 +19,44 @@ DIRECTIONS = ["front", "left", "right", "back"]
 STABLE_FRAMES = 5
 PIXEL_TOLERANCE = 6
 CAPTURE_MODE = "B"  # "A" = Auto, "B" = Manual (SPACE)
+CAMERA_SOURCE = 0  # webcam index, or a recorded video file standing in for the camera
+LIVE_INFERENCE_FPS = 10  # max pose inferences/sec in live preview (0 = every frame)
+PREVIEW_MODE = "lite"  # "lite" = low-res lite model for preview, "full" = full model on every frame
+PREVIEW_WIDTH = 480  # frames are downscaled to this width for the lite preview pass
 # ids we consider as "head-area" to get top-of-head robustly
 HEAD_IDS = [0, 1, 2, 3, 4, 5, 6]  # nose, eyes, ears, mouth-ish
 LEFT_FOOT_ID = 31
 RIGHT_FOOT_ID = 32
 # ----------------------------------------
 
+# Optional camera source override, e.g. `python height1.py session.mp4`
+if len(sys.argv) > 1:
+    CAMERA_SOURCE = sys.argv[1]
+
 mp_pose = mp.solutions.pose
 pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+# cheap model for the live preview: alignment, body-in-frame check and the
+# steadiness gate; the full model only measures the frames of a capture, each
+# on its own (static_image_mode), since it has not tracked the live video
+preview_pose = mp_pose.Pose(model_complexity=0, min_detection_confidence=0.5,
+                            min_tracking_confidence=0.5) if PREVIEW_MODE == "lite" else None
+capture_pose = mp_pose.Pose(static_image_mode=True,
+                            min_detection_confidence=0.5) if PREVIEW_MODE == "lite" else None
 mp_draw = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
-def get_keypoints_and_landmarks(image):
-    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = pose.process(rgb)
+def get_keypoints_and_landmarks(image, model=None, max_width=None):
+    """Run pose on image; keypoints are always in the original image's pixels."""
+    model = model or pose
+    h, w = image.shape[:2]
+    small = image
+    if max_width and w > max_width:
+        # landmarks are normalized, so inferring on a smaller copy is transparent
+        small = cv2.resize(image, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    results = model.process(rgb)
     kp = {}
     if results.pose_landmarks:
-        h, w = image.shape[:2]
         for i, lm in enumerate(results.pose_landmarks.landmark):
             kp[i] = (int(lm.x * w), int(lm.y * h))
     return kp, results.pose_landmarks
@@ -77,6 +101,21 @@ def transform_points(points, M):
         out.append((int(nx), int(ny)))
     return out
 
+def capture_height(frames, ref_px, pixel_history):
+    """
+    Height recorded for a capture: the mean of the live measurements, or in
+    lite mode the mean full-model measurement of the last STABLE_FRAMES
+    frames (None if the full model finds the whole body on none of them).
+    """
+    if PREVIEW_MODE != "lite":
+        return sum(pixel_history)/len(pixel_history)
+    heights = []
+    for frame in frames:
+        measure_px = head_to_feet_px(get_keypoints_and_landmarks(frame, capture_pose)[0])
+        if measure_px and ref_px:
+            heights.append(REFERENCE_HEIGHT_CM * (measure_px / ref_px))
+    return sum(heights)/len(heights) if heights else None
+
 # load and preprocess references
 reference_data = {}
 for direction, path in REFERENCE_IMAGES.items():
@@ -88,10 +127,9 @@ for direction, path in REFERENCE_IMAGES.items():
         raise ValueError(f"Reference image '{path}' does not contain full body keypoints.")
     reference_data[direction] = {"image": img, "kp_orig": kp_orig, "landmarks": lm}
 
-# open webcam
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+# open webcam on a background thread that keeps only the newest frame
+cap = LatestFrameCapture(CAMERA_SOURCE, width=1280, height=720).start()
+throttle = InferenceThrottle(LIVE_INFERENCE_FPS)
 
 user_heights = []
 
@@ -103,10 +141,14 @@ for direction in DIRECTIONS:
     print(f"Turn: {direction.upper()}")
     captured = False
     pixel_history = []
+    frame_history = []  # frames of pixel_history, measured again by the full model on capture
+    user_kp, user_landmarks = {}, None
 
     while True:
         ret, frame = cap.read()
         if not ret:
+            if cap.ended:
+                break
             continue
         frame = cv2.flip(frame, 1)
         fh, fw = frame.shape[:2]
@@ -131,8 +173,23 @@ for direction in DIRECTIONS:
             for i, p in ref_kp.items():
                 cv2.circle(ref_resized, p, 4, (0,200,200), -1)
 
-        # get user keypoints in original frame coords
-        user_kp, user_landmarks = get_keypoints_and_landmarks(frame)
+        # get user keypoints in original frame coords; between inferences the
+        # last skeleton is reused so the preview keeps up with the camera
+        fresh_pose = throttle.due() or not user_kp
+        if fresh_pose:
+            if PREVIEW_MODE == "lite":
+                user_kp, user_landmarks = get_keypoints_and_landmarks(frame, preview_pose, PREVIEW_WIDTH)
+            else:
+                user_kp, user_landmarks = get_keypoints_and_landmarks(frame)
+
+        # Full body check: the (original) user's head must be near top and feet near bottom (loosen a bit)
+        body_in_frame = False
+        if user_kp:
+            top = head_top_y(user_kp)
+            feet = feet_avg_y(user_kp)
+            if top is not None and feet is not None:
+                if top < fh * 0.08 and feet > fh * 0.9:
+                    body_in_frame = True
 
         # Compute pixel heights in consistent coordinate systems (ref_resized vs frame)
         ref_px = head_to_feet_px(ref_kp)  # in ref_resized pixel coords
@@ -140,12 +197,17 @@ for direction in DIRECTIONS:
 
         # If we have both, compute live height using consistent ratio:
         # pixels_per_cm (ref) = ref_px / REFERENCE_HEIGHT_CM  -> live_cm = user_px / (ref_px / REF_CM) = REF_CM * (user_px / ref_px)
+        # (in lite mode this is the preview model's estimate; the full model
+        # only measures the frames that get captured, see capture_height)
         live_height_cm = None
         if ref_px and user_px and ref_px > 5:
             live_height_cm = REFERENCE_HEIGHT_CM * (user_px / ref_px)
-            pixel_history.append(live_height_cm)
-            if len(pixel_history) > STABLE_FRAMES:
-                pixel_history.pop(0)
+            if fresh_pose:
+                pixel_history.append(live_height_cm)
+                frame_history.append(frame)
+                if len(pixel_history) > STABLE_FRAMES:
+                    pixel_history.pop(0)
+                    frame_history.pop(0)
 
         # Visual alignment: compute scale / translation to place user's skeleton near ref toes
         # We'll compute scale so that user_px * scale == ref_px_resized, and place feet of user near feet of reference (y translation).
@@ -191,15 +253,6 @@ for direction in DIRECTIONS:
             cv2.putText(display_frame, f"Live Height: {smooth:.2f} cm", (40, 60),
                         cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,0,255), 2)
 
-        # Full body check: the (original) user's head must be near top and feet near bottom (loosen a bit)
-        body_in_frame = False
-        if user_kp:
-            top = head_top_y(user_kp)
-            feet = feet_avg_y(user_kp)
-            if top is not None and feet is not None:
-                if top < fh * 0.08 and feet > fh * 0.9:
-                    body_in_frame = True
-
         if CAPTURE_MODE == "B" and body_in_frame:
             cv2.putText(display_frame, "Press SPACE to capture", (40, 110),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,255,0), 2)
@@ -216,8 +269,8 @@ for direction in DIRECTIONS:
 
         # ---- NEW FEATURE: screenshot + auto-advance ----
         if CAPTURE_MODE == "B" and key == 32 and body_in_frame:
-            if pixel_history:
-                final = sum(pixel_history)/len(pixel_history)
+            final = capture_height(frame_history, ref_px, pixel_history) if pixel_history else None
+            if final is not None:
                 print(f"{direction.capitalize()} height: {final:.2f} cm")
                 user_heights.append(final)
                 shot_name = f"height_capture_{direction}.png"
@@ -225,11 +278,19 @@ for direction in DIRECTIONS:
                 print(f"Screenshot saved: {shot_name}")
                 captured = True
                 time.sleep(0.8)
+            elif pixel_history:
+                print("Full body not found on the captured frames, try again.")
         # -----------------------------------------------
 
         if CAPTURE_MODE == "A":
             if body_in_frame and len(pixel_history) >= STABLE_FRAMES and max(pixel_history)-min(pixel_history) <= PIXEL_TOLERANCE:
-                final = sum(pixel_history)/len(pixel_history)
+                final = capture_height(frame_history, ref_px, pixel_history)
+                if final is None:
+                    pixel_history.clear()  # wait for STABLE_FRAMES steady frames again
+                    frame_history.clear()
+            else:
+                final = None
+            if final is not None:
                 print(f"{direction.capitalize()} height (auto): {final:.2f} cm")
                 user_heights.append(final)
                 cv2.imwrite(f"height_capture_{direction}.png", combined)
@@ -239,6 +300,10 @@ for direction in DIRECTIONS:
         if captured:
             break
 
+    if not captured:
+        print("Camera stopped before a capture.")
+        break
+
 # finalize
 cap.release()
 cv2.destroyAllWindows()
@@ -1,15 +1,24 @@
 import cv2
 import mediapipe as mp
 import os
-import csv
-import time
+import sys
+
+from threaded_capture import LatestFrameCapture
+from results_store import HeightResultStore
 
 # ---------------- CONFIG ----------------
 REFERENCE_HEIGHT_CM = 166.5  # Known height of reference person/object
 REFERENCE_IMAGE = "ref_images/ref_front.jpg"
 DIRECTIONS = ["front", "left", "right", "back"]
 CAPTURE_DIR = "captures"
-CSV_FILE = "height_data.csv"
+CSV_FILE = "height_data.csv"  # exported from the database at the end of a session
+DB_FILE = "height_data.db"
+ATHLETE_ID = None  # optional id stored with every measurement
+CAMERA_SOURCE = 0  # webcam index, or a recorded video file standing in for the camera
+
+# Optional camera source override, e.g. `python height2.py session.mp4`
+if len(sys.argv) > 1:
+    CAMERA_SOURCE = sys.argv[1]
 
 # Ensure capture directory exists
 os.makedirs(CAPTURE_DIR, exist_ok=True)
@@ -43,16 +52,10 @@ def get_reference_scale(ref_image_path):
     scale = REFERENCE_HEIGHT_CM / h
     return scale
 
-def save_height_to_csv(direction, height_cm):
-    file_exists = os.path.isfile(CSV_FILE)
-    with open(CSV_FILE, mode='a', newline='') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["Timestamp", "Direction", "Height_cm"])
-        writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S"), direction, round(height_cm, 2)])
-
 # ---------------- MAIN LOOP ----------------
-cap = cv2.VideoCapture(0)
+cap = LatestFrameCapture(CAMERA_SOURCE).start()
+# rows an older height2.py appended to the CSV are imported when the database is created
+store = HeightResultStore(DB_FILE, image_dir=CAPTURE_DIR, legacy_csv=CSV_FILE)
 scale = get_reference_scale(REFERENCE_IMAGE)
 current_direction_idx = 0
 
@@ -62,7 +65,9 @@ print("Press ESC to exit.")
 while cap.isOpened() and current_direction_idx < len(DIRECTIONS):
     ret, frame = cap.read()
     if not ret:
-        break
+        if cap.ended:
+            break
+        continue
     
     direction = DIRECTIONS[current_direction_idx]
     cv2.putText(frame, f"Direction: {direction}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
@@ -75,9 +80,8 @@ while cap.isOpened() and current_direction_idx < len(DIRECTIONS):
     elif key == 32:  # SPACE key
         estimated_height = estimate_height(frame, scale)
         if estimated_height:
-            filename = f"{CAPTURE_DIR}/{direction}_{int(time.time())}.jpg"
-            cv2.imwrite(filename, frame)
-            save_height_to_csv(direction, estimated_height)
+            # image and row are written by the store's background thread
+            store.add_measurement(direction, estimated_height, athlete_id=ATHLETE_ID, image=frame)
             print(f"[{direction}] Height: {round(estimated_height, 2)} cm captured and saved.")
         else:
             print(f"[{direction}] Pose not detected, try again.")
@@ -85,3 +89,5 @@ while cap.isOpened() and current_direction_idx < len(DIRECTIONS):
 
 cap.release()
 cv2.destroyAllWindows()
+store.close()
+store.export_csv(CSV_FILE)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Analysis Job Scheduler
+Queue in front of the analyzers. Jobs are ordered by priority (live
+submissions before background re-scoring) and then shortest-estimated-first,
+using the probed frame count as the cost, so one long shuttle-run video does
+not hold up a queue of short push-up clips. Waiting lowers a job's effective
+cost, so long videos are delayed but never starved. At most one job per
+available CPU core runs at a time, and only while the estimated memory of the
+running jobs fits the node's budget (AI_NODE_MEMORY_MB, default a share of the
+memory available at start), so a busy node is not OOM-killed mid-batch.
+
+Start:  python job_scheduler.py [socket_path]
+Stats:  python job_scheduler.py --stats [socket_path]
+ai_analysis_wrapper.py submits through the scheduler automatically when it is
+running (and runs the analysis directly otherwise). POSIX only.
+"""
+
+import array
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from worker_config import plan_layout, worker_env
+from worker_pool import estimate_job_memory_mb
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOCKET = os.environ.get("AI_SCHEDULER_SOCKET",
+                                os.path.join(tempfile.gettempdir(), "sai_job_scheduler.sock"))
+
+# ---------------- CONFIG ----------------
+PRIORITIES = {"live": 0, "background": 10}  # lower runs first
+EST_PROCESSING_FPS = 30.0     # frames analyzed per second, for the cost estimate
+DEFAULT_COST_SEC = 30.0       # cost when the duration could not be probed
+AGING_RATE = 1.0              # seconds of cost forgiven per second of waiting
+JOB_TIMEOUT = 45              # hard limit for one wrapper run
+QUEUED_EVENT_INTERVAL_S = 5.0  # "queued" progress events keep the caller's stall timer alive
+WAIT_HISTORY = 500            # completed jobs kept for the wait-time stats
+NODE_MEMORY_SHARE = 0.8       # share of MemAvailable the running jobs may use
+# ----------------------------------------
+
+
+def default_workers():
+    """AI_SCHEDULER_WORKERS, else the number of cores this process may use."""
+    configured = os.environ.get("AI_SCHEDULER_WORKERS", "").strip()
+    if configured.isdigit() and int(configured) > 0:
+        return int(configured)
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def node_memory_budget_mb():
+    """AI_NODE_MEMORY_MB, else a share of MemAvailable (None if unknown: no limit)."""
+    configured = os.environ.get("AI_NODE_MEMORY_MB", "").strip()
+    if configured.isdigit() and int(configured) > 0:
+        return int(configured)
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(int(line.split()[1]) / 1024 * NODE_MEMORY_SHARE)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def estimate_cost_sec(metadata):
+    """Estimated analysis time from probed metadata (see video_probe.probe_metadata)."""
+    frames = (metadata or {}).get("frame_count") or 0
+    if frames <= 0:
+        return DEFAULT_COST_SEC
+    return frames / EST_PROCESSING_FPS
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, video_path, assessment_type, priority, cost_sec, progress_fd=None, memory_mb=0.0):
+        self.id = next(Job._ids)
+        self.video_path = video_path
+        self.assessment_type = assessment_type
+        self.priority = priority
+        self.cost_sec = cost_sec
+        self.memory_mb = memory_mb
+        self.progress_fd = progress_fd
+        self.worker_env = {}  # thread/CPU settings of the slot that runs it
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def effective_cost(self, now):
+        return self.cost_sec - AGING_RATE * (now - self.submitted)
+
+    def queue_info(self):
+        end = self.started if self.started is not None else time.monotonic()
+        info = {"job_id": self.id, "priority": self.priority,
+                "estimated_sec": round(self.cost_sec, 1),
+                "estimated_memory_mb": round(self.memory_mb),
+                "wait_sec": round(end - self.submitted, 2)}
+        if self.finished is not None:
+            info["run_sec"] = round(self.finished - self.started, 2)
+        return info
+
+
+class JobScheduler:
+    """
+    Priority + shortest-job-first queue with a fixed number of worker threads.
+    The usable cores are split between the slots, and each job runs pinned to
+    its slot's cores with a matching thread count (see worker_config.py).
+    The next job in order waits until its memory estimate fits next to the
+    running jobs; a job larger than the whole budget still runs, alone.
+    """
+
+    def __init__(self, workers=None, run_job=None, memory_budget_mb=None):
+        self.workers = workers or default_workers()
+        self.run_job = run_job or run_wrapper_job
+        self.layout = plan_layout(self.workers)
+        self.memory_budget_mb = memory_budget_mb or node_memory_budget_mb()
+        self._queue = []
+        self._running = 0
+        self._memory_in_use = 0.0
+        self._peak_rss = []
+        self._cond = threading.Condition()
+        self._waits = {name: [] for name in PRIORITIES}
+        self._completed = 0
+        self._threads = []
+
+    def start(self):
+        for slot in range(self.workers):
+            t = threading.Thread(target=self._worker, args=(slot,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, video_path, assessment_type, priority="live", metadata=None, progress_fd=None):
+        if priority not in PRIORITIES:
+            priority = "live"
+        job = Job(video_path, assessment_type, priority, estimate_cost_sec(metadata), progress_fd,
+                  estimate_job_memory_mb(metadata))
+        with self._cond:
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def position(self, job):
+        """1-based place in the current dispatch order (0 once running)."""
+        with self._cond:
+            if job not in self._queue:
+                return 0
+            return self._ordered(time.monotonic()).index(job) + 1
+
+    def cancel(self, job):
+        with self._cond:
+            job.cancelled = True
+            if job in self._queue:
+                self._queue.remove(job)
+                job.done.set()
+
+    def _ordered(self, now):
+        return sorted(self._queue, key=lambda j: (PRIORITIES[j.priority], j.effective_cost(now), j.id))
+
+    def _fits(self, job):
+        if self.memory_budget_mb is None or self._running == 0:
+            return True
+        return self._memory_in_use + job.memory_mb <= self.memory_budget_mb
+
+    def _next_job(self):
+        with self._cond:
+            # the head of the order waits for memory rather than being overtaken,
+            # so a large video cannot be starved by a stream of small ones
+            while not self._queue or not self._fits(self._ordered(time.monotonic())[0]):
+                self._cond.wait()
+            job = self._ordered(time.monotonic())[0]
+            self._queue.remove(job)
+            job.started = time.monotonic()
+            self._running += 1
+            self._memory_in_use += job.memory_mb
+            return job
+
+    def _worker(self, slot):
+        threads, cpus = self.layout[slot]
+        while True:
+            job = self._next_job()
+            job.worker_env = worker_env(threads, cpus)
+            try:
+                job.result = self.run_job(job)
+            except Exception as e:
+                job.result = {"error": f"Scheduled analysis failed: {e}"}
+            job.finished = time.monotonic()
+            with self._cond:
+                self._running -= 1
+                self._memory_in_use -= job.memory_mb
+                self._completed += 1
+                waits = self._waits[job.priority]
+                waits.append(job.started - job.submitted)
+                del waits[:-WAIT_HISTORY]
+                peak = ((job.result or {}).get("worker") or {}).get("peak_rss_mb")
+                if peak is not None:
+                    self._peak_rss.append(peak)
+                    del self._peak_rss[:-WAIT_HISTORY]
+                self._cond.notify_all()  # freed memory may admit the next job
+            job.done.set()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            queued = self._ordered(now)
+            report = {"workers": self.workers, "running": self._running,
+                      "layout": [{"threads": t, "cpus": c} for t, c in self.layout],
+                      "memory_mb": {"budget": self.memory_budget_mb,
+                                    "reserved": round(self._memory_in_use),
+                                    "job_peak_rss_p50": _percentile(self._peak_rss, 0.5),
+                                    "job_peak_rss_max": max(self._peak_rss) if self._peak_rss else None},
+                      "queued": len(queued), "completed": self._completed,
+                      "queued_jobs": [dict(j.queue_info(), assessment_type=j.assessment_type) for j in queued],
+                      "wait_sec": {}}
+            for name, waits in self._waits.items():
+                report["wait_sec"][name] = {"count": len(waits), "p50": _percentile(waits, 0.5),
+                                            "p95": _percentile(waits, 0.95),
+                                            "max": round(max(waits), 2) if waits else None}
+        return report
+
+
+def run_wrapper_job(job):
+    """Run ai_analysis_wrapper.py for one job in its own process."""
+    env = dict(os.environ, AI_SCHEDULER_JOB="1", **job.worker_env)
+    env.pop("AI_PROGRESS_FD", None)
+    pass_fds = ()
+    if job.progress_fd is not None:
+        env["AI_PROGRESS_FD"] = str(job.progress_fd)
+        pass_fds = (job.progress_fd,)
+    try:
+        proc = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, "ai_analysis_wrapper.py"),
+                               job.video_path, job.assessment_type],
+                              capture_output=True, text=True, timeout=JOB_TIMEOUT, env=env,
+                              pass_fds=pass_fds)
+    except subprocess.TimeoutExpired:
+        return {"error": "Analysis timed out"}
+    try:
+        return json.loads(proc.stdout.strip())
+    except ValueError:
+        return {"error": "Analysis produced no result: " + proc.stderr.strip()[-500:]}
+
+
+# ---------------- CLIENT SIDE ----------------
+def scheduler_available(socket_path=DEFAULT_SOCKET):
+    return hasattr(socket, "AF_UNIX") and os.path.exists(socket_path)
+
+
+def _request(sock, payload, fd=None):
+    data = json.dumps(payload).encode() + b"\n"
+    if fd is not None:
+        sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", [fd]))])
+        data = data[sent:]
+    sock.sendall(data)
+
+
+def _lines(sock):
+    buf = b""
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return
+        buf += chunk
+        while b"\n" in buf:
+            line, _, buf = buf.partition(b"\n")
+            if line.strip():  # blank lines are the server's liveness checks
+                yield json.loads(line.decode())
+
+
+def submit_to_scheduler(video_path, assessment_type, priority="live", metadata=None,
+                        progress_fd=None, socket_path=DEFAULT_SOCKET):
+    """
+    Queue a job and block until it finishes. Returns (result, queue_info).
+    Raises OSError if the scheduler cannot be reached or drops the job.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        _request(sock, {"op": "submit", "video_path": os.path.abspath(video_path),
+                        "assessment_type": assessment_type, "priority": priority,
+                        "metadata": metadata}, progress_fd)
+        for message in _lines(sock):
+            if message.get("event") == "result":
+                return message["result"], message["queue"]
+    raise OSError("Scheduler closed the connection without a result")
+
+
+def scheduler_stats(socket_path=DEFAULT_SOCKET):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        _request(sock, {"op": "stats"})
+        for message in _lines(sock):
+            return message
+    raise OSError("Scheduler closed the connection without stats")
+
+
+# ---------------- SERVER SIDE ----------------
+def _recv_request(conn):
+    """Read one JSON request line plus a file descriptor passed with it."""
+    fds = array.array("i")
+    data, ancdata, _, _ = conn.recvmsg(65536, socket.CMSG_SPACE(fds.itemsize))
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - (len(payload) % fds.itemsize)])
+    while data and not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode()), (fds[0] if fds else None)
+
+
+def _handle(conn, scheduler):
+    from progress import ProgressReporter
+
+    fd = None
+    try:
+        request, fd = _recv_request(conn)
+        if request.get("op") == "stats":
+            conn.sendall(json.dumps(scheduler.stats()).encode() + b"\n")
+            return
+        job = scheduler.submit(request["video_path"], request["assessment_type"],
+                               request.get("priority", "live"), request.get("metadata"), fd)
+        progress = ProgressReporter(fd, source="scheduler")
+        while not job.done.wait(QUEUED_EVENT_INTERVAL_S if job.started is None else 1.0):
+            if job.started is None:
+                progress.stage("queued", position=scheduler.position(job), **job.queue_info())
+                # a vanished client must not keep its job in the queue
+                try:
+                    conn.sendall(b"\n")
+                except OSError:
+                    scheduler.cancel(job)
+                    return
+        if not job.cancelled:
+            conn.sendall(json.dumps({"event": "result", "result": job.result,
+                                     "queue": job.queue_info()}).encode() + b"\n")
+    except (OSError, ValueError, KeyError):
+        pass
+    finally:
+        conn.close()
+        if fd is not None:
+            os.close(fd)
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None):
+    sys.path.insert(0, SCRIPT_DIR)
+    scheduler = JobScheduler(workers)
+    scheduler.start()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+    print(json.dumps({"status": "ready", "socket": socket_path, "workers": scheduler.workers}), flush=True)
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=_handle, args=(conn, scheduler), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else DEFAULT_SOCKET
+    if "--stats" in sys.argv:
+        print(json.dumps(scheduler_stats(path), indent=2))
+    else:
+        import signal
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        serve(path)
@@ -0,0 +1,206 @@
+"""
+Keyframe Capture
+Landmark stream consumer (landmark_stream.py) that saves thumbnails and
+evidence frames from the analyzer's own decode loop, so the app never decodes
+the upload a second time for them.
+
+The keyframes are the frames the analyzer's counter uses: the bottom and top
+of every rep_index row (push-up chest down and arms straight, sit-up lying
+back and sat up, jump crouch and apex, shuttle last stride out and turn).
+Analyzers whose counter runs inside the decode loop say which frames they
+use (LandmarkStream.hold / keep: vertical_jump.py holds every frame that
+updates min_hip_during_jump and keeps the apex on landing). Push-ups and
+sit-ups count after decoding, once the thresholds are known, so they publish
+their smoothed counting signal (LandmarkStream.signal) and every turning
+point of it is kept as a candidate; rep bottoms and tops are turning points
+of that signal, and the candidates the rep index does not name are deleted
+at the end. Only references to decoded frames are held; downscaling and
+JPEG encoding run on a background thread.
+
+Enable with AI_STREAM_CONSUMERS=quality,technique,keyframes. Files go to
+AI_KEYFRAME_DIR/<video id>/<analyzer>/; AI_KEYFRAME_FORMAT=webp writes WebP instead.
+The result lists the keyframes and the bottom/top keyframe of every rep.
+"""
+
+import hashlib
+import os
+import queue
+import sys
+import tempfile
+import threading
+
+import cv2
+
+from landmark_stream import StreamConsumer
+
+# ---------------- CONFIG ----------------
+DEFAULT_KEYFRAME_DIR = os.path.join(tempfile.gettempdir(), "sai_keyframes")
+MAX_WIDTH = 320            # keyframes are downscaled to at most this width
+JPEG_QUALITY = 80
+MAX_CANDIDATES = 5000      # frames encoded per video before the rep index picks (the thumbnail is extra)
+THUMBNAIL_DELAY_S = 0.5    # thumbnail: first frame with a pose after this long
+MIN_VISIBILITY = 0.5
+ENCODE_QUEUE = 4           # full-size frames waiting for the encoder
+# ----------------------------------------
+
+
+def video_id(video_path):
+    """Stable directory name for one file (path, size and mtime)."""
+    st = os.stat(video_path)
+    key = f"{os.path.abspath(video_path)}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def current_video_id():
+    """Directory name for the video the running analyzer was given (argv[1])."""
+    try:
+        return video_id(sys.argv[1])
+    except (IndexError, OSError):
+        return f"pid{os.getpid()}"
+
+
+def keyframe_ext():
+    return ".webp" if os.environ.get("AI_KEYFRAME_FORMAT", "").strip().lower() == "webp" else ".jpg"
+
+
+def downscale(image, max_width=MAX_WIDTH):
+    h, w = image.shape[:2]
+    if w <= max_width:
+        return image
+    return cv2.resize(image, (max_width, max(1, round(h * max_width / w))), interpolation=cv2.INTER_AREA)
+
+
+class KeyframeCapture(StreamConsumer):
+    name = "keyframes"
+    needs_image = True
+
+    def __init__(self, source="", fps=30.0, directory=None):
+        super().__init__(source, fps)
+        self.directory = directory or os.path.join(os.environ.get("AI_KEYFRAME_DIR", DEFAULT_KEYFRAME_DIR),
+                                                   current_video_id(), source or "frames")
+        self.ext = keyframe_ext()
+        self.candidates = {}    # frame -> {"frame", "time_sec", "path"}, encoded frames the rep index may name
+        self.thumbnail = None
+        self.errors = 0
+        self.dropped = 0
+        self._current = None    # the frame just published
+        self._held = {}         # slot -> frame held by the analyzer until it keeps or replaces it
+        self._turn = None       # [value, rising] of the pending turning point of the signal
+        self._fallback = None   # first frame, for a thumbnail when no pose is ever found
+        self._queue = queue.Queue(maxsize=ENCODE_QUEUE)
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+
+    # -------- encoding thread --------
+    def _encode_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            image, path = job
+            params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if path.endswith(".jpg") else \
+                     [cv2.IMWRITE_WEBP_QUALITY, JPEG_QUALITY]
+            try:
+                if not cv2.imwrite(path, downscale(image), params):
+                    self.errors += 1
+            except cv2.error:
+                self.errors += 1
+
+    def _save(self, frame_index, time_sec, image, kind):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{kind}_{frame_index:06d}{self.ext}")
+        self._queue.put((image, path))  # blocks when encoding falls ENCODE_QUEUE frames behind
+        return {"frame": frame_index, "time_sec": round(time_sec, 3), "path": path}
+
+    # -------- analyzer events --------
+    def on_frame(self, frame):
+        self._current = frame
+        if self._fallback is None and self.thumbnail is None:
+            self._fallback = (frame.index, frame.time_sec, frame.image)
+        if self.thumbnail is None and frame.points is not None and frame.time_sec >= THUMBNAIL_DELAY_S \
+                and frame.points[[11, 12, 23, 24], 3].mean() >= MIN_VISIBILITY:
+            self.thumbnail = self._save(frame.index, frame.time_sec, frame.image, "thumbnail")
+            self._fallback = None
+
+    def on_hold(self, frame_index, slot):
+        """Hold the frame just published in `slot`, replacing what the slot held."""
+        if self._current is not None and self._current.index == frame_index:
+            self._held[slot] = self._current
+
+    def on_keep(self, frame_index):
+        """Encode `frame_index` (the frame just published or a held one) as a candidate."""
+        if frame_index in self.candidates:
+            return
+        held = [f for f in [self._current] + list(self._held.values()) if f is not None and f.index == frame_index]
+        if not held:
+            return
+        if len(self.candidates) >= MAX_CANDIDATES:
+            self.dropped += 1
+            return
+        self.candidates[frame_index] = self._save(frame_index, held[0].time_sec, held[0].image, "frame")
+
+    def on_signal(self, frame_index, value):
+        """
+        The counter's signal for the frame just published: keep every
+        turning point. The first frame of a plateau is the extreme, as in
+        RepIndex, and the first and last frames can be a rep's start or top.
+        """
+        if self._turn is None:
+            self.on_keep(frame_index)
+            self._turn = [value, None]
+        elif value != self._turn[0]:
+            rising = value > self._turn[0]
+            if self._turn[1] is not None and rising != self._turn[1] and "turn" in self._held:
+                self.on_keep(self._held["turn"].index)  # turned: the held frame was the extreme
+            self._turn = [value, rising]
+        else:
+            return
+        self.on_hold(frame_index, "turn")
+
+    # -------- stream interface --------
+    def state(self):
+        return {"candidates": list(self.candidates.values()), "thumbnail": self.thumbnail,
+                "turn": self._turn}
+
+    def restore(self, state):
+        self.candidates = {c["frame"]: c for c in state.get("candidates", [])}
+        self.thumbnail = state.get("thumbnail")
+        self._turn = state.get("turn")
+        if self._turn is not None:
+            self._turn[1] = None  # the held frame is gone: start the next turn afresh
+
+    def _rep_keyframes(self):
+        """bottom/top keyframe of every rep_index row, and the keyframes they use."""
+        rows = (self.rep_index or {}).get("frames") or []
+        reps, used = [], {}
+        for _, bottom, top, _ in rows:
+            rep = {}
+            for kind, frame in (("bottom", bottom), ("top", top)):
+                keyframe = self.candidates.get(frame)
+                if keyframe is not None and os.path.exists(keyframe["path"]):
+                    used.setdefault(frame, dict(keyframe, kind=kind))
+                rep[kind] = used[frame]["path"] if frame in used else None
+            reps.append(rep)
+        return reps, [used[f] for f in sorted(used)]
+
+    def result(self):
+        if self.thumbnail is None and self._fallback is not None:
+            self.thumbnail = self._save(*self._fallback, "thumbnail")
+        if "turn" in self._held:
+            self.on_keep(self._held["turn"].index)  # where the signal was heading when the video ended
+        self._fallback = self._current = None
+        self._held = {}
+        self._queue.put(None)
+        self._thread.join()
+        reps, keyframes = self._rep_keyframes()
+        keep = {k["path"] for k in keyframes}
+        for candidate in self.candidates.values():
+            if candidate["path"] not in keep and os.path.exists(candidate["path"]):
+                os.remove(candidate["path"])
+        fields = {"directory": self.directory, "thumbnail": self.thumbnail and self.thumbnail["path"],
+                  "frames": keyframes, "reps": reps}
+        if self.errors:
+            fields["encode_errors"] = self.errors
+        if self.dropped:
+            fields["candidates_dropped"] = self.dropped
+        return {"keyframes": fields}
@@ -0,0 +1,137 @@
+"""
+Landmark Predictor
+Short-term constant-velocity prediction of the pose landmarks. When
+pose.process finds nobody for a frame or two (motion blur at a shuttle turn,
+an arm crossing the body) the analyzers no longer lose that frame: the
+landmarks continue from their last position and velocity, so smoothing
+windows and velocities stay continuous. Gaps longer than MAX_GAP_S or
+MAX_PREDICTED_FRAMES are left empty, as before.
+
+Each landmark coordinate runs through an alpha-beta filter (the steady-state
+form of a constant-velocity Kalman filter). Visibility keeps its last
+measured value.
+
+AI_INFER_EVERY=N runs inference on every Nth frame only and predicts the
+frames in between (within the same bounds), trading a little accuracy for
+up to N times less pose inference. The result's "prediction" field reports
+how many frames were inferred and predicted.
+"""
+
+import os
+
+import numpy as np
+
+from landmark_stream import landmarks_to_array
+
+# ---------------- CONFIG ----------------
+ALPHA = 0.85               # position gain: share of the measurement residual taken
+BETA = 0.3                 # velocity gain
+MAX_GAP_S = 0.25           # never predict further than this past the last detection
+MAX_PREDICTED_FRAMES = 8   # ... or more frames than this in a row
+# ----------------------------------------
+
+
+def infer_every():
+    value = os.environ.get("AI_INFER_EVERY", "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else 1
+
+
+class Landmark:
+    """Stand-in for a MediaPipe landmark (x, y, z, visibility) built from a prediction."""
+    __slots__ = ("x", "y", "z", "visibility")
+
+    def __init__(self, x, y, z, visibility):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.visibility = visibility
+
+
+def array_to_landmarks(points):
+    return [Landmark(float(x), float(y), float(z), float(v)) for x, y, z, v in points]
+
+
+class LandmarkPredictor:
+
+    def __init__(self, every=1, max_gap_s=MAX_GAP_S, max_frames=MAX_PREDICTED_FRAMES, state=None):
+        self.every = max(1, int(every))
+        self.max_gap_s = max_gap_s
+        self.max_frames = max_frames
+        self.points = None       # (33, 4) filtered landmarks at self.t
+        self.velocity = None     # (33, 3) per second
+        self.t = None            # time of the last detection
+        self.run = 0             # predicted frames since the last detection
+        self.last_predicted = False
+        self.inferred_frames = 0
+        self.predicted_frames = 0
+        self.longest_run = 0
+        if state:
+            for key, value in state.items():
+                setattr(self, key, np.array(value) if key in ("points", "velocity") and value else value)
+
+    @classmethod
+    def from_env(cls, state=None):
+        return cls(every=infer_every(), state=state)
+
+    # -------- filter --------
+    def update(self, t, points):
+        """Fold in a detection (a (33, 4) array) made at time t."""
+        points = np.asarray(points, dtype=np.float64)
+        dt = t - self.t if self.t is not None else None
+        if self.points is None or not dt or dt <= 0 or dt > 2 * self.max_gap_s:
+            self.points = points.copy()  # first detection or a long gap: start over
+            self.velocity = np.zeros((len(points), 3))
+        else:
+            expected = self.points[:, :3] + self.velocity * dt
+            residual = points[:, :3] - expected
+            self.points = points.copy()
+            self.points[:, :3] = expected + ALPHA * residual
+            self.velocity = self.velocity + (BETA / dt) * residual
+        self.t = t
+        self.run = 0
+
+    def can_predict(self, t):
+        return (self.points is not None and self.run < self.max_frames
+                and 0 < t - self.t <= self.max_gap_s)
+
+    def predict(self, t):
+        """Landmarks extrapolated to time t, or None when that is past the bounds."""
+        if not self.can_predict(t):
+            return None
+        points = self.points.copy()
+        points[:, :3] += self.velocity * (t - self.t)
+        self.run += 1
+        self.predicted_frames += 1
+        self.longest_run = max(self.longest_run, self.run)
+        return points
+
+    # -------- analyzer interface --------
+    def skip_inference(self, t, frame_index):
+        """True when AI_INFER_EVERY lets this frame be predicted instead of inferred."""
+        return self.every > 1 and frame_index % self.every != 0 and self.can_predict(t)
+
+    def fill(self, t, landmarks, inferred=True):
+        """
+        Landmarks for the counter: the detection itself (folded into the
+        filter), or a prediction when there is none. None past the bounds.
+        `inferred` is False for frames skipped by skip_inference().
+        """
+        if inferred:
+            self.inferred_frames += 1
+        if landmarks is not None:
+            self.last_predicted = False
+            self.update(t, landmarks_to_array(landmarks))
+            return landmarks
+        points = self.predict(t)
+        self.last_predicted = points is not None
+        return array_to_landmarks(points) if points is not None else None
+
+    def state(self):
+        return {"points": self.points.tolist() if self.points is not None else None,
+                "velocity": self.velocity.tolist() if self.velocity is not None else None,
+                "t": self.t, "run": self.run, "inferred_frames": self.inferred_frames,
+                "predicted_frames": self.predicted_frames, "longest_run": self.longest_run}
+
+    def report(self):
+        return {"infer_every": self.every, "inferred_frames": self.inferred_frames,
+                "predicted_frames": self.predicted_frames, "longest_predicted_run": self.longest_run}
@@ -0,0 +1,322 @@
+"""
+Landmark Stream
+Fans one decode + pose inference pass out to several consumers, so a new
+metric (technique score, quality monitor, keyframes, overlay) does not need a
+pass of its own. The analyzer keeps its loop and counter and publishes every
+processed frame; each consumer gets a LandmarkFrame with the landmarks as a
+(33, 4) array of x, y, z, visibility (normalised coordinates) and, if it asks
+for it, the BGR image.
+
+Consumers that only do arithmetic run inline; slow ones (image encoding)
+set `threaded = True` and run on their own thread behind a bounded queue.
+A failing consumer is dropped and reported; it never fails the analysis.
+
+Consumers are picked by name from CONSUMERS; AI_STREAM_CONSUMERS (comma
+separated, empty for none) overrides DEFAULT_CONSUMERS. AI_OVERLAY=1 adds
+"landmarks", the series overlay_render.py draws from.
+"""
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+DEFAULT_CONSUMERS = ["quality", "technique"]
+QUEUE_SIZE = 64            # frames buffered per threaded consumer
+MIN_VISIBILITY = 0.5       # landmarks below this do not count as detected
+QUALITY_LANDMARKS = [11, 12, 23, 24]  # shoulders and hips
+# ----------------------------------------
+
+
+class LandmarkFrame:
+    __slots__ = ("index", "time_sec", "points", "image", "width", "height", "predicted")
+
+    def __init__(self, index, time_sec, points, image, width, height, predicted=False):
+        self.index = index
+        self.time_sec = time_sec
+        self.points = points   # (33, 4) float32 array, or None when no pose was found
+        self.image = image     # BGR frame for consumers with needs_image, else None
+        self.width = width
+        self.height = height
+        self.predicted = predicted  # points come from landmark_predictor.py, not inference
+
+
+def landmarks_to_array(landmarks):
+    """MediaPipe landmark list -> (N, 4) array of x, y, z, visibility."""
+    if landmarks is None:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, getattr(lm, "visibility", 1.0)) for lm in landmarks],
+                    dtype=np.float32)
+
+
+class StreamConsumer:
+    """
+    Base class. `on_frame` is called for every published frame in order;
+    `result` returns the fields to add to the analyzer output. `state` and
+    `restore` carry the consumer across analyzer checkpoints. `rep_index` is
+    the analyzer's rep index (rep_index.py) when `result` is called, if it
+    passed one to LandmarkStream.finish. `on_hold`, `on_keep` and
+    `on_signal` receive the analyzer's counter events for the frame just
+    published (see LandmarkStream.hold).
+    """
+    name = "consumer"
+    needs_image = False
+    threaded = False
+    rep_index = None
+
+    def __init__(self, source="", fps=30.0):
+        self.source = source
+        self.fps = fps
+
+    def on_frame(self, frame):
+        pass
+
+    def on_hold(self, frame_index, slot):
+        pass
+
+    def on_keep(self, frame_index):
+        pass
+
+    def on_signal(self, frame_index, value):
+        pass
+
+    def result(self):
+        return {}
+
+    def state(self):
+        return None
+
+    def restore(self, state):
+        pass
+
+
+class QualityMonitor(StreamConsumer):
+    """Detection rate, landmark visibility, jitter and the longest gap without a pose."""
+    name = "quality"
+
+    def __init__(self, source="", fps=30.0):
+        super().__init__(source, fps)
+        self.frames = 0
+        self.detected = 0
+        self.visibility_sum = 0.0
+        self.jitter_sum = 0.0
+        self.jitter_n = 0
+        self.gap = 0
+        self.longest_gap = 0
+        self._prev = None
+
+    def on_frame(self, frame):
+        if frame.predicted:
+            return  # measures the detections only
+        self.frames += 1
+        key = frame.points[QUALITY_LANDMARKS] if frame.points is not None else None
+        if key is None or key[:, 3].mean() < MIN_VISIBILITY:
+            self.gap += 1
+            self.longest_gap = max(self.longest_gap, self.gap)
+            self._prev = None
+            return
+        self.detected += 1
+        self.gap = 0
+        self.visibility_sum += float(key[:, 3].mean())
+        if self._prev is not None:
+            self.jitter_sum += float(np.linalg.norm(key[:, :2] - self._prev, axis=1).mean())
+            self.jitter_n += 1
+        self._prev = key[:, :2].copy()
+
+    def result(self):
+        if not self.frames:
+            return {}
+        return {"quality": {
+            "frames": self.frames,
+            "detection_rate": round(self.detected / self.frames, 3),
+            "mean_visibility": round(self.visibility_sum / self.detected, 3) if self.detected else None,
+            # mean per-frame movement of shoulders/hips, in normalised image units
+            "landmark_jitter": round(self.jitter_sum / self.jitter_n, 4) if self.jitter_n else None,
+            "longest_gap_sec": round(self.longest_gap / (self.fps or 30.0), 2),
+        }}
+
+    def state(self):
+        return {k: getattr(self, k) for k in ("frames", "detected", "visibility_sum", "jitter_sum",
+                                              "jitter_n", "gap", "longest_gap")}
+
+    def restore(self, state):
+        for k, v in (state or {}).items():
+            setattr(self, k, v)
+
+
+# name -> consumer class, or "module.Class" for consumers imported only when used
+CONSUMERS = {"quality": QualityMonitor,
+             "technique": "technique.TechniqueScorer",
+             "keyframes": "keyframes.KeyframeCapture",
+             "landmarks": "overlay_render.LandmarkRecorder"}
+
+
+def _consumer_class(name):
+    consumer_cls = CONSUMERS.get(name)
+    if isinstance(consumer_cls, str):
+        import importlib
+        module, _, attr = consumer_cls.rpartition(".")
+        consumer_cls = getattr(importlib.import_module(module), attr)
+    return consumer_cls
+
+
+def consumer_names():
+    value = os.environ.get("AI_STREAM_CONSUMERS")
+    if value is None:
+        names = list(DEFAULT_CONSUMERS)
+    else:
+        names = [n.strip() for n in value.split(",") if n.strip()]
+    if os.environ.get("AI_OVERLAY", "").strip().lower() in ("1", "true", "yes") and "landmarks" not in names:
+        names.append("landmarks")
+    return names
+
+
+class _ThreadedRunner:
+    """Feeds a threaded consumer from a bounded queue on its own thread."""
+
+    def __init__(self, consumer, on_error):
+        self.consumer = consumer
+        self.on_error = on_error
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        failed = False
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            if failed:
+                continue  # keep draining so the publisher never blocks
+            try:
+                if isinstance(frame, tuple):
+                    method, args = frame  # a counter event, in order with the frames
+                    getattr(self.consumer, method)(*args)
+                else:
+                    self.consumer.on_frame(frame)
+            except Exception as e:
+                failed = True
+                self.on_error(self.consumer, e)
+
+    def put(self, frame):
+        self.queue.put(frame)  # blocks when the consumer falls QUEUE_SIZE frames behind
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class LandmarkStream:
+    """Publishes processed frames to registered consumers."""
+
+    def __init__(self, fps, source=""):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.source = source
+        self.consumers = []
+        self.errors = {}
+        self._runners = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, fps, source=""):
+        stream = cls(fps, source)
+        for name in consumer_names():
+            consumer_cls = _consumer_class(name)
+            if consumer_cls is not None:
+                stream.register(consumer_cls(source, stream.fps))
+        return stream
+
+    def register(self, consumer):
+        self.consumers.append(consumer)
+        if consumer.threaded:
+            self._runners[consumer.name] = _ThreadedRunner(consumer, self._failed)
+        return consumer
+
+    @property
+    def needs_image(self):
+        return any(c.needs_image for c in self.consumers)
+
+    def _failed(self, consumer, error):
+        with self._lock:
+            self.errors[consumer.name] = f"{type(error).__name__}: {error}"
+
+    def publish(self, frame_index, image, landmarks, time_sec=None, predicted=False):
+        """
+        Hand one processed frame (MediaPipe landmark list or None) to every
+        consumer. `time_sec` is the frame's timestamp (time_axis.py); without
+        it the nominal frame time is used. `predicted` marks landmarks filled
+        in by landmark_predictor.py.
+        """
+        if not self.consumers:
+            return
+        if time_sec is None:
+            time_sec = max(frame_index - 1, 0) / self.fps
+        height, width = image.shape[:2]
+        frame = LandmarkFrame(frame_index, time_sec, landmarks_to_array(landmarks),
+                              image if self.needs_image else None, width, height, predicted)
+        self._dispatch("on_frame", frame)
+
+    def hold(self, frame_index, slot):
+        """
+        Counter events, for consumers that keep the frames the counter uses
+        (keyframes.py). hold: the counter may use the frame just published
+        for `slot` (e.g. the jump apex so far), replacing the slot's earlier
+        frame. keep: the counter used `frame_index`, the frame just published
+        or one still held. signal: the counter's signal value for the frame
+        just published, when the counter itself runs after decoding.
+        """
+        self._dispatch("on_hold", frame_index, slot)
+
+    def keep(self, frame_index):
+        self._dispatch("on_keep", frame_index)
+
+    def signal(self, frame_index, value):
+        self._dispatch("on_signal", frame_index, value)
+
+    def _dispatch(self, method, *args):
+        for consumer in self.consumers:
+            if consumer.name in self.errors:
+                continue
+            runner = self._runners.get(consumer.name)
+            if runner is not None:
+                runner.put(args[0] if method == "on_frame" else (method, args))
+                continue
+            try:
+                getattr(consumer, method)(*args)
+            except Exception as e:
+                self._failed(consumer, e)
+
+    def state(self):
+        """Consumer states for the analyzer's checkpoint (threaded consumers start over on resume)."""
+        return {c.name: c.state() for c in self.consumers
+                if not c.threaded and c.state() is not None}
+
+    def restore(self, state):
+        for consumer in self.consumers:
+            if consumer.name in (state or {}):
+                consumer.restore(state[consumer.name])
+
+    def finish(self, rep_index=None):
+        """
+        Wait for threaded consumers and collect every consumer's result
+        fields. `rep_index` (RepIndex.result()) is handed to the consumers
+        that score the counted reps.
+        """
+        for runner in self._runners.values():
+            runner.close()
+        self._runners = {}
+        fields = {}
+        for consumer in self.consumers:
+            if consumer.name in self.errors:
+                continue
+            consumer.rep_index = rep_index
+            try:
+                fields.update(consumer.result())
+            except Exception as e:
+                self._failed(consumer, e)
+        if self.errors:
+            fields["stream_errors"] = dict(self.errors)
+        return fields
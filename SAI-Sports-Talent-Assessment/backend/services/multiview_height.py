@@ -0,0 +1,170 @@
+"""
+Multi-View Height Estimation
+Takes one rotation video, classifies every frame's view (front/left/right/back)
+from shoulder yaw, keeps the best frames per view and fuses them into a single
+height estimate. Only the selected frames are run through the full model.
+
+Usage: python multiview_height.py <rotation_video> [reference_image]
+"""
+
+import json
+import math
+import sys
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from height import (get_landmark_positions_3d, process_reference, estimate_height_m,
+                    reference_image, reference_height_m, FRAME_TOP_MAX, FRAME_FEET_MIN)
+from frame_quality import score_frame, TopKFrameIndex
+
+# ---------------- CONFIG ----------------
+VIEWS = ["front", "left", "right", "back"]
+FRAMES_PER_VIEW = 5          # best frames kept per view for the full-accuracy pass
+SCAN_WIDTH = 480             # frames are downscaled to this width for the scan pass
+SCAN_MODEL_COMPLEXITY = 0    # lite model for the scan pass
+FULL_MODEL_COMPLEXITY = 1    # must match the model used on the reference image
+# ----------------------------------------
+
+mp_pose = mp.solutions.pose
+PL = mp_pose.PoseLandmark
+
+
+def shoulder_yaw_deg(positions_3d):
+    """Body yaw from the shoulder line, as in rotate_skeleton_to_front (0 = facing camera)."""
+    vec = positions_3d[PL.LEFT_SHOULDER] - positions_3d[PL.RIGHT_SHOULDER]
+    return math.degrees(math.atan2(vec[2], vec[0]))
+
+
+def classify_view(yaw_deg):
+    """
+    Map yaw to a view name, using the same naming as the ref_*.jpeg images:
+    turning left moves the left shoulder away from the camera (larger z),
+    which gives positive yaw.
+    """
+    if abs(yaw_deg) <= 45:
+        return "front"
+    if abs(yaw_deg) >= 135:
+        return "back"
+    return "left" if yaw_deg > 0 else "right"
+
+
+def scan_views(video_path):
+    """
+    Pass 1 (lite model, low resolution): score and classify every frame.
+    Returns ({view: TopKFrameIndex}, frames_scanned).
+    """
+    best = {v: TopKFrameIndex(FRAMES_PER_VIEW) for v in VIEWS}
+    cap = cv2.VideoCapture(video_path)
+    frame_idx = -1
+    prev_center = None
+    with mp_pose.Pose(model_complexity=SCAN_MODEL_COMPLEXITY, min_detection_confidence=0.5,
+                      min_tracking_confidence=0.5) as pose:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_idx += 1
+            h, w = frame.shape[:2]
+            if w > SCAN_WIDTH:
+                frame = cv2.resize(frame, (SCAN_WIDTH, int(h * SCAN_WIDTH / w)), interpolation=cv2.INTER_AREA)
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not res.pose_landmarks:
+                prev_center = None
+                continue
+            lm = res.pose_landmarks.landmark
+            score, prev_center = score_frame(lm, prev_center, FRAME_TOP_MAX, FRAME_FEET_MIN)
+            if score <= 0:
+                continue
+            view = classify_view(shoulder_yaw_deg(get_landmark_positions_3d(lm, w, h)))
+            best[view].offer(score, frame_idx)
+    cap.release()
+    return best, frame_idx + 1
+
+
+def measure_selected(video_path, selected, ref):
+    """
+    Pass 2 (full model, full resolution) on the selected frames only.
+    Frames in between are grabbed but never decoded to images or inferred.
+    """
+    heights = {}
+    cap = cv2.VideoCapture(video_path)
+    frame_idx = -1
+    last = max(selected) if selected else -1
+    # static mode: the selected frames are far apart, so tracking would not help
+    with mp_pose.Pose(static_image_mode=True, model_complexity=FULL_MODEL_COMPLEXITY,
+                      min_detection_confidence=0.5) as pose:
+        while frame_idx < last:
+            if not cap.grab():
+                break
+            frame_idx += 1
+            if frame_idx not in selected:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            h, w = frame.shape[:2]
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if res.pose_landmarks:
+                heights[frame_idx], _ = estimate_height_m(res.pose_landmarks.landmark, w, h, ref)
+    cap.release()
+    return heights
+
+
+def fuse_views(per_view_heights):
+    """Median within each view, then the mean across views so no single view dominates."""
+    view_estimates = {}
+    for view, hs in per_view_heights.items():
+        hs = [h for h in hs if np.isfinite(h) and h > 0]
+        if hs:
+            view_estimates[view] = float(np.median(hs))
+    if not view_estimates:
+        return None, view_estimates
+    return float(np.mean(list(view_estimates.values()))), view_estimates
+
+
+def estimate_multiview_height(video_path, ref_image_path=reference_image):
+    ref_img = cv2.imread(ref_image_path)
+    if ref_img is None:
+        return {"error": f"Cannot read reference image: {ref_image_path}"}
+    with mp_pose.Pose(static_image_mode=True, model_complexity=FULL_MODEL_COMPLEXITY,
+                      min_detection_confidence=0.5) as pose:
+        res = pose.process(cv2.cvtColor(ref_img, cv2.COLOR_BGR2RGB))
+    if not res.pose_landmarks:
+        return {"error": "No pose detected in reference image"}
+    h, w = ref_img.shape[:2]
+    ref = process_reference(res.pose_landmarks.landmark, w, h)
+
+    best, frames_scanned = scan_views(video_path)
+    frame_view = {idx: view for view, index in best.items() for idx in index.frame_indices()}
+    heights = measure_selected(video_path, set(frame_view), ref)
+
+    per_view = {v: [] for v in VIEWS}
+    for idx, height_m in heights.items():
+        per_view[frame_view[idx]].append(height_m)
+    height_m, view_estimates = fuse_views(per_view)
+    if height_m is None:
+        return {"error": "No usable frames found in rotation video"}
+
+    return {
+        "height_m": height_m,
+        "views": {v: {"height_m": view_estimates.get(v),
+                      "frames": best[v].frame_indices()} for v in VIEWS},
+        "missing_views": [v for v in VIEWS if v not in view_estimates],
+        "frames_scanned": frames_scanned,
+        "frames_measured": len(heights),
+        "reference_height_m": reference_height_m,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Usage: python multiview_height.py <rotation_video> [reference_image]"}))
+        sys.exit(1)
+    ref_path = sys.argv[2] if len(sys.argv) > 2 else reference_image
+    print(json.dumps(estimate_multiview_height(sys.argv[1], ref_path)))
+
+
+if __name__ == "__main__":
+    main()
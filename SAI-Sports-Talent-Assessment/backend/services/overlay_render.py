@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Overlay Render
+Annotated review video (skeleton, rep counter, rep phases) rendered after the
+analysis instead of inside it, so drawing never slows the primary result.
+
+With AI_OVERLAY=1 the analyzers also run the "landmarks" stream consumer,
+which saves the landmark series of every processed frame to
+AI_OVERLAY_DIR/<video id>/<analyzer>/landmarks.npz. After the
+result is ready, ai_analysis_wrapper.py calls start_overlay(), which starts
+this script as a detached low-priority process; it re-decodes the video,
+draws the saved landmarks and the rep index on a downscaled copy and writes
+overlay.mp4 in the same directory. The result carries the path and whether
+the file is "ready" or still "rendering".
+
+Run by hand:  python overlay_render.py <render job .json>
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from landmark_stream import StreamConsumer
+
+# ---------------- CONFIG ----------------
+DEFAULT_OVERLAY_DIR = os.path.join(tempfile.gettempdir(), "sai_overlays")
+MAX_WIDTH = 480            # overlay video is downscaled to at most this width
+CODECS = ["avc1", "mp4v"]  # first one the local OpenCV build can write
+MIN_VISIBILITY = 0.5
+NICE = 10                  # render below the analyzers' priority
+LOCK_STALE_S = 600         # a render lock older than this is from a dead renderer
+# MediaPipe Pose body connections (face landmarks are not drawn)
+CONNECTIONS = [(11, 12), (11, 13), (13, 15), (12, 14), (14, 16), (11, 23), (12, 24), (23, 24),
+               (23, 25), (25, 27), (27, 29), (29, 31), (27, 31), (24, 26), (26, 28), (28, 30),
+               (30, 32), (28, 32), (15, 17), (15, 19), (17, 19), (16, 18), (16, 20), (18, 20)]
+# ----------------------------------------
+
+
+def overlay_enabled():
+    return os.environ.get("AI_OVERLAY", "").strip().lower() in ("1", "true", "yes")
+
+
+def overlay_dir():
+    return os.environ.get("AI_OVERLAY_DIR", DEFAULT_OVERLAY_DIR)
+
+
+class LandmarkRecorder(StreamConsumer):
+    """Stream consumer that saves the (frame, 33 x 4 landmarks) series for the renderer."""
+    name = "landmarks"
+
+    def __init__(self, source="", fps=30.0):
+        super().__init__(source, fps)
+        from keyframes import current_video_id
+        self.path = os.path.join(overlay_dir(), current_video_id(), source or "frames", "landmarks.npz")
+        self.frames = []
+        self.points = []
+
+    def on_frame(self, frame):
+        if frame.points is not None:
+            self.frames.append(frame.index)
+            self.points.append(frame.points.astype(np.float16))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        points = np.stack(self.points) if self.points else np.zeros((0, 33, 4), dtype=np.float16)
+        np.savez(tmp, frames=np.array(self.frames, dtype=np.int32), points=points,
+                 fps=np.float32(self.fps))
+        os.replace(tmp, self.path)
+
+    def state(self):
+        # the series goes to disk, the checkpoint only records how much of it
+        self._save()
+        return {"path": self.path, "count": len(self.frames)}
+
+    def restore(self, state):
+        try:
+            data = np.load(state["path"])
+        except (OSError, KeyError, ValueError):
+            return
+        count = state.get("count", 0)
+        self.frames = data["frames"][:count].tolist()
+        self.points = list(data["points"][:count])
+
+    def result(self):
+        if not self.frames:
+            return {}
+        self._save()
+        return {"landmark_series": self.path}
+
+
+# -------- rendering --------
+def _open_writer(path, fps, size):
+    import cv2
+    for codec in CODECS:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+    raise RuntimeError("no usable MP4 codec in this OpenCV build")
+
+
+def _draw(image, points, color=(0, 255, 0)):
+    import cv2
+    h, w = image.shape[:2]
+    xy = np.round(points[:, :2].astype(np.float32) * (w, h)).astype(int)
+    visible = points[:, 3] >= MIN_VISIBILITY
+    for a, b in CONNECTIONS:
+        if visible[a] and visible[b]:
+            cv2.line(image, tuple(xy[a]), tuple(xy[b]), color, 2, cv2.LINE_AA)
+    for i in np.flatnonzero(visible[11:]) + 11:
+        cv2.circle(image, tuple(xy[i]), 3, (0, 0, 255), -1, cv2.LINE_AA)
+
+
+def _phase(rows, frame_no):
+    """'down' / 'up' inside a rep of the rep index, else None."""
+    for start, bottom, top, end in rows:
+        if start <= frame_no <= bottom:
+            return "down"
+        if bottom < frame_no <= top:
+            return "up"
+    return None
+
+
+def render(video_path, series_path, output_path, rep_index=None, title=""):
+    """Write an annotated, downscaled copy of the video to output_path."""
+    import cv2
+    data = np.load(series_path)
+    series = dict(zip(data["frames"].tolist(), data["points"]))
+    rows = (rep_index or {}).get("frames") or []
+    tops = sorted(row[2] for row in rows)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"could not open {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or float(data["fps"]) or 30.0
+    writer = None
+    tmp = output_path + ".part.mp4"
+    frame_no = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_no += 1
+            h, w = frame.shape[:2]
+            if w > MAX_WIDTH:
+                frame = cv2.resize(frame, (MAX_WIDTH, round(h * MAX_WIDTH / w)), interpolation=cv2.INTER_AREA)
+            if writer is None:
+                writer = _open_writer(tmp, fps, (frame.shape[1], frame.shape[0]))
+            points = series.get(frame_no)
+            if points is not None:
+                _draw(frame, points)
+            label = f"{title} reps: {bisect_right(tops, frame_no)}".strip()
+            phase = _phase(rows, frame_no)
+            if phase:
+                label += f"  [{phase}]"
+            cv2.putText(frame, label, (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+            cv2.putText(frame, f"{(frame_no - 1) / fps:6.2f}s", (8, frame.shape[0] - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+            writer.write(frame)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+    if writer is None:
+        raise RuntimeError("no frames decoded")
+    os.replace(tmp, output_path)
+
+
+def _take_lock(path):
+    """Create the render lock; False if a live renderer already holds it."""
+    try:
+        if time.time() - os.path.getmtime(path) > LOCK_STALE_S:
+            os.remove(path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def start_overlay(video_path, assessment_type, result):
+    """
+    Start rendering the overlay for a finished result in a detached process
+    and record where it will be. Does nothing without a landmark series.
+    """
+    series_path = result.get("landmark_series")
+    if not series_path or not os.path.exists(series_path):
+        return
+    directory = os.path.dirname(series_path)
+    output_path = os.path.join(directory, "overlay.mp4")
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(series_path):
+        result["overlay"] = {"path": output_path, "status": "ready"}
+        return
+    job_path = os.path.join(directory, "render_job.json")
+    with open(job_path, "w") as f:
+        json.dump({"video": os.path.abspath(video_path), "series": series_path, "output": output_path,
+                   "rep_index": result.get("rep_index"), "title": assessment_type}, f)
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "posix":
+        kwargs.update(start_new_session=True, preexec_fn=lambda: os.nice(NICE))
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), job_path], **kwargs)
+    result["overlay"] = {"path": output_path, "status": "rendering"}
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python overlay_render.py <render job .json>")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        job = json.load(f)
+    lock = job["output"] + ".lock"
+    if not _take_lock(lock):
+        return  # another renderer is on it
+    try:
+        render(job["video"], job["series"], job["output"], job.get("rep_index"), job.get("title", ""))
+    finally:
+        os.remove(lock)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Pose Backends
+One interface for pose inference, so the analyzers and offline batches can
+use a faster engine than mp.solutions.pose.Pose, which takes one image per
+call through the full MediaPipe graph.
+
+  solutions  mp.solutions.pose.Pose, one frame at a time (tracking between
+             frames, person detection included); the default
+  tflite     the pose landmark model bundled with the installed mediapipe
+             package (pose_landmark_full.tflite), run directly by a TFLite
+             interpreter on a whole batch per invoke. There is no person
+             detector in front of it: process_batch() takes crop boxes (or
+             the athlete must fill the frame), and process() crops around
+             the previous frame's landmarks, falling back to the whole frame.
+             The thread count comes from worker_config.tflite_threads().
+
+The analyzers build their backend with make_backend(), which picks
+AI_POSE_BACKEND (default "solutions"), and call process(rgb) exactly like
+Pose.process. process_batch() returns, per frame, a (33, 4) array of x, y,
+z, visibility in normalised image coordinates (landmark_stream.py layout),
+or None when nobody is found. bench_pose_backend.py compares their
+frames/sec.
+
+The interpreter is imported from ai_edge_litert, tflite_runtime or
+tensorflow, whichever is installed. None of them is in requirements.txt, so
+"tflite" is opt-in. Under ai_edge_litert it picks the right output tensors
+(landmarks, pose flag), its landmarks stay within about 0.017 (normalised
+units) of the solutions backend's, and it runs at about 37 frames/sec with
+batches of one.
+"""
+
+import importlib
+import importlib.util
+import os
+
+import cv2
+import numpy as np
+
+from landmark_predictor import array_to_landmarks
+from landmark_stream import landmarks_to_array
+from worker_config import tflite_threads
+
+# ---------------- CONFIG ----------------
+INTERPRETER_MODULES = ["ai_edge_litert.interpreter", "tflite_runtime.interpreter", "tensorflow.lite"]
+LANDMARK_MODEL = os.path.join("modules", "pose_landmark", "pose_landmark_full.tflite")
+INPUT_SIZE = 256            # pose landmark model input is 256 x 256 RGB in [0, 1]
+MODEL_LANDMARKS = 39        # 33 body landmarks + 6 auxiliary ones, 5 values each
+ROI_MARGIN = 0.25           # crop margin around the previous landmarks, share of their extent
+# ----------------------------------------
+
+
+class PoseResult:
+    """What Pose.process returns, as far as the analyzers use it: pose_landmarks.landmark."""
+    __slots__ = ("pose_landmarks", "landmark")
+
+    def __init__(self, points):
+        self.landmark = array_to_landmarks(points) if points is not None else None
+        self.pose_landmarks = self if points is not None else None
+
+
+class PoseBackend:
+    """process_batch(rgb frames) -> one (33, 4) array or None per frame."""
+    name = "backend"
+
+    def process_batch(self, frames):
+        raise NotImplementedError
+
+    def process(self, frame):
+        """One rgb frame, with the result shaped like mp.solutions.pose.Pose.process."""
+        return PoseResult(self.process_batch([frame])[0])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SolutionsBackend(PoseBackend):
+    name = "solutions"
+
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        from fast_imports import import_mediapipe_headless
+        mp = import_mediapipe_headless()
+        self.pose = mp.solutions.pose.Pose(min_detection_confidence=min_detection_confidence,
+                                           min_tracking_confidence=min_tracking_confidence)
+
+    def process_batch(self, frames):
+        results = []
+        for frame in frames:
+            res = self.pose.process(frame)
+            results.append(landmarks_to_array(res.pose_landmarks.landmark) if res.pose_landmarks else None)
+        return results
+
+    def process(self, frame):
+        return self.pose.process(frame)
+
+    def close(self):
+        self.pose.close()
+
+
+def interpreter_class():
+    """The first TFLite Interpreter class that can be imported, or None."""
+    for module in INTERPRETER_MODULES:
+        try:
+            return importlib.import_module(module).Interpreter
+        except ImportError:
+            continue
+    return None
+
+
+def landmark_model_path():
+    """The pose landmark model inside the installed mediapipe package (without importing it)."""
+    spec = importlib.util.find_spec("mediapipe")
+    if spec is None or not spec.origin:
+        return None
+    path = os.path.join(os.path.dirname(spec.origin), LANDMARK_MODEL)
+    return path if os.path.exists(path) else None
+
+
+def square_crop(frame, box=None):
+    """
+    Letterbox `box` (x0, y0, x1, y1 in pixels, default the whole frame) into a
+    square model input. Returns the input array and the (x0, y0, side) that
+    maps model coordinates back to the frame.
+    """
+    h, w = frame.shape[:2]
+    x0, y0, x1, y1 = box if box is not None else (0, 0, w, h)
+    side = max(x1 - x0, y1 - y0)
+    cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    x0, y0 = int(round(cx - side / 2.0)), int(round(cy - side / 2.0))
+    side = int(round(side))
+    canvas = np.zeros((side, side, 3), dtype=frame.dtype)
+    sx0, sy0, sx1, sy1 = max(x0, 0), max(y0, 0), min(x0 + side, w), min(y0 + side, h)
+    if sx1 > sx0 and sy1 > sy0:
+        canvas[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = frame[sy0:sy1, sx0:sx1]
+    crop = cv2.resize(canvas, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    return crop.astype(np.float32) / 255.0, (x0, y0, side)
+
+
+def roi_from_points(points, width, height, margin=ROI_MARGIN):
+    """Crop box around (33, 4) landmarks from the previous frame, for the next crop."""
+    visible = points[points[:, 3] >= 0.5] if points is not None else None
+    if visible is None or len(visible) < 4:
+        return None
+    xs, ys = visible[:, 0] * width, visible[:, 1] * height
+    pad = margin * max(xs.max() - xs.min(), ys.max() - ys.min())
+    return (xs.min() - pad, ys.min() - pad, xs.max() + pad, ys.max() + pad)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class TFLiteBackend(PoseBackend):
+    name = "tflite"
+
+    def __init__(self, model_path=None, num_threads=None, min_detection_confidence=0.5,
+                 min_tracking_confidence=0.5):
+        interpreter_cls = interpreter_class()
+        if interpreter_cls is None:
+            raise ImportError("no TFLite interpreter installed (ai_edge_litert, tflite_runtime or tensorflow)")
+        model_path = model_path or landmark_model_path()
+        if model_path is None:
+            raise FileNotFoundError("pose_landmark_full.tflite not found in the mediapipe package")
+        self.interpreter = interpreter_cls(model_path=model_path, num_threads=num_threads or tflite_threads())
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        self.batch = None
+        self.min_detection = min_detection_confidence   # pose flag needed on a whole frame
+        self.min_tracking = min_tracking_confidence     # ... and on a crop around the last pose
+        self.roi = None  # crop box for the next process() call
+
+    def _resize(self, batch):
+        if batch != self.batch:
+            self.interpreter.resize_tensor_input(self.input_index, [batch, INPUT_SIZE, INPUT_SIZE, 3])
+            self.interpreter.allocate_tensors()
+            self.batch = batch
+            outputs = self.interpreter.get_output_details()
+            # landmarks: (batch, 39 * 5); pose flag: (batch, 1)
+            self.landmark_index = next(o["index"] for o in outputs
+                                       if o["shape"][-1] == MODEL_LANDMARKS * 5 and len(o["shape"]) == 2)
+            self.flag_index = next(o["index"] for o in outputs
+                                   if o["shape"][-1] == 1 and len(o["shape"]) == 2)
+
+    def process_batch(self, frames, boxes=None):
+        """`boxes`: optional crop box per frame (see square_crop), else the whole frame."""
+        if not frames:
+            return []
+        crops, transforms = zip(*(square_crop(f, boxes[i] if boxes else None) for i, f in enumerate(frames)))
+        self._resize(len(frames))
+        self.interpreter.set_tensor(self.input_index, np.stack(crops))
+        self.interpreter.invoke()
+        raw = self.interpreter.get_tensor(self.landmark_index).reshape(len(frames), MODEL_LANDMARKS, 5)
+        # the pose flag output is the model's activation_poseflag/Sigmoid, already 0..1
+        flags = self.interpreter.get_tensor(self.flag_index).reshape(-1)
+
+        results = []
+        for i, (frame, landmarks, flag, (x0, y0, side)) in enumerate(zip(frames, raw, flags, transforms)):
+            if flag < (self.min_tracking if boxes and boxes[i] is not None else self.min_detection):
+                results.append(None)
+                continue
+            h, w = frame.shape[:2]
+            scale = side / float(INPUT_SIZE)
+            points = np.empty((33, 4), dtype=np.float32)
+            points[:, 0] = (landmarks[:33, 0] * scale + x0) / w
+            points[:, 1] = (landmarks[:33, 1] * scale + y0) / h
+            points[:, 2] = landmarks[:33, 2] * scale / w
+            points[:, 3] = _sigmoid(landmarks[:33, 3])  # visibility is a logit, as in MediaPipe's graph
+            results.append(points)
+        return results
+
+    def process(self, frame):
+        points = self.process_batch([frame], [self.roi])[0]
+        h, w = frame.shape[:2]
+        self.roi = roi_from_points(points, w, h)  # None: back to the whole frame
+        return PoseResult(points)
+
+
+BACKENDS = {"solutions": SolutionsBackend, "tflite": TFLiteBackend}
+
+
+def make_backend(name=None, **kwargs):
+    """Backend by name, AI_POSE_BACKEND, else "solutions"."""
+    name = (name or os.environ.get("AI_POSE_BACKEND", "") or "solutions").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"unknown pose backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,99 @@
+"""
+Progress Events
+Newline-delimited JSON progress events written to a side channel, so the
+caller can show progress and tell a stuck analysis from a slow one without
+mixing anything into the analyzer's stdout result.
+
+The channel is an inherited file descriptor named by AI_PROGRESS_FD (the Node
+service opens it as an extra pipe). Without it every call is a no-op.
+
+Event fields: event ("stage" | "progress" | "done"), source, frames,
+total_frames, percent, fps (processing rate), reps, eta_sec, elapsed_sec.
+"""
+
+import json
+import os
+import time
+
+PROGRESS_FD_ENV = "AI_PROGRESS_FD"
+PROGRESS_INTERVAL_S = 0.5  # minimum spacing between "progress" events
+
+
+def progress_fd():
+    """The inherited progress descriptor, or None."""
+    try:
+        fd = int(os.environ.get(PROGRESS_FD_ENV, ""))
+        os.fstat(fd)
+    except (ValueError, OSError):
+        return None
+    return fd
+
+
+class ProgressReporter:
+    """Throttled NDJSON progress writer for one analyzer run."""
+
+    def __init__(self, fd=None, source="", total_frames=None, start_frame=0,
+                 interval=PROGRESS_INTERVAL_S):
+        self.source = source
+        self.total_frames = int(total_frames) if total_frames and total_frames > 0 else None
+        self.interval = interval
+        self.started = time.monotonic()
+        self._start_frame = start_frame
+        self._last_emit = 0.0
+        self._out = None
+        if fd is not None:
+            try:
+                self._out = os.fdopen(fd, "w", buffering=1, closefd=False)
+            except OSError:
+                self._out = None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(progress_fd(), **kwargs)
+
+    @property
+    def enabled(self):
+        return self._out is not None
+
+    def _emit(self, event):
+        if self._out is None:
+            return
+        event.setdefault("source", self.source)
+        try:
+            self._out.write(json.dumps(event) + "\n")
+        except (OSError, ValueError):
+            self._out = None  # reader went away: stop reporting, keep analyzing
+
+    def resume_at(self, frame):
+        """Rates and ETA are measured from `frame` (e.g. after a checkpoint resume)."""
+        self._start_frame = frame
+
+    def stage(self, name, **fields):
+        self._emit(dict(fields, event="stage", stage=name,
+                        elapsed_sec=round(time.monotonic() - self.started, 2)))
+
+    def update(self, frames, reps=None, force=False):
+        """Report `frames` processed so far; throttled unless `force`."""
+        if self._out is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_emit < self.interval:
+            return
+        self._last_emit = now
+        self._emit(self._snapshot("progress", frames, reps, now))
+
+    def done(self, frames, reps=None, **fields):
+        self._emit(dict(self._snapshot("done", frames, reps, time.monotonic()), **fields))
+
+    def _snapshot(self, event, frames, reps, now):
+        elapsed = now - self.started
+        done_here = frames - self._start_frame
+        rate = done_here / elapsed if elapsed > 0 and done_here > 0 else None
+        event = {"event": event, "frames": frames, "total_frames": self.total_frames,
+                 "fps": round(rate, 1) if rate else None, "reps": reps,
+                 "elapsed_sec": round(elapsed, 2), "percent": None, "eta_sec": None}
+        if self.total_frames:
+            event["percent"] = round(min(100.0, 100.0 * frames / self.total_frames), 1)
+            if rate:
+                event["eta_sec"] = round(max(0, self.total_frames - frames) / rate, 1)
+        return event
@@ -1,17 +1,30 @@
 import cv2
-import mediapipe as mp
-from collections import deque
+import os
 import sys
 import json
 
+from analysis_budget import AnalysisBudget
+from checkpoint import AnalysisCheckpoint, seek_to_frame
+from early_abort import EarlyAbortPolicy
+from fast_imports import import_mediapipe_headless
+from landmark_predictor import LandmarkPredictor
+from landmark_stream import LandmarkStream
+from pose_backend import make_backend
+from progress import ProgressReporter
+from time_axis import TimeAxis, TimeWindow
+from rep_index import RepIndex
+from video_fingerprint import trajectory_signature
+from worker_config import apply_worker_config
+
 # Check if video path is provided as argument
 if len(sys.argv) > 1:
     video_filename = sys.argv[1]
 else:
     video_filename = "your_pushup_video.mp4"
 
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
+# ---- TUNE THESE ----
+SMOOTH_SEC = 0.1  # rep signal smoothing window (3 frames at 30 fps), see time_axis.py
+# ---------------------
 
 def shoulder_wrist_y(lm, h):
     """Return vertical distance between shoulder and wrist on best-visible side."""
@@ -24,61 +37,137 @@ def shoulder_wrist_y(lm, h):
         return (lm[mp_pose.PoseLandmark.LEFT_WRIST].y -
                 lm[mp_pose.PoseLandmark.LEFT_SHOULDER].y) * h
 
-# ---------- PASS 1: find thresholds ----------
+# Thread count / CPU pinning from the launcher, before any thread pools exist
+apply_worker_config()
+
+# Fail fast on unreadable input before paying for the mediapipe import
 cap = cv2.VideoCapture(video_filename)
+if not cap.isOpened():
+    result = {"error": "Could not open video"}
+    print(json.dumps(result))
+    exit()
+
+mp = import_mediapipe_headless()
+mp_pose = mp.solutions.pose
+
+budget = AnalysisBudget.from_env()
+fps = cap.get(cv2.CAP_PROP_FPS)
+progress = ProgressReporter.from_env(source="pushup", total_frames=cap.get(cv2.CAP_PROP_FRAME_COUNT))
+early_abort = EarlyAbortPolicy(fps, cap.get(cv2.CAP_PROP_FRAME_COUNT),
+                               [(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_WRIST),
+                                (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_WRIST)])
+# every processed frame also feeds the extra metrics (quality, technique, ...)
+stream = LandmarkStream.from_env(fps, source="pushup")
+axis = TimeAxis(fps)
+predictor = LandmarkPredictor.from_env()  # fills short detection gaps
+
+# ---------- PASS 1: find thresholds ----------
+# The per-frame distances are kept so PASS 2 replays them instead of
+# decoding the video a second time.
 distances = []
+distance_frames = []  # frame number of each entry, for the rep index
+smoothed = []         # the counter's signal, smoothed here so keyframes can follow it
+smooth = TimeWindow(SMOOTH_SEC)
+frames_read = 0
+
+def checkpoint_state():
+    return {"distances": distances, "distance_frames": distance_frames, "smoothed": smoothed,
+            "smooth": smooth.state(), "axis": axis.state(), "predictor": predictor.state(),
+            "stream": stream.state()}
+
+# Resume from a checkpoint left by an earlier run that was cut short
+checkpoint = AnalysisCheckpoint(video_filename, os.path.abspath(__file__), {"smooth": SMOOTH_SEC})
+state = checkpoint.load()
+resumed_from = 0
+if state and seek_to_frame(cap, state["frame"]):
+    distances = state["distances"]
+    distance_frames = state["distance_frames"]
+    smoothed = state["smoothed"]
+    smooth = TimeWindow(SMOOTH_SEC, state["smooth"])
+    axis = TimeAxis(fps, state=state["axis"])
+    predictor = LandmarkPredictor.from_env(state=state["predictor"])
+    frames_read = resumed_from = state["frame"]
+    progress.resume_at(resumed_from)
+    early_abort.last_seen = resumed_from
+    stream.restore(state.get("stream"))
 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while True:
+with make_backend(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+    while not budget.exhausted(frames_read - resumed_from):
         ret, frame = cap.read()
         if not ret: break
+        frames_read += 1
+        t = axis.stamp(cap, frames_read)
         h, w = frame.shape[:2]
-        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        if res.pose_landmarks:
-            d = shoulder_wrist_y(res.pose_landmarks.landmark, h)
+        if predictor.skip_inference(t, frames_read):
+            landmarks = predictor.fill(t, None, inferred=False)
+        else:
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            landmarks = predictor.fill(t, res.pose_landmarks.landmark if res.pose_landmarks else None)
+        stream.publish(frames_read, frame, landmarks, t, predictor.last_predicted)
+        if landmarks:
+            d = shoulder_wrist_y(landmarks, h)
             distances.append(d)
+            distance_frames.append(frames_read)
+            smoothed.append(smooth.add(t, d))
+            stream.signal(frames_read, smoothed[-1])
+        if early_abort.observe(frames_read, landmarks):
+            # nobody in view for a while: look further ahead before decoding the rest
+            resume = early_abort.probe_ahead(cap, pose, frames_read)
+            if resume is None:
+                break
+            frames_read = resume
+        progress.update(frames_read)
+        if checkpoint.due(frames_read):
+            checkpoint.save(frames_read, checkpoint_state())
 
 cap.release()
+checkpoint.finish(frames_read, checkpoint_state(), budget.stopped)
 if not distances:
     result = {"error": "No pose detected."}
+    result.update(budget.result_fields(frames_read, fps))
+    result.update(stream.finish())
+    if early_abort.report():
+        result["early_abort"] = early_abort.report()
     print(json.dumps(result))
     exit()
 
-down_thresh = max(distances) - 5   # chest close to floor → max distance
-up_thresh   = min(distances) + 5   # body up → min distance
+down_thresh = max(distances) - 5   # arms straight → max distance (wrist far below shoulder)
+up_thresh   = min(distances) + 5   # chest close to floor → min distance
 
 # ---------- PASS 2: count reps ----------
-cap = cv2.VideoCapture(video_filename)
 rep_count = 0
 rep_in_progress = False
-smooth = deque(maxlen=3)
+reps = RepIndex(fps, bottom_is_high=False)  # chest down (min distance) is the bottom
 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
-        h, w = frame.shape[:2]
-        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        if res.pose_landmarks:
-            d = shoulder_wrist_y(res.pose_landmarks.landmark, h)
-            smooth.append(d)
-            avg_d = sum(smooth)/len(smooth)
+for frame_no, avg_d in zip(distance_frames, smoothed):
+    reps.observe(frame_no, avg_d)
 
-            if not rep_in_progress and avg_d > down_thresh:
-                rep_in_progress = True
-            elif rep_in_progress and avg_d < up_thresh:
-                rep_count += 1
-                rep_in_progress = False
+    if not rep_in_progress and avg_d > down_thresh:
+        rep_in_progress = True
+        reps.begin(frame_no)
+    elif rep_in_progress and avg_d < up_thresh:
+        rep_count += 1
+        rep_in_progress = False
+        reps.complete(frame_no)
 
-        # Skip GUI rendering for programmatic use
-        # Only output the final result
-
-cap.release()
+# technique scores the reps counted above
+rep_index = reps.result(axis.time_of)
+stream_fields = stream.finish(rep_index)
 
 # Output result as JSON
 result = {
     "rep_count": rep_count,
     "up_threshold": up_thresh,
-    "down_threshold": down_thresh
+    "down_threshold": down_thresh,
+    "resumed_from_frame": resumed_from,
+    "trajectory": trajectory_signature(distances, fps, distance_frames),
+    "rep_index": rep_index,
+    "time_axis": axis.report(),
+    "prediction": predictor.report()
 }
-print(json.dumps(result))
\ No newline at end of file
+result.update(budget.result_fields(frames_read, fps))
+result.update(stream_fields)
+if early_abort.report():
+    result["early_abort"] = early_abort.report()
+progress.done(frames_read, rep_count, partial=budget.stopped)
+print(json.dumps(result))
@@ -0,0 +1,109 @@
+"""
+Rep Index
+Records where every counted rep is in the video, so reviewers, clip
+extraction and keyframes can seek straight to a rep instead of scrubbing or
+re-decoding the whole video. Each rep is one row of frame indices:
+
+  start   athlete at rest before the rep (the rest extreme, e.g. arms straight)
+  bottom  deepest point (push-up chest down, sit-up lying back, jump countermovement)
+  top     top of the movement (arms straight again, sat up, jump apex)
+  end     at rest again after the rep (the next rep's start; for push-ups
+          and sit-ups the same frame as top)
+
+A shuttle-run row is one counted turn: the previous turn, the last frame
+running out, the first frame running back and (again) that frame.
+
+The result is columnar: {"fps", "columns", "frames": [[start, bottom, top,
+end], ...], "seconds": [...]}. Frames are the analyzer's 1-based frame
+counter; seconds are the presentation time of that frame (its container
+timestamp, see time_axis.py), so a player or cv2 seek lands on it. Rows are
+added in the analyzer's counting code, so the index always has exactly
+rep_count rows.
+"""
+
+# ---------------- CONFIG ----------------
+COLUMNS = ("start", "bottom", "top", "end")
+DEFAULT_FPS = 30.0
+# ----------------------------------------
+
+
+class RepIndex:
+    """
+    Rows can be added directly (add) or tracked from a counter's signal:
+    call observe() for every value, begin() when the counter arms a rep
+    (athlete at the rest side of the movement) and complete() when it counts
+    it (athlete crossed into the bottom side). `bottom_is_high` tells which
+    direction of the signal is the bottom of a rep.
+
+    The counted row is not final at complete(): the deepest point comes
+    after the count crossing, so the bottom keeps following the signal until
+    it turns back, and top/end follow the return to the rest extreme until
+    the next rep is counted (or the video ends). top and end are the same
+    frame for tracked reps: back at rest is where the next rep starts.
+    """
+
+    def __init__(self, fps, bottom_is_high=True, state=None):
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.sign = 1.0 if bottom_is_high else -1.0
+        self.rows = []
+        self._in_rep = False
+        self._rest = None     # (frame, value) most "at rest" since the last count
+        self._deep = None     # deepest value of the last counted rep
+        self._high = None     # most "at rest" value since that bottom
+        self._last = None     # last observed (frame, value)
+        if state:
+            self.rows = [list(r) for r in state["rows"]]
+            self._in_rep = state["in_rep"]
+            self._rest = tuple(state["rest"]) if state["rest"] else None
+            self._deep = state["deep"]
+            self._high = state["high"]
+
+    def add(self, start, bottom, top, end=None):
+        self.rows.append([int(start), int(bottom), int(top), None if end is None else int(end)])
+
+    def observe(self, frame, value):
+        value = self.sign * float(value)
+        self._last = (frame, value)
+        if self._rest is None or value < self._rest[1]:
+            self._rest = (frame, value)
+        if self._deep is None:
+            return
+        row = self.rows[-1]
+        if not self._in_rep and value > self._deep:
+            # still going down after the count crossing
+            self._deep = self._high = value
+            row[1] = row[2] = row[3] = frame
+        elif value < self._high:
+            # coming back up: the rest extreme is the top (and the next start)
+            self._high = value
+            row[2] = row[3] = frame
+
+    def begin(self, frame):
+        """The counter armed a rep at `frame` (rest side)."""
+        self._in_rep = True
+
+    def complete(self, frame):
+        """The counter counted the armed rep at `frame` (bottom side)."""
+        start = self._rest[0] if self._rest else frame
+        self.add(start, frame, frame, frame)
+        self._in_rep = False
+        self._rest = None
+        self._deep = self._high = self._last[1] if self._last and self._last[0] == frame else float("-inf")
+
+    def finish(self, last_frame=None):
+        """Close the index; an open rep that was never counted is dropped."""
+        for row in self.rows:
+            if row[3] is None:
+                row[3] = row[2] if last_frame is None else max(row[2], int(last_frame))
+
+    def state(self):
+        return {"rows": self.rows, "in_rep": self._in_rep, "rest": self._rest,
+                "deep": self._deep, "high": self._high}
+
+    def result(self, time_of=None):
+        """`time_of` maps a frame to its timestamp (TimeAxis.time_of); default is the nominal fps."""
+        self.finish()
+        if time_of is None:
+            time_of = lambda f: max(f - 1, 0) / self.fps
+        return {"fps": round(self.fps, 3), "columns": list(COLUMNS), "frames": self.rows,
+                "seconds": [[round(time_of(f), 3) for f in row] for row in self.rows]}
@@ -0,0 +1,239 @@
+"""
+Analysis Result Cache
+Stores finished wrapper results on local disk so that a resubmitted clip (app
+retries, the same video uploaded again, a re-triggered analysis) is answered
+from the cache instead of re-running pose inference.
+
+An entry is keyed by the video's content hash, the assessment type, the
+analyzer version (hash of the analyzer script, the sibling modules it imports
+and this wrapper, so any code or constant change invalidates it) and the
+parameters that change results. Only complete, successful results are
+stored; the least recently used entries are evicted past a count/size limit.
+Results point at files on disk (keyframes, the overlay landmark series); an
+entry whose files have since been deleted is treated as a miss.
+
+Set AI_RESULT_CACHE_DIR to choose the directory; AI_RESULT_CACHE=0 disables.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- CONFIG ----------------
+CACHE_DIR = os.environ.get("AI_RESULT_CACHE_DIR",
+                           os.path.join(tempfile.gettempdir(), "sai_result_cache"))
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+HASH_CHUNK_BYTES = 1 << 20
+ANALYZER_SCRIPTS = {"push-ups": "pushup.py", "sit-ups": "situp_counter.py",
+                    "vertical-jump": "vertical_jump.py", "shuttle-run": "shuttle_run.py"}
+# Environment settings that change what an analyzer reports
+RESULT_PARAMS_ENV = ["AI_ABORT_WINDOW_S", "AI_MAX_FRAMES", "AI_STREAM_CONSUMERS", "AI_OVERLAY",
+                     "AI_INFER_EVERY", "AI_POSE_BACKEND", "AI_KEYFRAME_DIR", "AI_KEYFRAME_FORMAT",
+                     "AI_OVERLAY_DIR"]
+# Libraries whose version changes the landmarks
+RESULT_LIBRARIES = ["mediapipe", "cv2"]
+# ----------------------------------------
+
+_IMPORT_RE = re.compile(r"^\s*(?:from|import)\s+(\w+)", re.MULTILINE)
+_LAZY_IMPORT_RE = re.compile(r"[\"'](\w+)\.[A-Z]\w*[\"']")  # "module.Class" references
+
+
+def cache_enabled():
+    return os.environ.get("AI_RESULT_CACHE", "1").strip() not in ("0", "false", "no")
+
+
+def content_hash(video_path, directory=CACHE_DIR):
+    """
+    SHA-256 of the video bytes. Remembered per (path, size, mtime) so a
+    repeated lookup of the same file does not read it again.
+    """
+    st = os.stat(video_path)
+    stat_key = hashlib.sha1(f"{os.path.abspath(video_path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+    memo_path = os.path.join(directory, "hashes", stat_key)
+    try:
+        with open(memo_path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    h = hashlib.sha256()
+    with open(video_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _atomic_write(memo_path, digest)
+    return digest
+
+
+def _source_files(script_name):
+    """The analyzer script plus every sibling module it (transitively) imports or references lazily."""
+    seen, pending = [], [script_name]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(SCRIPT_DIR, name)
+        if name in seen or not os.path.exists(path):
+            continue
+        seen.append(name)
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        pending.extend(m + ".py" for m in _IMPORT_RE.findall(source) + _LAZY_IMPORT_RE.findall(source))
+    return sorted(seen)
+
+
+def _library_stamps():
+    """Install location and mtime of each library, found without importing it."""
+    import importlib.util
+
+    stamps = {}
+    for name in RESULT_LIBRARIES:
+        try:
+            spec = importlib.util.find_spec(name)
+            if spec and spec.origin:
+                stamps[name] = f"{spec.origin}:{os.stat(spec.origin).st_mtime_ns}"
+        except (ImportError, ValueError, OSError):
+            pass
+    return stamps
+
+
+def analyzer_version(assessment_type):
+    """Hash of the code and libraries that produce a result for this type."""
+    h = hashlib.sha1()
+    script = ANALYZER_SCRIPTS.get(assessment_type)
+    for name in sorted(set((_source_files(script) if script else []) + _source_files("ai_analysis_wrapper.py"))):
+        with open(os.path.join(SCRIPT_DIR, name), "rb") as f:
+            h.update(name.encode() + b"\0" + f.read())
+    h.update(json.dumps(_library_stamps(), sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def result_params():
+    return {name: os.environ[name] for name in RESULT_PARAMS_ENV if os.environ.get(name)}
+
+
+def result_key(video_hash, assessment_type):
+    """Cache key of a result for the video with content hash `video_hash`."""
+    h = hashlib.sha1()
+    h.update(video_hash.encode())
+    h.update(assessment_type.encode())
+    h.update(analyzer_version(assessment_type).encode())
+    h.update(json.dumps(result_params(), sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def result_files(result):
+    """Paths of the files a result refers to (keyframes, thumbnail, landmark series)."""
+    keyframes = result.get("keyframes") or {}
+    paths = [keyframes.get("thumbnail"), result.get("landmark_series")]
+    paths.extend(k.get("path") for k in keyframes.get("frames") or [])
+    return [p for p in paths if p]
+
+
+def load_result(key, directory=CACHE_DIR):
+    """Cached result stored under `key`, or None (also when its files are gone)."""
+    path = os.path.join(directory, "results", key + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not all(os.path.exists(p) for p in result_files(result)):
+        try:
+            os.remove(path)  # would point the app at deleted keyframes
+        except OSError:
+            pass
+        return None
+    try:
+        os.utime(path)  # mark as recently used
+    except OSError:
+        pass
+    return result
+
+
+def _atomic_write(path, text):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # a failed cache write must never fail the analysis
+
+
+class ResultCache:
+    """Disk LRU cache of wrapper results for one (video, assessment type)."""
+
+    def __init__(self, video_path, assessment_type, directory=CACHE_DIR):
+        self.enabled = cache_enabled()
+        self.directory = directory
+        self.video_hash = None
+        self.key = None
+        self.path = None
+        if self.enabled:
+            try:
+                self.video_hash = content_hash(video_path, directory)
+                self.key = result_key(self.video_hash, assessment_type)
+                self.path = os.path.join(directory, "results", self.key + ".json")
+            except OSError:
+                self.enabled = False
+
+    def get(self):
+        """Cached result dict or None."""
+        if not self.enabled:
+            return None
+        return load_result(self.key, self.directory)
+
+    def put(self, result):
+        """Store a result if it is complete and successful."""
+        if not self.enabled or result.get("error") or result.get("partial"):
+            return False
+        stored = {k: v for k, v in result.items()
+                  if k not in ("queue", "worker", "cache", "near_duplicates", "duplicate_of")}
+        _atomic_write(self.path, json.dumps(stored))
+        evict(self.directory)
+        return True
+
+
+def evict(directory=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """Remove least recently used results beyond the count and size limits."""
+    results_dir = os.path.join(directory, "results")
+    try:
+        entries = []
+        for name in os.listdir(results_dir):
+            path = os.path.join(results_dir, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+    except OSError:
+        return 0
+    entries.sort(reverse=True)  # most recently used first
+    removed, total = 0, 0
+    for i, (_, size, path) in enumerate(entries):
+        total += size
+        if i >= max_entries or total > max_bytes:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    if removed:
+        _prune_hash_memos(directory, max_entries)
+    return removed
+
+
+def _prune_hash_memos(directory, keep):
+    """Hash memos are tiny; keep only the newest `keep` of them."""
+    memo_dir = os.path.join(directory, "hashes")
+    try:
+        memos = sorted((os.path.join(memo_dir, n) for n in os.listdir(memo_dir)),
+                       key=os.path.getmtime, reverse=True)
+    except OSError:
+        return
+    for path in memos[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,211 @@
+"""
+Height Results Store
+SQLite-backed store for height captures. Measurement rows and capture images
+are queued and written by a background thread in batches, so a capture
+session never waits on disk I/O.
+
+Rows from the CSV that height2.py appended to before the database existed
+are imported once, the first time the database is created (`legacy_csv`).
+"""
+
+import csv
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import cv2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    athlete_id TEXT,
+    direction TEXT,
+    height_cm REAL,
+    captured_at REAL,
+    image_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_measurements_athlete ON measurements (athlete_id, captured_at);
+CREATE INDEX IF NOT EXISTS idx_measurements_direction ON measurements (direction, captured_at);
+CREATE INDEX IF NOT EXISTS idx_measurements_time ON measurements (captured_at);
+"""
+
+COLUMNS = ["id", "athlete_id", "direction", "height_cm", "captured_at", "image_path"]
+CSV_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_STOP = object()
+
+
+def read_csv_rows(csv_path):
+    """
+    Measurement rows from a height CSV: the old append-only file
+    (Timestamp, Direction, Height_cm) or an export_csv() file. Rows that do
+    not parse are skipped.
+    """
+    rows = []
+    with open(csv_path, newline='') as f:
+        for r in csv.DictReader(f):
+            try:
+                captured_at = time.mktime(time.strptime(r["Timestamp"], CSV_TIME_FORMAT))
+                height_cm = round(float(r["Height_cm"]), 2)
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((r.get("Athlete") or None, r.get("Direction"), height_cm, captured_at,
+                         r.get("Image") or None))
+    return rows
+
+
+class HeightResultStore:
+    """Append-mostly store with an asynchronous, batching writer."""
+
+    def __init__(self, db_path, image_dir=None, batch_size=64, flush_interval=0.5, legacy_csv=None):
+        self.db_path = db_path
+        self.image_dir = image_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if image_dir:
+            os.makedirs(image_dir, exist_ok=True)
+
+        # Create the schema up front so queries work before the first flush
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        empty = conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 0
+        if empty and legacy_csv and os.path.isfile(legacy_csv):
+            conn.executemany(
+                "INSERT INTO measurements (athlete_id, direction, height_cm, captured_at, image_path) "
+                "VALUES (?, ?, ?, ?, ?)", read_csv_rows(legacy_csv))
+        conn.commit()
+        conn.close()
+
+        self._queue = queue.Queue()
+        self._image_seq = itertools.count()
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        # WAL lets queries run while the writer thread is committing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------------- WRITES (non-blocking) ----------------
+    def add_measurement(self, direction, height_cm, athlete_id=None, image=None, captured_at=None):
+        """
+        Queue one measurement (and optionally its capture image).
+        The image array is handed over to the writer; don't modify it afterwards.
+        Returns the path the image will be written to, or None.
+        """
+        captured_at = captured_at if captured_at is not None else time.time()
+        image_path = None
+        if image is not None and self.image_dir:
+            image_path = os.path.join(self.image_dir, f"{direction}_{int(captured_at * 1000)}_{next(self._image_seq)}.jpg")
+            self._queue.put(("image", image_path, image))
+        self._queue.put(("row", (athlete_id, direction, round(float(height_cm), 2), captured_at, image_path)))
+        return image_path
+
+    def add_many(self, measurements, athlete_id=None):
+        """Queue many (direction, height_cm[, captured_at]) tuples as one batch."""
+        now = time.time()
+        rows = []
+        for m in measurements:
+            direction, height_cm = m[0], m[1]
+            captured_at = m[2] if len(m) > 2 else now
+            rows.append((athlete_id, direction, round(float(height_cm), 2), captured_at, None))
+        self._queue.put(("rows", rows))
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [item]
+            # Drain whatever else is waiting so rows commit together
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = []
+            for entry in batch:
+                if entry is _STOP:
+                    stopping = True
+                elif entry[0] == "image":
+                    if not cv2.imwrite(entry[1], entry[2]):
+                        self._error = f"Could not write image: {entry[1]}"
+                elif entry[0] == "row":
+                    rows.append(entry[1])
+                elif entry[0] == "rows":
+                    rows.extend(entry[1])
+            try:
+                if rows:
+                    conn.executemany(
+                        "INSERT INTO measurements (athlete_id, direction, height_cm, captured_at, image_path) "
+                        "VALUES (?, ?, ?, ?, ?)", rows)
+                    conn.commit()
+            except sqlite3.Error as e:
+                self._error = f"Could not store measurements: {e}"
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+        if self._error:
+            error, self._error = self._error, None
+            raise IOError(error)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+        if self._error:
+            raise IOError(self._error)
+
+    # ---------------- READS ----------------
+    def query(self, athlete_id=None, direction=None, since=None, until=None, limit=None):
+        """Return measurements (newest first) filtered by athlete, direction and time range."""
+        clauses, params = [], []
+        if athlete_id is not None:
+            clauses.append("athlete_id = ?")
+            params.append(athlete_id)
+        if direction is not None:
+            clauses.append("direction = ?")
+            params.append(direction)
+        if since is not None:
+            clauses.append("captured_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("captured_at < ?")
+            params.append(until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM measurements"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY captured_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        conn = self._connect()
+        try:
+            return [dict(zip(COLUMNS, row)) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def export_csv(self, csv_path):
+        """Write all measurements, oldest first, to a CSV for spreadsheet use."""
+        rows = sorted(self.query(), key=lambda r: r["captured_at"])
+        with open(csv_path, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Timestamp", "Athlete", "Direction", "Height_cm", "Image"])
+            for r in rows:
+                writer.writerow([time.strftime(CSV_TIME_FORMAT, time.localtime(r["captured_at"])),
+                                 r["athlete_id"], r["direction"], r["height_cm"], r["image_path"]])
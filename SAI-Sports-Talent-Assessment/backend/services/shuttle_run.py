@@ -1,10 +1,22 @@
 import cv2
-import collections
 import numpy as np
-import mediapipe as mp
+import os
 import sys
 import json
 
+from analysis_budget import AnalysisBudget
+from checkpoint import AnalysisCheckpoint, seek_to_frame
+from early_abort import EarlyAbortPolicy
+from fast_imports import import_mediapipe_headless
+from landmark_predictor import LandmarkPredictor
+from landmark_stream import LandmarkStream
+from pose_backend import make_backend
+from progress import ProgressReporter
+from rep_index import RepIndex
+from time_axis import TimeAxis, TimeWindow, speed
+from video_fingerprint import TrajectorySampler
+from worker_config import apply_worker_config
+
 # Check if video path is provided as argument
 if len(sys.argv) > 1:
     VIDEO_FILE = sys.argv[1]
@@ -12,30 +24,47 @@ else:
     VIDEO_FILE = "your_shuttle_video.mp4"
 
 # ---- TUNE THESE ----
-WARMUP_FRAMES = 40
-SMOOTH_WINDOW = 5
-VELOCITY_THRESHOLD = 2.0
+# Windows and speeds are in seconds (time_axis.py), so they hold for any fps
+WARMUP_SEC = 1.33          # 40 frames at 30 fps
+SMOOTH_WINDOW_SEC = 0.167  # 5 frames at 30 fps
+VELOCITY_THRESHOLD = 60.0  # px/s (2 px per frame at 30 fps)
 BEND_DELTA_FRAC = 0.04
 # ---------------------
 
-pose = mp.solutions.pose.Pose(min_detection_confidence=0.5,
-                              min_tracking_confidence=0.5)
-drawer = mp.solutions.drawing_utils
+# Thread count / CPU pinning from the launcher, before any thread pools exist
+apply_worker_config()
 
+# Fail fast on unreadable input before paying for the mediapipe import
 cap = cv2.VideoCapture(VIDEO_FILE)
 if not cap.isOpened():
     result = {"error": "Could not open video"}
     print(json.dumps(result))
     exit()
 
-smooth_x = collections.deque(maxlen=SMOOTH_WINDOW)
-smooth_hand_rel = collections.deque(maxlen=SMOOTH_WINDOW)
+mp = import_mediapipe_headless()
+pose = None  # built on the first decoded frame
+budget = AnalysisBudget.from_env()
+fps = cap.get(cv2.CAP_PROP_FPS)
+progress = ProgressReporter.from_env(source="shuttle_run", total_frames=cap.get(cv2.CAP_PROP_FRAME_COUNT))
+early_abort = EarlyAbortPolicy(fps, cap.get(cv2.CAP_PROP_FRAME_COUNT),
+                               [(mp.solutions.pose.PoseLandmark.LEFT_HIP,
+                                 mp.solutions.pose.PoseLandmark.RIGHT_HIP)])
+# every processed frame also feeds the extra metrics (quality, technique, ...)
+stream = LandmarkStream.from_env(fps, source="shuttle_run")
+axis = TimeAxis(fps)
+predictor = LandmarkPredictor.from_env()  # fills short detection gaps
+
+smooth_x = TimeWindow(SMOOTH_WINDOW_SEC)
+smooth_hand_rel = TimeWindow(SMOOTH_WINDOW_SEC)
 hand_rel_samples = []
+trajectory = TrajectorySampler(fps)  # hip x track for duplicate detection
 frame_count = 0
 
-prev_x = None
+prev_x = None  # (time, smoothed hip x)
 prev_direction = None
 shuttles = 0  # <-- now counts full shuttles directly
+reps = RepIndex(fps)  # per shuttle: previous turn, last frame running out, first frame running back
+last_moving = None    # last frame running in prev_direction
 
 def safe_landmark(lm_list, idx):
     try:
@@ -44,26 +73,67 @@ def safe_landmark(lm_list, idx):
     except Exception:
         return None
 
-while True:
+def checkpoint_state():
+    return {"smooth_x": smooth_x.state(), "smooth_hand_rel": smooth_hand_rel.state(),
+            "hand_rel_samples": hand_rel_samples, "prev_x": prev_x,
+            "prev_direction": prev_direction, "shuttles": shuttles,
+            "reps": reps.state(), "last_moving": last_moving,
+            "trajectory": trajectory.state(), "axis": axis.state(), "predictor": predictor.state(),
+            "stream": stream.state()}
+
+# Resume from a checkpoint left by an earlier run that was cut short
+checkpoint = AnalysisCheckpoint(VIDEO_FILE, os.path.abspath(__file__),
+                                {"warmup": WARMUP_SEC, "smooth": SMOOTH_WINDOW_SEC,
+                                 "velocity": VELOCITY_THRESHOLD, "bend": BEND_DELTA_FRAC})
+state = checkpoint.load()
+resumed_from = 0
+if state and seek_to_frame(cap, state["frame"]):
+    smooth_x = TimeWindow(SMOOTH_WINDOW_SEC, state["smooth_x"])
+    smooth_hand_rel = TimeWindow(SMOOTH_WINDOW_SEC, state["smooth_hand_rel"])
+    hand_rel_samples = state["hand_rel_samples"]
+    prev_x = state["prev_x"]
+    prev_direction = state["prev_direction"]
+    shuttles = state["shuttles"]
+    reps = RepIndex(fps, state=state["reps"])
+    last_moving = state["last_moving"]
+    trajectory = TrajectorySampler(fps, state=state.get("trajectory"))
+    axis = TimeAxis(fps, state=state["axis"])
+    predictor = LandmarkPredictor.from_env(state=state["predictor"])
+    frame_count = resumed_from = state["frame"]
+    progress.resume_at(resumed_from)
+    early_abort.last_seen = resumed_from
+    stream.restore(state.get("stream"))
+
+while not budget.exhausted(frame_count - resumed_from):
     ret, frame = cap.read()
     if not ret:
         break
     frame_count += 1
+    t = axis.stamp(cap, frame_count)
     h, w = frame.shape[:2]
 
-    res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if pose is None:
+        pose = make_backend(min_detection_confidence=0.5,  # AI_POSE_BACKEND, see pose_backend.py
+                            min_tracking_confidence=0.5)
+    if predictor.skip_inference(t, frame_count):
+        landmarks = predictor.fill(t, None, inferred=False)
+    else:
+        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        landmarks = predictor.fill(t, res.pose_landmarks.landmark if res.pose_landmarks else None)
+    stream.publish(frame_count, frame, landmarks, t, predictor.last_predicted)
 
     avg_x = None
     avg_hand_rel = None
 
-    if res.pose_landmarks:
-        lm = res.pose_landmarks.landmark
+    if landmarks:
+        lm = landmarks
 
         left_hip = safe_landmark(lm, mp.solutions.pose.PoseLandmark.LEFT_HIP.value)
         right_hip = safe_landmark(lm, mp.solutions.pose.PoseLandmark.RIGHT_HIP.value)
         if left_hip and right_hip:
             hip_cx = ((left_hip[0] + right_hip[0]) / 2.0) * w
             hip_cy = ((left_hip[1] + right_hip[1]) / 2.0) * h
+            trajectory.add(frame_count, hip_cx)
         else:
             hip_cx = None
             hip_cy = None
@@ -77,12 +147,10 @@ while True:
             hand_y = max(left_wy, right_wy)
             hand_rel = hand_y - hip_cy
 
-            smooth_x.append(hip_cx)
-            smooth_hand_rel.append(hand_rel)
-            avg_x = sum(smooth_x) / len(smooth_x)
-            avg_hand_rel = sum(smooth_hand_rel) / len(smooth_hand_rel)
+            avg_x = smooth_x.add(t, hip_cx)
+            avg_hand_rel = smooth_hand_rel.add(t, hand_rel)
 
-            if frame_count <= WARMUP_FRAMES:
+            if t < WARMUP_SEC:
                 hand_rel_samples.append(avg_hand_rel)
             else:
                 if len(hand_rel_samples) > 0:
@@ -90,24 +158,54 @@ while True:
                     bend_threshold_px = BEND_DELTA_FRAC * h
                     bending = avg_hand_rel > (baseline_hand_rel + bend_threshold_px)
 
-                    if prev_x is not None:
-                        velocity = avg_x - prev_x
-                        if abs(velocity) > VELOCITY_THRESHOLD:
-                            direction = "right" if velocity > 0 else "left"
-                            if prev_direction is not None and direction != prev_direction and bending:
-                                shuttles += 1  # ✅ 1 bend = +1 shuttle
-                            prev_direction = direction
-                    prev_x = avg_x
+                    velocity = speed(prev_x, (t, avg_x)) if prev_x is not None else None
+                    if velocity is not None and abs(velocity) > VELOCITY_THRESHOLD:
+                        direction = "right" if velocity > 0 else "left"
+                        if prev_direction is not None and direction != prev_direction and bending:
+                            shuttles += 1  # ✅ 1 bend = +1 shuttle
+                            previous = reps.rows[-1][2] if reps.rows else last_moving
+                            reps.add(previous, last_moving, frame_count, frame_count)
+                            stream.keep(last_moving)  # keyframes: last stride out and the turn
+                            stream.keep(frame_count)
+                        prev_direction = direction
+                        last_moving = frame_count
+                        stream.hold(frame_count, "moving")
+                    prev_x = (t, avg_x)
+
+    if early_abort.observe(frame_count, landmarks):
+        # nobody in view for a while: look further ahead before decoding the rest
+        resume = early_abort.probe_ahead(cap, pose, frame_count)
+        if resume is None:
+            break
+        frame_count = resume
+    progress.update(frame_count, shuttles)
+    if checkpoint.due(frame_count):
+        checkpoint.save(frame_count, checkpoint_state())
 
     # Skip GUI rendering for programmatic use
     # Only output the final result
 
 cap.release()
-pose.close()
+checkpoint.finish(frame_count, checkpoint_state(), budget.stopped)
+rep_index = reps.result(axis.time_of)
+stream_fields = stream.finish(rep_index)  # technique scores the counted turns
+if pose is not None:
+    pose.close()
 
 # Output result as JSON
 result = {
     "rep_count": shuttles,
-    "warmup_frames": WARMUP_FRAMES
+    "warmup_frames": len(hand_rel_samples),
+    "warmup_sec": WARMUP_SEC,
+    "resumed_from_frame": resumed_from,
+    "trajectory": trajectory.signature(),
+    "rep_index": rep_index,
+    "time_axis": axis.report(),
+    "prediction": predictor.report()
 }
+result.update(budget.result_fields(frame_count, fps))
+result.update(stream_fields)
+if early_abort.report():
+    result["early_abort"] = early_abort.report()
+progress.done(frame_count, shuttles, partial=budget.stopped)
 print(json.dumps(result))
\ No newline at end of file
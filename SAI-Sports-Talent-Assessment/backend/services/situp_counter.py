@@ -1,17 +1,30 @@
 import cv2
-import mediapipe as mp
-from collections import deque
+import os
 import sys
 import json
 
+from analysis_budget import AnalysisBudget
+from checkpoint import AnalysisCheckpoint, seek_to_frame
+from early_abort import EarlyAbortPolicy
+from fast_imports import import_mediapipe_headless
+from landmark_predictor import LandmarkPredictor
+from landmark_stream import LandmarkStream
+from pose_backend import make_backend
+from progress import ProgressReporter
+from time_axis import TimeAxis, TimeWindow
+from rep_index import RepIndex
+from video_fingerprint import trajectory_signature
+from worker_config import apply_worker_config
+
 # Check if video path is provided as argument
 if len(sys.argv) > 1:
     video_filename = sys.argv[1]
 else:
     video_filename = "your_video.mp4"
 
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
+# ---- TUNE THESE ----
+SMOOTH_SEC = 0.1  # rep signal smoothing window (3 frames at 30 fps), see time_axis.py
+# ---------------------
 
 def get_shoulder_hip_y(lm, w, h):
     """Return the y-coordinate of the shoulder and hip of the side with better visibility."""
@@ -26,67 +39,142 @@ def get_shoulder_hip_y(lm, w, h):
         hp_y = lm[mp_pose.PoseLandmark.LEFT_HIP].y * h
     return sh_y, hp_y
 
-# --------- PASS 1: Determine thresholds ----------
+# Thread count / CPU pinning from the launcher, before any thread pools exist
+apply_worker_config()
+
+# Fail fast on unreadable input before paying for the mediapipe import
 cap = cv2.VideoCapture(video_filename)
+if not cap.isOpened():
+    result = {"error": "Could not open video"}
+    print(json.dumps(result))
+    exit()
+
+mp = import_mediapipe_headless()
+mp_pose = mp.solutions.pose
+
+budget = AnalysisBudget.from_env()
+fps = cap.get(cv2.CAP_PROP_FPS)
+progress = ProgressReporter.from_env(source="situp", total_frames=cap.get(cv2.CAP_PROP_FRAME_COUNT))
+early_abort = EarlyAbortPolicy(fps, cap.get(cv2.CAP_PROP_FRAME_COUNT),
+                               [(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP),
+                                (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP)])
+# every processed frame also feeds the extra metrics (quality, technique, ...)
+stream = LandmarkStream.from_env(fps, source="situp")
+axis = TimeAxis(fps)
+predictor = LandmarkPredictor.from_env()  # fills short detection gaps
+
+# --------- PASS 1: Determine thresholds ----------
+# The per-frame differences are kept so PASS 2 replays them instead of
+# decoding the video a second time.
 y_diffs = []
+y_diff_frames = []  # frame number of each entry, for the rep index
+smooth_diffs = []   # the counter's signal, smoothed here so keyframes can follow it
+smooth_queue = TimeWindow(SMOOTH_SEC)
+frames_read = 0
+
+def checkpoint_state():
+    return {"y_diffs": y_diffs, "y_diff_frames": y_diff_frames, "smooth_diffs": smooth_diffs,
+            "smooth_queue": smooth_queue.state(), "axis": axis.state(),
+            "predictor": predictor.state(), "stream": stream.state()}
+
+# Resume from a checkpoint left by an earlier run that was cut short
+checkpoint = AnalysisCheckpoint(video_filename, os.path.abspath(__file__), {"smooth": SMOOTH_SEC})
+state = checkpoint.load()
+resumed_from = 0
+if state and seek_to_frame(cap, state["frame"]):
+    y_diffs = state["y_diffs"]
+    y_diff_frames = state["y_diff_frames"]
+    smooth_diffs = state["smooth_diffs"]
+    smooth_queue = TimeWindow(SMOOTH_SEC, state["smooth_queue"])
+    axis = TimeAxis(fps, state=state["axis"])
+    predictor = LandmarkPredictor.from_env(state=state["predictor"])
+    frames_read = resumed_from = state["frame"]
+    progress.resume_at(resumed_from)
+    early_abort.last_seen = resumed_from
+    stream.restore(state.get("stream"))
 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while True:
+with make_backend(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+    while not budget.exhausted(frames_read - resumed_from):
         ret, frame = cap.read()
         if not ret: break
+        frames_read += 1
+        t = axis.stamp(cap, frames_read)
         h, w = frame.shape[:2]
-        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        if res.pose_landmarks:
-            sh_y, hp_y = get_shoulder_hip_y(res.pose_landmarks.landmark, w, h)
+        if predictor.skip_inference(t, frames_read):
+            landmarks = predictor.fill(t, None, inferred=False)
+        else:
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            landmarks = predictor.fill(t, res.pose_landmarks.landmark if res.pose_landmarks else None)
+        stream.publish(frames_read, frame, landmarks, t, predictor.last_predicted)
+        if landmarks:
+            sh_y, hp_y = get_shoulder_hip_y(landmarks, w, h)
             y_diff = hp_y - sh_y  # shoulder above hip → positive
             y_diffs.append(y_diff)
+            y_diff_frames.append(frames_read)
+            smooth_diffs.append(smooth_queue.add(t, y_diff))
+            stream.signal(frames_read, smooth_diffs[-1])
+        if early_abort.observe(frames_read, landmarks):
+            # nobody in view for a while: look further ahead before decoding the rest
+            resume = early_abort.probe_ahead(cap, pose, frames_read)
+            if resume is None:
+                break
+            frames_read = resume
+        progress.update(frames_read)
+        if checkpoint.due(frames_read):
+            checkpoint.save(frames_read, checkpoint_state())
 
 cap.release()
+checkpoint.finish(frames_read, checkpoint_state(), budget.stopped)
 
 if not y_diffs:
     result = {"error": "No pose detected."}
+    result.update(budget.result_fields(frames_read, fps))
+    result.update(stream.finish())
+    if early_abort.report():
+        result["early_abort"] = early_abort.report()
     print(json.dumps(result))
     exit()
 
-# Up: torso contracted (shoulder close to hip)
+# Lying back: shoulder level with hip (min difference)
 up_thresh = min(y_diffs) + 10
-# Down: torso extended (shoulder far from hip)
+# Sat up: shoulder high above hip (max difference)
 down_thresh = max(y_diffs) - 10
 
 # --------- PASS 2: Count reps ----------
-cap = cv2.VideoCapture(video_filename)
 rep_count = 0
 rep_in_progress = False
-smooth_queue = deque(maxlen=3)
+reps = RepIndex(fps, bottom_is_high=False)  # lying back (min difference) is the bottom
 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
-        h, w = frame.shape[:2]
-        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        if res.pose_landmarks:
-            sh_y, hp_y = get_shoulder_hip_y(res.pose_landmarks.landmark, w, h)
-            y_diff = hp_y - sh_y
-            smooth_queue.append(y_diff)
-            smooth_diff = sum(smooth_queue)/len(smooth_queue)
-
-            # Rep detection
-            if not rep_in_progress and smooth_diff > down_thresh:
-                rep_in_progress = True
-            elif rep_in_progress and smooth_diff < up_thresh:
-                rep_count += 1
-                rep_in_progress = False
-
-        # Skip GUI rendering for programmatic use
-        # Only output the final result
+for frame_no, smooth_diff in zip(y_diff_frames, smooth_diffs):
+    reps.observe(frame_no, smooth_diff)
 
-cap.release()
+    # Rep detection
+    if not rep_in_progress and smooth_diff > down_thresh:
+        rep_in_progress = True
+        reps.begin(frame_no)
+    elif rep_in_progress and smooth_diff < up_thresh:
+        rep_count += 1
+        rep_in_progress = False
+        reps.complete(frame_no)
+
+# technique scores the reps counted above
+rep_index = reps.result(axis.time_of)
+stream_fields = stream.finish(rep_index)
 
 # Output result as JSON
 result = {
     "rep_count": rep_count,
     "up_threshold": up_thresh,
-    "down_threshold": down_thresh
+    "down_threshold": down_thresh,
+    "resumed_from_frame": resumed_from,
+    "trajectory": trajectory_signature(y_diffs, fps, y_diff_frames),
+    "rep_index": rep_index,
+    "time_axis": axis.report(),
+    "prediction": predictor.report()
 }
-print(json.dumps(result))
\ No newline at end of file
+result.update(budget.result_fields(frames_read, fps))
+result.update(stream_fields)
+if early_abort.report():
+    result["early_abort"] = early_abort.report()
+progress.done(frames_read, rep_count, partial=budget.stopped)
+print(json.dumps(result))
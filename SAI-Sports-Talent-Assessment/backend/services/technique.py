@@ -0,0 +1,254 @@
+"""
+Technique Scoring
+Landmark stream consumer (landmark_stream.py) that scores technique from the
+landmarks the analyzer already extracted, with no extra inference. It keeps
+the body joints and timestamp of every frame and, when the stream finishes,
+computes joint angles for all frames at once and reduces each metric over
+every row of the analyzer's rep index (rep_index.py) with NumPy, so the
+scored reps are exactly the counted ones:
+
+  push-ups       elbow depth, lockout and body line (shoulder-hip-ankle) per rep
+  sit-ups        torso range of motion and knee bend per rep
+  vertical jump  countermovement depth and left/right take-off/landing symmetry
+  shuttle run    turn sharpness (time to reverse direction) per turn
+
+Every metric maps to 0..1 between a "poor" and a "good" bound; a rep scores
+the mean of the metrics that could be measured in it and technique_score is
+the mean over reps. Windows are in seconds of the frame timestamps
+(time_axis.py), so they hold for any fps.
+"""
+
+import warnings
+
+import numpy as np
+
+from landmark_stream import StreamConsumer
+
+# ---------------- CONFIG ----------------
+# MediaPipe Pose indices of the joints kept per frame
+JOINTS = {"l_shoulder": 11, "r_shoulder": 12, "l_elbow": 13, "r_elbow": 14,
+          "l_wrist": 15, "r_wrist": 16, "l_hip": 23, "r_hip": 24,
+          "l_knee": 25, "r_knee": 26, "l_ankle": 27, "r_ankle": 28}
+MIN_VISIBILITY = 0.5
+SMOOTH_SEC = 0.1          # angle smoothing window (3 frames at 30 fps)
+MAX_REPORTED_REPS = 100
+# (poor, good) bounds per metric
+PUSHUP_DEPTH_DEG = (150.0, 90.0)       # smallest elbow angle in the rep
+PUSHUP_LOCKOUT_DEG = (130.0, 160.0)    # largest elbow angle before the bottom
+PUSHUP_BODY_LINE_DEG = (135.0, 165.0)  # smallest shoulder-hip-ankle angle in the rep
+SITUP_RANGE_DEG = (30.0, 70.0)         # torso inclination range in the rep
+SITUP_KNEE_DEG = (150.0, 110.0)        # knee angle while sitting up (bent knees)
+JUMP_LIFT_FRAC = 0.02                  # ankle rise (share of frame height) that counts as lifted
+JUMP_DEPTH_DEG = (160.0, 110.0)        # smallest knee angle before the apex
+JUMP_TIMING_S = (0.10, 0.0)            # left/right ankle take-off + landing offset
+JUMP_ASYMMETRY = (0.10, 0.0)           # mean ankle height difference / leg length in the air
+SHUTTLE_TURN_S = (2.0, 0.5)            # time from running one way to running back
+# ----------------------------------------
+
+_INDEX = {name: i for i, name in enumerate(JOINTS)}
+_JOINT_IDS = list(JOINTS.values())
+
+
+def scale(values, poor, good):
+    """Map values linearly to 0..1 between the `poor` and `good` bounds (either order)."""
+    return np.clip((np.asarray(values, dtype=np.float64) - poor) / (good - poor), 0.0, 1.0)
+
+
+def joint_angles(a, b, c):
+    """Angle at b (degrees) for (n, 2) point arrays a, b, c."""
+    v1, v2 = a - b, c - b
+    cos = (v1 * v2).sum(axis=1) / (np.linalg.norm(v1, axis=1) * np.linalg.norm(v2, axis=1) + 1e-9)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def smooth(values, times, window_s=SMOOTH_SEC):
+    """Centred moving mean over `window_s` seconds of the (possibly uneven) timestamps."""
+    if values is None or len(values) < 2:
+        return values
+    lo = np.searchsorted(times, times - window_s / 2.0, side="left")
+    hi = np.searchsorted(times, times + window_s / 2.0, side="right")
+    total = np.concatenate([[0.0], np.cumsum(values)])
+    return (total[hi] - total[lo]) / (hi - lo)
+
+
+def fill_gaps(values):
+    """Linear interpolation over NaNs (frames without a usable pose)."""
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values)
+    if ok.sum() < 2:
+        return None
+    return np.interp(np.arange(len(values)), np.flatnonzero(ok), values[ok])
+
+
+def segment_reduce(values, starts, ends, op):
+    """Reduce `values` over [start, end] of every segment (np.minimum / np.maximum / np.add)."""
+    if len(starts) == 0:
+        return np.zeros(0)
+    if values is None:
+        return np.full(len(starts), np.nan)
+    bounds = np.empty(2 * len(starts), dtype=int)
+    bounds[0::2], bounds[1::2] = starts, np.maximum(ends, starts) + 1
+    padded = np.append(values, values[-1])  # reduceat needs the last bound inside the array
+    return op.reduceat(padded, bounds)[0::2]
+
+
+def _number(value):
+    """JSON-safe float: NaN (metric not measurable) becomes None."""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 3)
+
+
+class TechniqueScorer(StreamConsumer):
+    name = "technique"
+
+    def __init__(self, source="", fps=30.0):
+        super().__init__(source, fps)
+        self.rows = []    # (len(JOINTS), 4) per published frame, NaN without a pose
+        self.frames = []  # analyzer frame index of each row
+        self.times = []   # timestamp of each row (LandmarkFrame.time_sec)
+        self.size = None  # (width, height) of the frames
+
+    def on_frame(self, frame):
+        if self.size is None:
+            self.size = (frame.width, frame.height)
+        if frame.points is None:
+            row = np.full((len(_JOINT_IDS), 4), np.nan, dtype=np.float32)
+        else:
+            row = frame.points[_JOINT_IDS]
+        self.rows.append(row)
+        self.frames.append(frame.index)
+        self.times.append(frame.time_sec)
+
+    def state(self):
+        return {"size": self.size, "frames": self.frames, "times": self.times,
+                "rows": np.round(np.array(self.rows, dtype=np.float64), 4).tolist() if self.rows else []}
+
+    def restore(self, state):
+        self.size = tuple(state["size"]) if state.get("size") else None
+        self.frames = list(state.get("frames", []))
+        self.times = list(state.get("times", []))
+        self.rows = [np.array(r, dtype=np.float32) for r in state.get("rows", [])]
+
+    # -------- series helpers --------
+    def _points(self, name):
+        """(n, 2) pixel coordinates of a joint, NaN where it is not visible."""
+        p = self.series[:, _INDEX[name]]
+        xy = p[:, :2] * np.array(self.size, dtype=np.float64)
+        xy[p[:, 3] < MIN_VISIBILITY] = np.nan
+        return xy
+
+    def _side_angle(self, a, b, c):
+        """Joint angle on the better visible body side, per frame (NaN if neither)."""
+        angles = []
+        visibility = []
+        for side in ("l_", "r_"):
+            pa, pb, pc = self._points(side + a), self._points(side + b), self._points(side + c)
+            angles.append(joint_angles(pa, pb, pc))
+            vis = self.series[:, [_INDEX[side + a], _INDEX[side + b], _INDEX[side + c]], 3].mean(axis=1)
+            visibility.append(np.where(np.isnan(angles[-1]), -1.0, vis))
+        return np.where(visibility[0] >= visibility[1], angles[0], angles[1])
+
+    def _rep_rows(self):
+        """The rep index as (start, bottom, top, end) row positions in the series."""
+        rows = np.asarray((self.rep_index or {}).get("frames") or [], dtype=np.int64).reshape(-1, 4)
+        positions = np.searchsorted(np.asarray(self.frames), rows)
+        return np.clip(positions, 0, len(self.frames) - 1).T
+
+    def result(self):
+        if not self.rows or self.size is None:
+            return {}
+        self.series = np.array(self.rows, dtype=np.float64)
+        self.t = np.asarray(self.times, dtype=np.float64)
+        scorer = {"pushup": self._pushups, "situp": self._situps,
+                  "vertical_jump": self._jumps, "shuttle_run": self._shuttle}.get(self.source)
+        if scorer is None:
+            return {}
+        start, bottom, top, end = self._rep_rows()
+        if not len(start):
+            return {"technique_score": None,
+                    "technique": {"reps_scored": 0, "note": "No complete rep to score"}}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN frames and reps in nanmean
+            reps, parts = scorer(start, bottom, top, end)
+            reps["score"] = np.nanmean(parts, axis=0)
+            mean_score = np.nanmean(reps["score"])
+        metrics = [k for k in reps if k not in ("score", "frame")]
+        summary = {k: _number(np.nanmean(reps[k])) for k in metrics}
+        per_rep = [dict({k: _number(reps[k][i]) for k in metrics},
+                        frame=int(reps["frame"][i]), score=_number(reps["score"][i]))
+                   for i in range(min(len(start), MAX_REPORTED_REPS))]
+        scored = reps["score"][~np.isnan(reps["score"])]
+        technique = {"reps_scored": int(len(start)), "mean": summary,
+                     "consistency": round(float(1.0 - min(1.0, np.std(scored) * 2)), 3) if scored.size else None,
+                     "reps": per_rep}
+        if scored.size < len(start):
+            technique["note"] = f"{len(start) - scored.size} rep(s) without usable landmarks"
+        return {"technique_score": _number(mean_score), "technique": technique}
+
+    # -------- per exercise --------
+    # Each takes the rep index as row positions and returns the per-rep
+    # metrics (NaN where not measurable) and the list of 0..1 metric scores.
+    def _rep_frames(self, idx):
+        return np.asarray(self.frames)[idx]
+
+    def _pushups(self, start, bottom, top, end):
+        elbow = smooth(fill_gaps(self._side_angle("shoulder", "elbow", "wrist")), self.t)
+        body = fill_gaps(self._side_angle("shoulder", "hip", "ankle"))
+        depth = segment_reduce(elbow, start, end, np.minimum)
+        # arms straight at the top before the rep goes down
+        lockout = segment_reduce(elbow, start, bottom, np.maximum)
+        line = segment_reduce(body, start, end, np.minimum)
+        parts = [scale(depth, *PUSHUP_DEPTH_DEG), scale(lockout, *PUSHUP_LOCKOUT_DEG),
+                 scale(line, *PUSHUP_BODY_LINE_DEG)]
+        return {"min_elbow_deg": depth, "lockout_elbow_deg": lockout, "min_body_line_deg": line,
+                "frame": self._rep_frames(bottom)}, parts
+
+    def _situps(self, start, bottom, top, end):
+        knee = fill_gaps(self._side_angle("hip", "knee", "ankle"))
+        # torso inclination from horizontal, on the better visible side
+        shoulder = np.where(np.isnan(self._points("l_shoulder")), self._points("r_shoulder"), self._points("l_shoulder"))
+        hips = np.where(np.isnan(self._points("l_hip")), self._points("r_hip"), self._points("l_hip"))
+        d = shoulder - hips
+        torso = smooth(fill_gaps(np.degrees(np.arctan2(-d[:, 1], np.abs(d[:, 0])))), self.t)
+        # lying back at the bottom of the rep, sat up at its top
+        lying = segment_reduce(torso, start, top, np.minimum)
+        sat_up = segment_reduce(torso, bottom, end, np.maximum)
+        torso_range = sat_up - lying
+        knee_up = knee[top] if knee is not None else np.full(len(top), np.nan)
+        parts = [scale(torso_range, *SITUP_RANGE_DEG), scale(knee_up, *SITUP_KNEE_DEG)]
+        return {"torso_range_deg": torso_range, "knee_deg_at_top": knee_up,
+                "frame": self._rep_frames(top)}, parts
+
+    def _jumps(self, start, bottom, top, end):
+        knee = fill_gaps(self._side_angle("hip", "knee", "ankle"))
+        # countermovement: smallest knee angle from the jump start to the apex
+        depth = segment_reduce(knee, start, top, np.minimum)
+        # symmetry: left/right ankle leave and touch the ground together
+        ankles = []
+        for side in ("l_", "r_"):
+            y = fill_gaps(self._points(side + "ankle")[:, 1])
+            ankles.append(None if y is None else np.median(y) - y)
+        timing = np.full(len(start), np.nan)
+        asym = np.full(len(start), np.nan)
+        if ankles[0] is not None and ankles[1] is not None:
+            leg = np.nanmedian(np.linalg.norm(self._points("l_hip") - self._points("l_ankle"), axis=1))
+            if not np.isfinite(leg) or leg <= 0:
+                leg = self.size[1] / 2.0
+            lifted = [a > JUMP_LIFT_FRAC * self.size[1] for a in ankles]
+            for i, (lo, hi) in enumerate(zip(start, end + 1)):
+                if not all(l[lo:hi].any() for l in lifted):
+                    continue  # feet never left the ground in view
+                first = [self.t[lo + int(np.argmax(l[lo:hi]))] for l in lifted]
+                last = [self.t[hi - 1 - int(np.argmax(l[lo:hi][::-1]))] for l in lifted]
+                timing[i] = abs(first[0] - first[1]) + abs(last[0] - last[1])
+                air = lifted[0][lo:hi] | lifted[1][lo:hi]
+                asym[i] = float(np.mean(np.abs(ankles[0][lo:hi] - ankles[1][lo:hi])[air])) / leg
+        parts = [scale(depth, *JUMP_DEPTH_DEG), scale(timing, *JUMP_TIMING_S), scale(asym, *JUMP_ASYMMETRY)]
+        return {"min_knee_deg": depth, "left_right_offset_sec": timing,
+                "ankle_asymmetry": asym, "frame": self._rep_frames(top)}, parts
+
+    def _shuttle(self, start, bottom, top, end):
+        # rep index rows of a turn: last frame running the old way (bottom) and
+        # first frame running back (top), as the counter saw them
+        turn_sec = self.t[top] - self.t[bottom]
+        return {"turn_sec": turn_sec, "frame": self._rep_frames(top)}, [scale(turn_sec, *SHUTTLE_TURN_S)]
@@ -0,0 +1,135 @@
+"""
+Threaded Frame Capture
+Reads frames from a camera on a background thread and keeps only the latest
+one, so live sessions never fall behind the athlete when inference is slow.
+A recorded video file can stand in for the camera during testing.
+"""
+
+import threading
+import time
+
+import cv2
+
+
+def parse_source(value):
+    """Turn a CLI/config camera source into what cv2.VideoCapture expects."""
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return value
+
+
+class LatestFrameCapture:
+    """Camera reader that drops stale frames instead of queueing them."""
+
+    def __init__(self, source=0, width=None, height=None, loop_file=True):
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str)
+        self.loop_file = loop_file
+        self.cap = cv2.VideoCapture(self.source)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+        # A file has no natural pacing, so replay it at its own fps to
+        # behave like a live camera (otherwise it would be drained instantly)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._last_read_id = 0
+        self.frames_dropped = 0
+        self._ended = False
+        self._running = False
+        self._thread = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    @property
+    def ended(self):
+        """True once the source stopped producing frames for good."""
+        return self._ended
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+        return self
+
+    def _reader(self):
+        next_due = time.monotonic()
+        read_since_rewind = 0
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                # Rewind a finished file, but never spin on one that yields nothing
+                if self.is_file and self.loop_file and read_since_rewind > 0:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    read_since_rewind = 0
+                    continue
+                with self._cond:
+                    self._ended = True
+                    self._cond.notify_all()
+                break
+            read_since_rewind += 1
+
+            with self._cond:
+                # Overwrite whatever the consumer has not picked up yet
+                if self._frame_id != self._last_read_id:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_id += 1
+                self._cond.notify_all()
+
+            if self.is_file:
+                next_due += self.frame_interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()
+
+    def read(self, timeout=1.0):
+        """
+        Block until a frame newer than the last one returned is available.
+        Returns (ret, frame) like cv2.VideoCapture.read().
+        """
+        if not self._running:
+            self.start()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._frame_id == self._last_read_id and not self._ended:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+                self._cond.wait(remaining)
+            if self._frame_id == self._last_read_id:
+                return False, None
+            self._last_read_id = self._frame_id
+            return True, self._frame
+
+    def release(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+class InferenceThrottle:
+    """Limits how often live preview runs pose inference."""
+
+    def __init__(self, max_fps):
+        self.min_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self._last = None
+
+    def due(self):
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.min_interval:
+            self._last = now
+            return True
+        return False
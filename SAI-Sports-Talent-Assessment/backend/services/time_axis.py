@@ -0,0 +1,111 @@
+"""
+Time Axis
+Timestamps for the frames an analyzer decodes, so windows and speeds are
+defined in seconds rather than frames. Phone videos are often variable frame
+rate and uploads mix 30/60/120 fps; counting frames makes a 40-frame warm-up
+last 1.3 s in one clip and 0.3 s in another.
+
+Each frame gets its container timestamp (CAP_PROP_POS_MSEC after the read).
+When the container reports none, or one that goes backwards or jumps far
+from what the nominal fps predicts, the nominal frame time is used instead
+and counted in the report. TimeWindow replaces deque(maxlen=N) smoothing
+with a window of seconds, and speed() gives per-second rates.
+"""
+
+from bisect import bisect_left
+from collections import deque
+
+import cv2
+
+# ---------------- CONFIG ----------------
+DEFAULT_FPS = 30.0        # used when the container does not report fps
+MAX_DRIFT_S = 1.0         # container timestamps further than this from the nominal guess are ignored
+WINDOW_EPSILON_S = 1e-3   # timestamp rounding tolerance at window edges
+# ----------------------------------------
+
+
+class TimeAxis:
+    """Frame index (the analyzer's 1-based counter) -> presentation time in seconds."""
+
+    def __init__(self, fps, state=None):
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.frames = []
+        self.times = []
+        self.fallbacks = 0
+        if state:
+            self.frames = list(state["frames"])
+            self.times = list(state["times"])
+            self.fallbacks = state["fallbacks"]
+
+    def nominal(self, frame_index):
+        """Time the nominal fps gives `frame_index`, continuing from the last stamped frame."""
+        if not self.frames:
+            return max(frame_index - 1, 0) / self.fps
+        return self.times[-1] + (frame_index - self.frames[-1]) / self.fps
+
+    def stamp(self, cap, frame_index):
+        """Record and return the time of the frame just read from `cap`."""
+        expected = self.nominal(frame_index)
+        t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        valid = t > 0 or frame_index <= 1
+        if self.frames:
+            valid = valid and self.times[-1] < t and abs(t - expected) <= MAX_DRIFT_S
+        if not valid:
+            t = expected
+            self.fallbacks += 1
+        self.frames.append(frame_index)
+        self.times.append(t)
+        return t
+
+    def time_of(self, frame_index):
+        """Time of a stamped frame; frames never stamped are placed at the nominal rate."""
+        i = bisect_left(self.frames, frame_index)
+        if i < len(self.frames) and self.frames[i] == frame_index:
+            return self.times[i]
+        if i == 0:
+            return max(frame_index - 1, 0) / self.fps
+        return self.times[i - 1] + (frame_index - self.frames[i - 1]) / self.fps
+
+    def state(self):
+        return {"frames": self.frames, "times": [round(t, 6) for t in self.times],
+                "fallbacks": self.fallbacks}
+
+    def report(self):
+        """Summary for the result: the nominal fps, the rate actually measured and fallbacks."""
+        measured = None
+        if len(self.times) > 1 and self.times[-1] > self.times[0]:
+            measured = (self.frames[-1] - self.frames[0]) / (self.times[-1] - self.times[0])
+        return {"nominal_fps": round(self.fps, 3),
+                "measured_fps": round(measured, 3) if measured else None,
+                "timestamp_fallbacks": self.fallbacks}
+
+
+class TimeWindow:
+    """Running mean over the samples of the last `window_s` seconds (at least the newest)."""
+
+    def __init__(self, window_s, samples=None):
+        self.window_s = window_s
+        self.samples = deque(tuple(s) for s in (samples or []))
+
+    def add(self, t, value):
+        self.samples.append((t, value))
+        while t - self.samples[0][0] >= self.window_s - WINDOW_EPSILON_S and len(self.samples) > 1:
+            self.samples.popleft()
+        return self.mean()
+
+    def mean(self):
+        return sum(v for _, v in self.samples) / len(self.samples)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def state(self):
+        return list(self.samples)
+
+
+def speed(previous, current):
+    """Per-second rate between two (time, value) samples; None for a zero interval."""
+    dt = current[0] - previous[0]
+    if dt <= 0:
+        return None
+    return (current[1] - previous[1]) / dt
@@ -1,10 +1,22 @@
 import cv2
-import collections
 import numpy as np
-import mediapipe as mp
+import os
 import sys
 import json
 
+from analysis_budget import AnalysisBudget
+from checkpoint import AnalysisCheckpoint, seek_to_frame
+from early_abort import EarlyAbortPolicy
+from fast_imports import import_mediapipe_headless
+from landmark_predictor import LandmarkPredictor
+from landmark_stream import LandmarkStream
+from pose_backend import make_backend
+from progress import ProgressReporter
+from time_axis import TimeAxis, TimeWindow
+from rep_index import RepIndex
+from video_fingerprint import TrajectorySampler
+from worker_config import apply_worker_config
+
 # Check if video path is provided as argument
 if len(sys.argv) > 1:
     VIDEO_FILE = sys.argv[1]
@@ -12,29 +24,48 @@ else:
     VIDEO_FILE = "your_jump_video.mp4"
 
 # ---- TUNE THESE ----
-WARMUP_FRAMES = 40
-SMOOTH_WINDOW = 5
+# Windows are in seconds (time_axis.py), so they hold for any fps
+WARMUP_SEC = 1.33          # 40 frames at 30 fps
+SMOOTH_WINDOW_SEC = 0.167  # 5 frames at 30 fps
 JUMP_DELTA_FRAC = 0.08  # how high they must jump (fraction of frame height)
 # ---------------------
 
-pose = mp.solutions.pose.Pose(min_detection_confidence=0.5,
-                              min_tracking_confidence=0.5)
-drawer = mp.solutions.drawing_utils
+# Thread count / CPU pinning from the launcher, before any thread pools exist
+apply_worker_config()
 
+# Fail fast on unreadable input before paying for the mediapipe import
 cap = cv2.VideoCapture(VIDEO_FILE)
 if not cap.isOpened():
     result = {"error": "Could not open video"}
     print(json.dumps(result))
     exit()
 
-smooth_hip_y = collections.deque(maxlen=SMOOTH_WINDOW)
+mp = import_mediapipe_headless()
+pose = None  # built on the first decoded frame
+budget = AnalysisBudget.from_env()
+fps = cap.get(cv2.CAP_PROP_FPS)
+progress = ProgressReporter.from_env(source="vertical_jump", total_frames=cap.get(cv2.CAP_PROP_FRAME_COUNT))
+early_abort = EarlyAbortPolicy(fps, cap.get(cv2.CAP_PROP_FRAME_COUNT),
+                               [(mp.solutions.pose.PoseLandmark.LEFT_HIP,
+                                 mp.solutions.pose.PoseLandmark.RIGHT_HIP)])
+# every processed frame also feeds the extra metrics (quality, technique, ...)
+stream = LandmarkStream.from_env(fps, source="vertical_jump")
+axis = TimeAxis(fps)
+predictor = LandmarkPredictor.from_env()  # fills short detection gaps
+
+smooth_hip_y = TimeWindow(SMOOTH_WINDOW_SEC)
 hip_y_samples = []
+trajectory = TrajectorySampler(fps)  # hip y track for duplicate detection
 frame_count = 0
 
 jumping = False
 jumps = 0
 jump_heights = []  # store each jump's height
 min_hip_during_jump = None
+reps = RepIndex(fps)           # start / crouch / apex / landing frame of each jump
+jump_start = None              # last standing frame before this jump
+crouch = None                  # (frame, hip y) lowest hip position before take-off
+apex_frame = None
 
 def safe_landmark(lm_list, idx):
     try:
@@ -43,42 +74,96 @@ def safe_landmark(lm_list, idx):
     except Exception:
         return None
 
-while True:
+def checkpoint_state():
+    return {"smooth_hip_y": smooth_hip_y.state(), "hip_y_samples": hip_y_samples,
+            "jumping": jumping, "jumps": jumps, "jump_heights": jump_heights,
+            "min_hip_during_jump": min_hip_during_jump, "trajectory": trajectory.state(),
+            "reps": reps.state(), "jump_start": jump_start, "crouch": crouch,
+            "apex_frame": apex_frame, "axis": axis.state(), "predictor": predictor.state(),
+            "stream": stream.state()}
+
+# Resume from a checkpoint left by an earlier run that was cut short
+checkpoint = AnalysisCheckpoint(VIDEO_FILE, os.path.abspath(__file__),
+                                {"warmup": WARMUP_SEC, "smooth": SMOOTH_WINDOW_SEC,
+                                 "jump_delta": JUMP_DELTA_FRAC})
+state = checkpoint.load()
+resumed_from = 0
+if state and seek_to_frame(cap, state["frame"]):
+    smooth_hip_y = TimeWindow(SMOOTH_WINDOW_SEC, state["smooth_hip_y"])
+    hip_y_samples = state["hip_y_samples"]
+    jumping = state["jumping"]
+    jumps = state["jumps"]
+    jump_heights = state["jump_heights"]
+    min_hip_during_jump = state["min_hip_during_jump"]
+    reps = RepIndex(fps, state=state["reps"])
+    jump_start = state["jump_start"]
+    crouch = state["crouch"]
+    apex_frame = state["apex_frame"]
+    trajectory = TrajectorySampler(fps, state=state.get("trajectory"))
+    axis = TimeAxis(fps, state=state["axis"])
+    predictor = LandmarkPredictor.from_env(state=state["predictor"])
+    frame_count = resumed_from = state["frame"]
+    progress.resume_at(resumed_from)
+    early_abort.last_seen = resumed_from
+    stream.restore(state.get("stream"))
+
+while not budget.exhausted(frame_count - resumed_from):
     ret, frame = cap.read()
     if not ret:
         break
     frame_count += 1
+    t = axis.stamp(cap, frame_count)
     h, w = frame.shape[:2]
 
-    res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if pose is None:
+        pose = make_backend(min_detection_confidence=0.5,  # AI_POSE_BACKEND, see pose_backend.py
+                            min_tracking_confidence=0.5)
+    if predictor.skip_inference(t, frame_count):
+        landmarks = predictor.fill(t, None, inferred=False)
+    else:
+        res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        landmarks = predictor.fill(t, res.pose_landmarks.landmark if res.pose_landmarks else None)
+    stream.publish(frame_count, frame, landmarks, t, predictor.last_predicted)
 
-    if res.pose_landmarks:
-        lm = res.pose_landmarks.landmark
+    if landmarks:
+        lm = landmarks
 
         left_hip = safe_landmark(lm, mp.solutions.pose.PoseLandmark.LEFT_HIP.value)
         right_hip = safe_landmark(lm, mp.solutions.pose.PoseLandmark.RIGHT_HIP.value)
 
         if left_hip and right_hip:
             hip_cy = ((left_hip[1] + right_hip[1]) / 2.0) * h
+            trajectory.add(frame_count, hip_cy)
 
-            smooth_hip_y.append(hip_cy)
-            avg_hip_y = sum(smooth_hip_y) / len(smooth_hip_y)
+            avg_hip_y = smooth_hip_y.add(t, hip_cy)
 
-            if frame_count <= WARMUP_FRAMES:
+            if t < WARMUP_SEC:
                 hip_y_samples.append(avg_hip_y)
             else:
                 baseline_hip_y = float(np.median(hip_y_samples))
                 jump_threshold = JUMP_DELTA_FRAC * h
 
+                if not jumping:
+                    # rep index: last standing frame, then the bottom of the countermovement
+                    if avg_hip_y <= baseline_hip_y and crouch is None:
+                        jump_start = frame_count
+                    elif avg_hip_y > baseline_hip_y and (crouch is None or avg_hip_y > crouch[1]):
+                        crouch = (frame_count, avg_hip_y)
+                        stream.hold(frame_count, "crouch")
+
                 if not jumping and avg_hip_y < (baseline_hip_y - jump_threshold):
                     # Jump started
                     jumping = True
                     min_hip_during_jump = avg_hip_y
+                    apex_frame = frame_count
+                    stream.hold(frame_count, "apex")
 
                 if jumping:
                     # Track the highest point (lowest y)
                     if avg_hip_y < min_hip_during_jump:
                         min_hip_during_jump = avg_hip_y
+                        apex_frame = frame_count
+                        stream.hold(frame_count, "apex")
 
                 if jumping and avg_hip_y >= baseline_hip_y:
                     # Jump ended
@@ -86,12 +171,32 @@ while True:
                     jump_heights.append(jump_height)
                     jumps += 1
                     jumping = False
+                    start = jump_start if jump_start is not None else apex_frame
+                    reps.add(start, crouch[0] if crouch else start, apex_frame, frame_count)
+                    if crouch:
+                        stream.keep(crouch[0])
+                    stream.keep(apex_frame)  # keyframes: the crouch and apex the counter measured
+                    jump_start, crouch = None, None
+
+    if early_abort.observe(frame_count, landmarks):
+        # nobody in view for a while: look further ahead before decoding the rest
+        resume = early_abort.probe_ahead(cap, pose, frame_count)
+        if resume is None:
+            break
+        frame_count = resume
+    progress.update(frame_count, jumps)
+    if checkpoint.due(frame_count):
+        checkpoint.save(frame_count, checkpoint_state())
 
     # Skip GUI rendering for programmatic use
     # Only output the final result
 
 cap.release()
-pose.close()
+checkpoint.finish(frame_count, checkpoint_state(), budget.stopped)
+rep_index = reps.result(axis.time_of)
+stream_fields = stream.finish(rep_index)  # technique scores the counted jumps
+if pose is not None:
+    pose.close()
 
 # Calculate average jump height
 average_height = float(np.mean(jump_heights)) if jump_heights else 0.0
@@ -101,6 +206,17 @@ result = {
     "rep_count": jumps,
     "jump_heights": [float(h) for h in jump_heights],
     "average_height": average_height,
-    "warmup_frames": WARMUP_FRAMES
+    "warmup_frames": len(hip_y_samples),
+    "warmup_sec": WARMUP_SEC,
+    "resumed_from_frame": resumed_from,
+    "trajectory": trajectory.signature(),
+    "rep_index": rep_index,
+    "time_axis": axis.report(),
+    "prediction": predictor.report()
 }
+result.update(budget.result_fields(frame_count, fps))
+result.update(stream_fields)
+if early_abort.report():
+    result["early_abort"] = early_abort.report()
+progress.done(frame_count, jumps, partial=budget.stopped)
 print(json.dumps(result))
\ No newline at end of file
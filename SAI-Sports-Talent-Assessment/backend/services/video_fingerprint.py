@@ -0,0 +1,354 @@
+"""
+Video Fingerprints
+Perceptual fingerprints for spotting re-uploads of a clip that are not
+byte-identical: re-encoded, resized or trimmed copies.
+
+A fingerprint is a 64-bit difference hash (dHash) of a frame sampled every
+SAMPLE_INTERVAL_S, plus the pose trajectory reported by the analyzer (its
+per-frame signal resampled to TRAJECTORY_HZ and normalised). Frame hashes go
+into a flat binary index; a lookup takes the videos that share an exact
+16-bit band with any query hash (locality-sensitive banding) and scores only
+those by the share of frames with a close hash in the other video. A trimmed
+copy covers the original one way, a re-encode both ways; once the analyzer
+has run, the trajectory correlation confirms the match.
+
+Set AI_FINGERPRINT_DIR to choose the index directory; AI_FINGERPRINT=0 disables.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+FINGERPRINT_DIR = os.environ.get("AI_FINGERPRINT_DIR",
+                                 os.path.join(tempfile.gettempdir(), "sai_fingerprints"))
+SAMPLE_INTERVAL_S = 0.25       # one frame hash per this many seconds...
+MAX_SAMPLES = 480              # ...stretched for videos longer than this many samples
+MIN_FRAME_STD = 6.0            # flat frames (black, blank) hash to noise: skipped
+BANDS = 4                      # 64-bit hash = 4 bands of 16 bits
+MATCH_BITS = 10                # hashes at most this many bits apart are the same frame
+NEAR_DUPLICATE_COVERAGE = 0.6  # share of the new video's frames found in an indexed one
+SAME_VIDEO_COVERAGE = 0.97     # both ways, for a copy of the whole clip...
+SAME_VIDEO_MEAN_BITS = 3.0     # ...with frames this close on average...
+SAME_VIDEO_DURATION_TOL = 0.03  # ...and durations within 3%
+TRAJECTORY_HZ = 4.0            # trajectory samples per second
+TRAJECTORY_MATCH = 0.9         # correlation at which trajectories are the same motion
+TRAJECTORY_MIN_OVERLAP = 0.5   # share of the shorter trajectory that must overlap
+MAX_INDEX_RECORDS = 2000000    # frame hashes kept; the oldest videos are dropped beyond
+# ----------------------------------------
+
+RECORD_DTYPE = np.dtype([("hash", "<u8"), ("owner", "<u8")])
+_BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def fingerprints_enabled():
+    return os.environ.get("AI_FINGERPRINT", "1").strip() not in ("0", "false", "no")
+
+
+def popcount64(values):
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(values)
+    return _BYTE_BITS[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def dhash(frame):
+    """64-bit difference hash of a BGR frame, or None for a flat frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    if float(gray[::8, ::8].std()) < MIN_FRAME_STD:
+        return None
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).ravel())
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def frame_hashes(video_path, interval=SAMPLE_INTERVAL_S, max_samples=MAX_SAMPLES):
+    """
+    Hashes of frames sampled every `interval` seconds (decoded with grab(),
+    only sampled frames are converted). Returns (hashes, duration_sec).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return [], 0.0
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    if frame_count > 0:
+        interval = max(interval, frame_count / fps / max_samples)
+    hashes, index, next_t = [], 0, 0.0
+    while len(hashes) < max_samples and cap.grab():
+        t = index / fps
+        index += 1
+        if t + 1e-6 < next_t:
+            continue
+        next_t += interval
+        ret, frame = cap.retrieve()
+        if ret:
+            h = dhash(frame)
+            if h is not None:
+                hashes.append(h)
+    cap.release()
+    return hashes, index / fps
+
+
+def coverage(query, candidate, max_bits=MATCH_BITS):
+    """(share of `query` hashes with a close hash in `candidate`, mean bits to the closest)."""
+    if len(query) == 0 or len(candidate) == 0:
+        return 0.0, 64.0
+    q = np.asarray(query, dtype=np.uint64)[:, None]
+    c = np.asarray(candidate, dtype=np.uint64)[None, :]
+    closest = popcount64(q ^ c).min(axis=1)
+    return float((closest <= max_bits).mean()), float(closest.mean())
+
+
+# ---------------- POSE TRAJECTORIES ----------------
+class TrajectorySampler:
+    """Resamples an analyzer's per-frame signal to TRAJECTORY_HZ bucket means."""
+
+    def __init__(self, fps, hz=TRAJECTORY_HZ, state=None):
+        self.hz = hz
+        self.step = max(1, int(round((fps if fps and fps > 0 else 30.0) / hz)))
+        self.buckets = {}  # bucket index -> [sum, count]
+        if state:
+            self.buckets = {int(k): v for k, v in state.items()}
+
+    def add(self, frame_index, value):
+        if value is None:
+            return
+        bucket = self.buckets.setdefault(frame_index // self.step, [0.0, 0])
+        bucket[0] += float(value)
+        bucket[1] += 1
+
+    def state(self):
+        """JSON-serialisable state for analyzer checkpoints."""
+        return {str(k): v for k, v in self.buckets.items()}
+
+    def signature(self):
+        """{"hz", "values"} with the bucket means normalised to zero mean, unit variance."""
+        values = np.array([s / n for _, (s, n) in sorted(self.buckets.items())], dtype=np.float64)
+        if len(values) > 1 and values.std() > 1e-9:
+            values = (values - values.mean()) / values.std()
+        else:
+            values = np.zeros(len(values))
+        return {"hz": self.hz, "values": [round(float(v), 3) for v in values]}
+
+
+def trajectory_signature(values, fps, frames=None):
+    """Signature of a signal; `frames` holds the frame number of each value (default: one value per frame)."""
+    sampler = TrajectorySampler(fps)
+    for frame_index, value in zip(frames if frames is not None else range(len(values)), values):
+        sampler.add(frame_index, value)
+    return sampler.signature()
+
+
+def trajectory_similarity(a, b, min_overlap=TRAJECTORY_MIN_OVERLAP):
+    """Best correlation of two signatures over all shifts (trims), or None."""
+    if not a or not b or a.get("hz") != b.get("hz"):
+        return None
+    x, y = np.asarray(a["values"], dtype=np.float64), np.asarray(b["values"], dtype=np.float64)
+    if len(x) > len(y):
+        x, y = y, x
+    need = max(4, int(np.ceil(min_overlap * len(x))))
+    best = None
+    for shift in range(-(len(x) - need), len(y) - need + 1):
+        xs = x[max(0, -shift):min(len(x), len(y) - shift)]
+        ys = y[max(0, shift):max(0, shift) + len(xs)]
+        if len(xs) < need or xs.std() < 1e-9 or ys.std() < 1e-9:
+            continue
+        r = float(np.corrcoef(xs, ys)[0, 1])
+        if best is None or r > best:
+            best = r
+    return None if best is None else round(best, 3)
+
+
+# ---------------- INDEX ----------------
+def owner_id(content_hash):
+    return int(content_hash[:16], 16)
+
+
+class FingerprintIndex:
+    """
+    Append-only index on local disk: records.bin holds (frame hash, owner)
+    pairs, entries.ndjson one metadata line per video. Each video is written
+    with a single append, so concurrent wrappers do not interleave.
+    """
+
+    def __init__(self, directory=FINGERPRINT_DIR):
+        self.directory = directory
+        self.records_path = os.path.join(directory, "records.bin")
+        self.entries_path = os.path.join(directory, "entries.ndjson")
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.entries = {}
+        self._bands = None
+
+    def load(self):
+        try:
+            raw = np.fromfile(self.records_path, dtype=np.uint8)
+            self.records = raw[:len(raw) - len(raw) % RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+        except (OSError, ValueError):
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.entries = {}
+        try:
+            with open(self.entries_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["owner"]] = entry
+                    except (ValueError, KeyError):
+                        continue  # torn line from a crashed writer
+        except OSError:
+            pass
+        self._bands = None
+        return self
+
+    def _band_values(self):
+        if self._bands is None:
+            hashes = self.records["hash"]
+            self._bands = [(hashes >> np.uint64(16 * b)) & np.uint64(0xFFFF) for b in range(BANDS)]
+        return self._bands
+
+    def hashes_of(self, owner):
+        return self.records["hash"][self.records["owner"] == np.uint64(owner)]
+
+    def candidates(self, hashes):
+        """Owners sharing at least one exact 16-bit band with a query hash."""
+        if len(hashes) == 0 or len(self.records) == 0:
+            return set()
+        q = np.asarray(hashes, dtype=np.uint64)
+        owners = set()
+        for b, values in enumerate(self._band_values()):
+            qb = (q >> np.uint64(16 * b)) & np.uint64(0xFFFF)
+            owners.update(int(o) for o in np.unique(self.records["owner"][np.isin(values, qb)]))
+        return owners
+
+    def lookup(self, hashes, duration_sec, exclude_owner=None):
+        """Indexed videos whose frames cover enough of `hashes`, best first."""
+        matches = []
+        for owner in self.candidates(hashes):
+            entry = self.entries.get(f"{owner:016x}")
+            if entry is None or owner == exclude_owner:
+                continue
+            theirs = self.hashes_of(owner)
+            forward, mean_bits = coverage(hashes, theirs)
+            if forward < NEAR_DUPLICATE_COVERAGE:
+                continue
+            backward, _ = coverage(theirs, hashes)
+            longer = max(duration_sec, entry.get("duration_sec") or 0.0) or 1.0
+            same = (forward >= SAME_VIDEO_COVERAGE and backward >= SAME_VIDEO_COVERAGE and
+                    mean_bits <= SAME_VIDEO_MEAN_BITS and
+                    abs(duration_sec - (entry.get("duration_sec") or 0.0)) / longer <= SAME_VIDEO_DURATION_TOL)
+            matches.append({"video_id": entry["owner"], "video_path": entry.get("video_path"),
+                            "assessment_type": entry.get("assessment_type"),
+                            "frame_coverage": round(forward, 3), "reverse_coverage": round(backward, 3),
+                            "mean_hash_bits": round(mean_bits, 2), "same_video": same})
+        matches.sort(key=lambda m: (m["same_video"], m["frame_coverage"]), reverse=True)
+        return matches
+
+    def add(self, owner, hashes, entry):
+        """Append one video (a no-op if it is already indexed)."""
+        key = f"{owner:016x}"
+        if key in self.entries or len(hashes) == 0:
+            return False
+        records = np.zeros(len(hashes), dtype=RECORD_DTYPE)
+        records["hash"] = np.asarray(hashes, dtype=np.uint64)
+        records["owner"] = np.uint64(owner)
+        entry = dict(entry, owner=key, added=time.time())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.records_path, "ab") as f:
+                f.write(records.tobytes())
+            with open(self.entries_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            return False  # a failed index write must never fail the analysis
+        self.entries[key] = entry
+        if len(self.records) + len(records) > MAX_INDEX_RECORDS:
+            self.compact()
+        return True
+
+    def compact(self, keep=MAX_INDEX_RECORDS // 2):
+        """Rewrite the index keeping the most recently added videos."""
+        self.load()
+        kept = self.records[-keep:]
+        if len(kept) and len(kept) < len(self.records):
+            # drop the first owner, which may have been cut in half
+            first = kept["owner"][0]
+            kept = kept[np.argmax(kept["owner"] != first):] if (kept["owner"] != first).any() else kept[:0]
+        owners = {f"{int(o):016x}" for o in np.unique(kept["owner"])}
+        try:
+            tmp = self.records_path + f".{os.getpid()}.tmp"
+            kept.tofile(tmp)
+            os.replace(tmp, self.records_path)
+            tmp = self.entries_path + f".{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for key, entry in self.entries.items():
+                    if key in owners:
+                        f.write(json.dumps(entry) + "\n")
+            os.replace(tmp, self.entries_path)
+        except OSError:
+            return
+        self.load()
+
+
+# ---------------- WRAPPER HOOKS ----------------
+def check_duplicates(video_path, content_hash, directory=FINGERPRINT_DIR):
+    """
+    Fingerprint a video and look it up before analysis. Returns a dict with
+    the hashes and the near-duplicate matches (None when disabled).
+    """
+    if not fingerprints_enabled():
+        return None
+    hashes, duration = frame_hashes(video_path)
+    index = FingerprintIndex(directory).load()
+    owner = owner_id(content_hash)
+    return {"owner": owner, "hashes": hashes, "duration_sec": duration, "index": index,
+            "matches": index.lookup(hashes, duration, exclude_owner=owner)}
+
+
+def duplicate_result(fingerprint, assessment_type):
+    """
+    The cached result of an indexed copy of the whole clip analyzed as the
+    same assessment type by the current analyzer version, or None.
+    """
+    from result_cache import load_result, result_key
+
+    for match in (fingerprint or {}).get("matches", []):
+        if not match["same_video"] or match["assessment_type"] != assessment_type:
+            continue
+        video_hash = fingerprint["index"].entries[match["video_id"]].get("content_hash")
+        cached = load_result(result_key(video_hash, assessment_type)) if video_hash else None
+        if cached is not None:
+            cached["duplicate_of"] = match
+            return cached
+    return None
+
+
+def record_fingerprint(fingerprint, video_path, assessment_type, result, video_hash):
+    """
+    Confirm the matches with the analyzer's trajectory, add the video to the
+    index and attach the near-duplicates to `result`. Removes the analyzer's
+    raw "trajectory" from the result.
+    """
+    trajectory = result.pop("trajectory", None)
+    if fingerprint is None:
+        return result
+    index = fingerprint["index"]
+    matches = fingerprint["matches"]
+    for match in matches:
+        theirs = index.entries.get(match["video_id"], {})
+        if trajectory and theirs.get("assessment_type") == assessment_type:
+            match["trajectory_similarity"] = trajectory_similarity(trajectory, theirs.get("trajectory"))
+        similarity = match.get("trajectory_similarity")
+        match["confirmed"] = match["same_video"] or (similarity is not None and similarity >= TRAJECTORY_MATCH)
+    if matches:
+        result["near_duplicates"] = matches
+    if not result.get("error"):
+        index.add(fingerprint["owner"], fingerprint["hashes"],
+                  {"video_path": os.path.abspath(video_path), "assessment_type": assessment_type,
+                   "duration_sec": round(fingerprint["duration_sec"], 3),
+                   "content_hash": video_hash,
+                   "trajectory": None if result.get("partial") else trajectory})
+    return result
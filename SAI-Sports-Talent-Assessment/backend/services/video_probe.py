@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Video Probe
+Pre-flight check run before the analyzers: reads container metadata, samples a
+handful of evenly spaced frames and rejects videos that cannot produce a result
+(unreadable, empty, too short, black or blank, nobody in frame) with a clear
+reason, instead of paying for full decode and pose passes first.
+
+The pixel checks only need OpenCV; mediapipe is imported for the pose-presence
+check only when the sampled frames look like real footage.
+
+Usage: python video_probe.py <video> [--no-pose]
+"""
+
+import json
+import sys
+
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+PROBE_SAMPLES = 6          # frames sampled across the video
+MIN_DURATION_S = 1.0       # shorter videos cannot hold a single rep
+MIN_SIDE_PX = 120          # smaller frames are too small for pose detection
+BLACK_MEAN_MAX = 12.0      # mean grey level below this = black frame
+BLANK_STD_MAX = 4.0        # grey-level std below this = uniform (blank) frame
+PROBE_WIDTH = 320          # sampled frames are downscaled to this width
+# ----------------------------------------
+
+
+def probe_metadata(cap):
+    """Container metadata as reported by OpenCV (rotation in degrees, 0 if unknown)."""
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    rotation = 0
+    if hasattr(cv2, "CAP_PROP_ORIENTATION_META"):
+        rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META) or 0) % 360
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+    if rotation in (90, 270):
+        width, height = height, width  # OpenCV applies the rotation when decoding
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC) or 0)
+    codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") or None
+    return {
+        "fps": round(fps, 3),
+        "frame_count": frame_count,
+        "duration_sec": round(frame_count / fps, 3) if fps > 0 else None,
+        "width": width,
+        "height": height,
+        "rotation": rotation,
+        "orientation": "portrait" if height > width else "landscape",
+        "codec": codec,
+    }
+
+
+def sample_frames(cap, frame_count, n=PROBE_SAMPLES):
+    """Decode up to `n` frames spread evenly over the video, downscaled."""
+    if frame_count > 0:
+        indices = np.linspace(0, frame_count - 1, num=min(n, frame_count) + 2)[1:-1].astype(int)
+    else:
+        indices = range(n)  # unknown length: take the first frames
+    frames = []
+    for idx in indices:
+        if frame_count > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        h, w = frame.shape[:2]
+        if w > PROBE_WIDTH:
+            frame = cv2.resize(frame, (PROBE_WIDTH, int(h * PROBE_WIDTH / w)), interpolation=cv2.INTER_AREA)
+        frames.append((int(idx), frame))
+    return frames
+
+
+def frame_stats(frame):
+    grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    mean, std = cv2.meanStdDev(grey)
+    return float(mean[0][0]), float(std[0][0])
+
+
+def person_in_frames(frames):
+    """True as soon as a person is detected in one of the sampled frames."""
+    from fast_imports import import_mediapipe_headless
+    mp = import_mediapipe_headless()
+    with mp.solutions.pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose:
+        for _, frame in frames:
+            if pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).pose_landmarks:
+                return True
+    return False
+
+
+def probe_video(video_path, check_pose=True):
+    """
+    Returns {"ok", "reason", "metadata", "samples"}; `reason` says why the
+    video was rejected (None when ok).
+    """
+    report = {"ok": False, "reason": None, "metadata": None, "samples": None}
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        report["reason"] = "Could not open video (unsupported or corrupt file)"
+        return report
+
+    meta = probe_metadata(cap)
+    report["metadata"] = meta
+    frames = sample_frames(cap, meta["frame_count"])
+    cap.release()
+
+    if not frames:
+        report["reason"] = "Video contains no decodable frames"
+        return report
+    if meta["duration_sec"] is not None and meta["duration_sec"] < MIN_DURATION_S:
+        report["reason"] = f"Video is too short ({meta['duration_sec']:.2f}s, need at least {MIN_DURATION_S:.0f}s)"
+        return report
+    if meta["width"] and min(meta["width"], meta["height"]) < MIN_SIDE_PX:
+        report["reason"] = f"Video resolution is too low ({meta['width']}x{meta['height']})"
+        return report
+
+    stats = [frame_stats(f) for _, f in frames]
+    black = sum(1 for mean, _ in stats if mean < BLACK_MEAN_MAX)
+    blank = sum(1 for mean, std in stats if mean >= BLACK_MEAN_MAX and std < BLANK_STD_MAX)
+    report["samples"] = {"frames": [i for i, _ in frames], "black": black, "blank": blank,
+                         "mean_brightness": round(float(np.mean([m for m, _ in stats])), 1)}
+    if black == len(frames):
+        report["reason"] = "Video is black (camera covered or no light)"
+        return report
+    if black + blank == len(frames):
+        report["reason"] = "Video shows no scene (uniform frames)"
+        return report
+
+    if check_pose:
+        found = person_in_frames(frames)
+        report["samples"]["person_detected"] = found
+        if not found:
+            report["reason"] = "No person detected in sampled frames"
+            return report
+
+    report["ok"] = True
+    return report
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(json.dumps({"error": "Usage: python video_probe.py <video> [--no-pose]"}))
+        sys.exit(1)
+    report = probe_video(args[0], check_pose="--no-pose" not in sys.argv)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Worker Configuration
+Thread and CPU-affinity settings for analyzer processes. Left alone, every
+concurrent analyzer sizes OpenCV's and the BLAS libraries' thread pools (and
+MediaPipe's executor) to the whole machine, so N workers oversubscribe the
+cores N times over. A worker gets a thread count and a CPU set instead:
+
+  AI_WORKER_THREADS   threads per worker (OpenCV, OpenMP/BLAS, TFLite backend)
+  AI_WORKER_CPUS      CPUs to pin the worker to, e.g. "0-3" or "0,2,4"
+
+The variables are set by whoever launches the worker (job_scheduler.py splits
+the cores between its slots); the analyzers call apply_worker_config() before
+importing mediapipe. The CPU set is applied to every thread of the process,
+since sched_setaffinity() on its own only pins the calling thread and a
+process that already has threads (a zygote standby with prebuilt Pose
+graphs) would keep running them everywhere. MediaPipe's bundled Pose solution does not expose the
+XNNPACK thread count, so it is bounded through the CPU set; the TFLite pose
+backend takes the thread count directly (tflite_threads()).
+"""
+
+import os
+
+# ---------------- CONFIG ----------------
+# Read by OpenMP, OpenBLAS, MKL, numexpr and Accelerate when they initialise
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"]
+# ----------------------------------------
+
+
+def parse_cpu_list(value):
+    """'0-3,6' -> [0, 1, 2, 3, 6]; empty or invalid -> None."""
+    cpus = set()
+    try:
+        for part in (value or "").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                cpus.update(range(int(lo), int(hi) + 1))
+            else:
+                cpus.add(int(part))
+    except ValueError:
+        return None
+    return sorted(cpus) or None
+
+
+def format_cpu_list(cpus):
+    return ",".join(str(c) for c in cpus)
+
+
+def available_cpus():
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def set_affinity(cpus):
+    """Pin every thread of this process to `cpus` (Linux); other platforms: the calling thread."""
+    try:
+        tids = [int(t) for t in os.listdir("/proc/self/task")]
+    except OSError:
+        tids = [0]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            pass  # thread exited meanwhile
+    return cpus
+
+
+def worker_threads():
+    value = os.environ.get("AI_WORKER_THREADS", "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def worker_cpus():
+    return parse_cpu_list(os.environ.get("AI_WORKER_CPUS", ""))
+
+
+def tflite_threads():
+    """Thread count for a TFLite interpreter in this worker."""
+    threads = worker_threads()
+    if threads:
+        return threads
+    cpus = worker_cpus()
+    return len(cpus) if cpus else len(available_cpus())
+
+
+def worker_env(threads, cpus=None):
+    """Environment entries that configure a worker process launched with them."""
+    env = {name: str(threads) for name in THREAD_ENV_VARS}
+    env["AI_WORKER_THREADS"] = str(threads)
+    if cpus:
+        env["AI_WORKER_CPUS"] = format_cpu_list(cpus)
+    return env
+
+
+def plan_layout(processes, cpus=None):
+    """
+    Split `cpus` (default: all available) into `processes` contiguous slots.
+    Returns [(threads, [cpu, ...]), ...], one entry per worker slot.
+    """
+    cpus = list(cpus or available_cpus())
+    processes = max(1, processes)
+    base, extra = divmod(len(cpus), processes)
+    layout, start = [], 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        if size == 0:  # more workers than cores: share round-robin
+            slot = [cpus[i % len(cpus)]]
+        else:
+            slot = cpus[start:start + size]
+            start += size
+        layout.append((len(slot), slot))
+    return layout
+
+
+def apply_worker_config(threads=None, cpus=None):
+    """
+    Apply thread count and CPU affinity to the current process. Arguments
+    default to AI_WORKER_THREADS / AI_WORKER_CPUS; nothing is changed when
+    neither is set. Returns the settings applied.
+    """
+    threads = threads or worker_threads()
+    cpus = cpus or worker_cpus()
+    applied = {}
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            applied["cpus"] = set_affinity(cpus)
+        except OSError:
+            pass  # CPUs outside this container's set: keep the current affinity
+    if threads:
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(threads)  # for libraries initialised after this
+        try:
+            import cv2
+            cv2.setNumThreads(threads)
+        except ImportError:
+            pass
+        applied["threads"] = threads
+    return applied
@@ -0,0 +1,133 @@
+"""
+Worker Memory Limits
+Memory bookkeeping for persistent analyzer workers (analysis_zygote.py):
+per-job peak RSS sampling, a recycle policy (restart a worker after N jobs or
+once its RSS passes a ceiling) and an admission check that rejects videos whose
+estimated peak RSS (fitted to measured job peaks, see CONFIG) would exceed the
+per-job memory limit.
+
+Overrides: AI_MAX_JOBS_PER_WORKER, AI_MAX_WORKER_RSS_MB, AI_JOB_MEMORY_LIMIT_MB.
+"""
+
+import os
+import threading
+
+# ---------------- CONFIG ----------------
+MAX_JOBS_PER_WORKER = 50      # recycle a worker after this many jobs
+MAX_WORKER_RSS_MB = 1500      # ... or once its RSS after a job exceeds this
+JOB_MEMORY_LIMIT_MB = 1024    # reject jobs estimated above this
+# Job memory = base + frame copies x one decoded frame, fitted to the peak RSS
+# of the four analyzers at 480p-2160p (60 s of 720p peaks like 2 s of it):
+# 226/236/260/385 MB at 480p/720p/1080p/2160p, 233/246/279/458 MB with keyframes
+BASE_JOB_MEMORY_MB = 220      # interpreter + cv2 + MediaPipe graphs
+FRAME_COPIES = 7              # decoded BGR, RGB copy, graph input tensors, codec buffers
+KEYFRAME_FRAME_COPIES = 3     # frames held and queued by keyframes.py
+RSS_SAMPLE_INTERVAL_S = 0.05
+# ----------------------------------------
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else default
+
+
+def rss_mb(pid=None):
+    """Current resident set size in MB (None where /proc is unavailable)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def children_peak_rss_mb():
+    """Largest peak RSS among finished child processes (None without `resource`)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # KB on Linux
+    return round(peak_kb / 1024, 1) if peak_kb else None
+
+
+def estimate_job_memory_mb(metadata, keyframes=None):
+    """
+    Peak memory of analyzing a video with the given probed metadata. The
+    length does not matter (frames are not kept); `keyframes` defaults to
+    whether AI_STREAM_CONSUMERS asks for them.
+    """
+    width = (metadata or {}).get("width") or 0
+    height = (metadata or {}).get("height") or 0
+    frame_mb = width * height * 3 / (1024 * 1024)
+    if keyframes is None:
+        keyframes = "keyframes" in os.environ.get("AI_STREAM_CONSUMERS", "")
+    copies = FRAME_COPIES + (KEYFRAME_FRAME_COPIES if keyframes else 0)
+    return BASE_JOB_MEMORY_MB + copies * frame_mb
+
+
+def check_job_memory(metadata, limit_mb=None):
+    """Reason string if the job would exceed the per-job limit, else None."""
+    limit_mb = limit_mb or _env_int("AI_JOB_MEMORY_LIMIT_MB", JOB_MEMORY_LIMIT_MB)
+    estimate = estimate_job_memory_mb(metadata)
+    if estimate > limit_mb:
+        return (f"Video resolution {metadata.get('width')}x{metadata.get('height')} needs about "
+                f"{estimate:.0f} MB to analyze, over the {limit_mb} MB per-job limit")
+    return None
+
+
+class RssSampler:
+    """Samples this process's RSS in a background thread; use as a context manager."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.start_mb = None
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None and (self.peak_mb is None or current > self.peak_mb):
+            self.peak_mb = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start_mb = rss_mb()
+        self.peak_mb = self.start_mb
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+class RecyclePolicy:
+    """Decides when a persistent worker should exit and be replaced."""
+
+    def __init__(self, max_jobs=None, max_rss_mb=None):
+        self.max_jobs = max_jobs or _env_int("AI_MAX_JOBS_PER_WORKER", MAX_JOBS_PER_WORKER)
+        self.max_rss_mb = max_rss_mb or _env_int("AI_MAX_WORKER_RSS_MB", MAX_WORKER_RSS_MB)
+        self.jobs = 0
+        self.peak_mb = 0.0
+
+    def record(self, job_peak_mb):
+        self.jobs += 1
+        if job_peak_mb:
+            self.peak_mb = max(self.peak_mb, job_peak_mb)
+
+    def recycle_reason(self):
+        """Why the worker should be replaced now, or None."""
+        if self.jobs >= self.max_jobs:
+            return f"served {self.jobs} jobs"
+        current = rss_mb()
+        if current is not None and current > self.max_rss_mb:
+            return f"RSS {current:.0f} MB over the {self.max_rss_mb} MB ceiling"
+        return None